@@ -0,0 +1,247 @@
+"""
+Bulk analysis of btsnoop captures
+
+Every capture is decoded in a worker process and the results are merged
+into one report: how often each (major, minor) pair was sent and received,
+commands that are not in protocol.json together with example payloads,
+and the time between each request and its response.
+
+Run with: python -m automower_ble.analyse captures/*.log
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .capture import RECEIVED, SENT, CaptureReader
+from .dispatcher import frame_key
+from .registry import get_registry
+
+REQUESTS = "requests"
+RESPONSES = "responses"
+EVENTS = "events"
+DECODE_ERRORS = "decode_errors"
+
+_COUNTERS = (REQUESTS, RESPONSES, EVENTS, DECODE_ERRORS)
+
+
+class CaptureReport:
+    """The results of one or more captures, merge with `merge()`"""
+
+    def __init__(self, samples: int = 3):
+        self.samples = samples
+
+        self.files = 0
+        self.frames = 0
+        # path -> error message, for files that could not be read
+        self.errors = {}
+        # (major, minor) -> {counter: count}
+        self.counts = {}
+        # (major, minor) -> list of example frames as hex, for unknown IDs
+        self.unknown = {}
+        # (major, minor) -> request to response times in seconds
+        self.latencies = {}
+
+    def _count(self, key: tuple[int, int], counter: str) -> None:
+        counts = self.counts.get(key)
+        if counts is None:
+            counts = self.counts[key] = dict.fromkeys(_COUNTERS, 0)
+        counts[counter] += 1
+
+    def add_capture(self, path: str) -> None:
+        self.files += 1
+        reader = CaptureReader(path)
+        # (connection, channel, major, minor) -> times of unanswered requests
+        outstanding = {}
+
+        try:
+            for frame in reader:
+                self.frames += 1
+                channel, major, minor = frame_key(frame.frame)
+                if major is None:
+                    # Channel setup and handshake
+                    continue
+                key = (major, minor)
+
+                packet_type = frame.packet_type
+                if packet_type == "request" and frame.direction == SENT:
+                    self._count(key, REQUESTS)
+                    outstanding.setdefault(
+                        (frame.connection, channel, major, minor), deque()
+                    ).append(frame.timestamp)
+                elif packet_type == "response" and frame.direction == RECEIVED:
+                    self._count(key, RESPONSES)
+                    pending = outstanding.get((frame.connection, channel, major, minor))
+                    if pending:
+                        self.latencies.setdefault(key, []).append(
+                            frame.timestamp - pending.popleft()
+                        )
+                elif packet_type == "event":
+                    self._count(key, EVENTS)
+
+                if frame.command is None:
+                    examples = self.unknown.setdefault(key, [])
+                    if len(examples) < self.samples:
+                        examples.append(frame.frame.hex())
+                elif frame.error is not None:
+                    self._count(key, DECODE_ERRORS)
+        except (OSError, ValueError) as e:
+            self.errors[path] = str(e)
+
+    def merge(self, other: "CaptureReport") -> None:
+        self.files += other.files
+        self.frames += other.frames
+        self.errors.update(other.errors)
+        for key, counts in other.counts.items():
+            mine = self.counts.setdefault(key, dict.fromkeys(_COUNTERS, 0))
+            for counter, count in counts.items():
+                mine[counter] += count
+        for key, examples in other.unknown.items():
+            mine = self.unknown.setdefault(key, [])
+            mine += examples[: self.samples - len(mine)]
+        for key, latencies in other.latencies.items():
+            self.latencies.setdefault(key, []).extend(latencies)
+
+    def latency_summary(self, key: tuple[int, int]) -> dict | None:
+        """count, p50, p99 and max of the latencies in seconds"""
+        latencies = sorted(self.latencies.get(key, ()))
+        if not latencies:
+            return None
+        return {
+            "count": len(latencies),
+            "p50": latencies[len(latencies) // 2],
+            "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            "max": latencies[-1],
+        }
+
+    def to_dict(self) -> dict:
+        registry = get_registry()
+        commands = []
+        for key in sorted(self.counts):
+            definition = registry.lookup(*key)
+            commands.append(
+                {
+                    "major": key[0],
+                    "minor": key[1],
+                    "name": None if definition is None else definition.name,
+                    **self.counts[key],
+                    "latency": self.latency_summary(key),
+                }
+            )
+
+        return {
+            "files": self.files,
+            "frames": self.frames,
+            "errors": self.errors,
+            "commands": commands,
+            "unknown": [
+                {"major": key[0], "minor": key[1], "examples": examples}
+                for key, examples in sorted(self.unknown.items())
+            ],
+        }
+
+
+def analyse_capture(path: str, samples: int = 3) -> CaptureReport:
+    report = CaptureReport(samples)
+    report.add_capture(path)
+    return report
+
+
+def analyse(paths: list[str], jobs: int | None = None, samples: int = 3):
+    """Analyse the captures in `jobs` processes and merge the results"""
+    report = CaptureReport(samples)
+    if jobs == 1 or len(paths) <= 1:
+        for path in paths:
+            report.merge(analyse_capture(path, samples))
+        return report
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for result in executor.map(
+            analyse_capture, paths, [samples] * len(paths), chunksize=1
+        ):
+            report.merge(result)
+
+    return report
+
+
+def print_report(report: CaptureReport, out=sys.stdout) -> None:
+    data = report.to_dict()
+    print("%d files, %d frames" % (data["files"], data["frames"]), file=out)
+    for path, error in data["errors"].items():
+        print("Unable to read %s: %s" % (path, error), file=out)
+
+    print(
+        "\n%-32s %5s %5s %8s %9s %6s %7s %9s %9s"
+        % (
+            "command",
+            "major",
+            "minor",
+            "requests",
+            "responses",
+            "events",
+            "errors",
+            "p50 (ms)",
+            "p99 (ms)",
+        ),
+        file=out,
+    )
+    for command in data["commands"]:
+        latency = command["latency"]
+        print(
+            "%-32s %5d %5d %8d %9d %6d %7d %9s %9s"
+            % (
+                command["name"] or "UNKNOWN",
+                command["major"],
+                command["minor"],
+                command[REQUESTS],
+                command[RESPONSES],
+                command[EVENTS],
+                command[DECODE_ERRORS],
+                "-" if latency is None else "%.1f" % (latency["p50"] * 1000),
+                "-" if latency is None else "%.1f" % (latency["p99"] * 1000),
+            ),
+            file=out,
+        )
+
+    if data["unknown"]:
+        print("\nUnknown commands:", file=out)
+        for unknown in data["unknown"]:
+            print("  (%d, %d)" % (unknown["major"], unknown["minor"]), file=out)
+            for example in unknown["examples"]:
+                print("    " + example, file=out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m automower_ble.analyse",
+        description="Summarise the Automower traffic in btsnoop captures",
+    )
+    parser.add_argument("captures", nargs="+", help="btsnoop_hci.log files")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=3,
+        help="Example payloads to keep per unknown command",
+    )
+    parser.add_argument("--json", help="Also save the report to this file")
+    args = parser.parse_args()
+
+    report = analyse(args.captures, args.jobs, args.samples)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report.to_dict(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
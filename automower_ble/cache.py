@@ -0,0 +1,129 @@
+"""
+Caching of command responses
+
+Every command has a policy: values that never change are kept for the
+whole connection, slow changing counters and fast changing state are kept
+for a TTL in seconds. Commands that change the mower invalidate the
+cached values they affect.
+"""
+
+import time
+
+# Keep the value until the cache is cleared, i.e. for the connection
+STATIC = float("inf")
+
+DEFAULT_POLICY = {
+    "GetModel": STATIC,
+    "GetSerialNumber": STATIC,
+    "GetUserMowerNameAsAsciiString": STATIC,
+    "GetAllStatistics": 300.0,
+    "GetNumberOfTasks": 300.0,
+    "GetTask": 300.0,
+    # GetMessage is not cached, its messageId counts from the newest message
+    # so a cached entry is wrong as soon as a new message arrives
+    "GetNumberOfMessages": 60.0,
+    "GetNextStartTime": 30.0,
+    "GetBatteryLevel": 10.0,
+    "GetRemainingChargingTime": 10.0,
+    "IsCharging": 5.0,
+    "GetMode": 2.0,
+    "GetState": 2.0,
+    "GetActivity": 2.0,
+    "GetError": 2.0,
+    "GetOverride": 2.0,
+    "GetRestrictionReason": 2.0,
+}
+
+# Anything that may change when the mower starts, stops or parks
+_OPERATION = (
+    "GetMode",
+    "GetState",
+    "GetActivity",
+    "GetError",
+    "GetOverride",
+    "GetRestrictionReason",
+    "GetNextStartTime",
+    "IsCharging",
+    "GetRemainingChargingTime",
+)
+
+DEFAULT_INVALIDATES = {
+    "SetMode": _OPERATION,
+    "SetOverrideMow": _OPERATION,
+    "SetOverridePark": _OPERATION,
+    "SetOverrideParkUntilNextStart": _OPERATION,
+    "ClearOverride": _OPERATION,
+    "Pause": _OPERATION,
+    "StartTrigger": _OPERATION,
+    "EnterOperatorPin": ("IsOperatorLoggedIn",),
+}
+
+
+class ResponseCache:
+    """
+    Cache of decoded command values, keyed on the command name and its
+    request parameters. `hits` and `misses` count lookups per command.
+    """
+
+    def __init__(
+        self,
+        policy: dict | None = None,
+        invalidates: dict | None = None,
+        clock=time.monotonic,
+    ):
+        self.policy = DEFAULT_POLICY if policy is None else policy
+        self.invalidates = DEFAULT_INVALIDATES if invalidates is None else invalidates
+        self.clock = clock
+
+        # command name -> {request parameters: (expiry, value)}
+        self._entries = {}
+        self.hits = {}
+        self.misses = {}
+
+    @staticmethod
+    def _key(kwargs: dict):
+        if not kwargs:
+            return None
+        return tuple(sorted(kwargs.items()))
+
+    def get(self, command_name: str, kwargs: dict) -> tuple[bool, object]:
+        """Return (True, value) on a hit and (False, None) on a miss"""
+        if command_name not in self.policy:
+            return False, None
+
+        entry = self._entries.get(command_name, {}).get(self._key(kwargs))
+        if entry is not None and entry[0] > self.clock():
+            self.hits[command_name] = self.hits.get(command_name, 0) + 1
+            return True, entry[1]
+
+        self.misses[command_name] = self.misses.get(command_name, 0) + 1
+        return False, None
+
+    def put(self, command_name: str, kwargs: dict, value) -> None:
+        ttl = self.policy.get(command_name)
+        if ttl is None:
+            return
+
+        self._entries.setdefault(command_name, {})[self._key(kwargs)] = (
+            self.clock() + ttl,
+            value,
+        )
+
+    def invalidate(self, command_name: str) -> None:
+        """Drop everything cached for `command_name`"""
+        self._entries.pop(command_name, None)
+
+    def command_sent(self, command_name: str) -> None:
+        """Invalidate the values that `command_name` may change"""
+        for affected in self.invalidates.get(command_name, ()):
+            self._entries.pop(affected, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, tuple[int, int]]:
+        """Return {command name: (hits, misses)}"""
+        return {
+            name: (self.hits.get(name, 0), self.misses.get(name, 0))
+            for name in sorted(self.hits.keys() | self.misses.keys())
+        }
@@ -0,0 +1,297 @@
+"""
+Decoding of Automower traffic in btsnoop captures
+
+Android writes every Bluetooth packet to btsnoop_hci.log when the HCI
+snoop log is enabled. The capture is memory mapped and read one record at
+a time: ACL fragments are reassembled into L2CAP packets, ATT writes to
+the 98bd0002 characteristic and notifications from 98bd0003 are put back
+together into frames with `FrameAssembler`, and each frame is decoded
+through the protocol.json registry. Memory use does not depend on the
+size of the capture.
+
+    for frame in read_capture("btsnoop_hci.log"):
+        print(frame)
+
+The characteristic handles are learned from the GATT discovery in the
+capture. If the discovery is not captured, because the phone used its
+GATT cache, the first write and notification that start a frame are used.
+
+Run with: python -m automower_ble.capture btsnoop_hci.log
+"""
+
+import argparse
+import mmap
+import struct
+import uuid
+from datetime import datetime, timezone
+
+from .codec import PACKET_EVENT, PACKET_REQUEST, PACKET_RESPONSE
+from .framing import FrameAssembler
+from .registry import decode_frame
+from .transport import READ_CHAR_UUID, WRITE_CHAR_UUID
+
+_FILE_HEADER = struct.Struct(">8sII")
+# original length, included length, flags, drops, timestamp
+_RECORD_HEADER = struct.Struct(">IIIIq")
+_MAGIC = b"btsnoop\x00"
+
+# Datalink types
+DATALINK_H1 = 1001
+DATALINK_H4 = 1002
+
+# Microseconds from midnight, January 1st 0 AD to the Unix epoch
+_EPOCH = 0x00DCDDB30F2F8000
+
+_H4_ACL = 0x02
+_L2CAP_ATT = 0x0004
+
+# ATT opcodes
+ATT_READ_BY_TYPE_RESPONSE = 0x09
+ATT_WRITE_REQUEST = 0x12
+ATT_WRITE_COMMAND = 0x52
+ATT_NOTIFICATION = 0x1B
+
+SENT = "tx"
+RECEIVED = "rx"
+
+_PACKET_TYPES = {
+    PACKET_REQUEST: "request",
+    PACKET_RESPONSE: "response",
+    PACKET_EVENT: "event",
+}
+
+
+class CapturedFrame:
+    """
+    A frame found in a capture. `command` is its protocol.json entry and
+    `values` the decoded request parameters or response fields, both are
+    None for frames that are not linked to a command, like the channel
+    setup and the handshake. `error` is set if decoding failed.
+    """
+
+    __slots__ = (
+        "timestamp",
+        "direction",
+        "connection",
+        "frame",
+        "command",
+        "values",
+        "error",
+    )
+
+    def __init__(self, timestamp, direction, connection, frame, command, values, error):
+        self.timestamp = timestamp
+        self.direction = direction
+        self.connection = connection
+        self.frame = frame
+        self.command = command
+        self.values = values
+        self.error = error
+
+    @property
+    def name(self) -> str | None:
+        return None if self.command is None else self.command.name
+
+    @property
+    def channel_id(self) -> int:
+        return int.from_bytes(self.frame[4:8], byteorder="little")
+
+    @property
+    def packet_type(self) -> str:
+        if self.frame[8] != 0x01:
+            return "unlinked"
+        return _PACKET_TYPES.get(self.frame[10], "unknown")
+
+    @property
+    def datetime(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp, timezone.utc)
+
+    def __repr__(self) -> str:
+        if self.command is None:
+            what = self.packet_type
+        else:
+            what = "%s %s" % (self.command.name, self.packet_type)
+        detail = self.error if self.error is not None else self.values
+        return "CapturedFrame(%s %s, %s, %r)" % (
+            self.datetime.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            self.direction,
+            what,
+            detail,
+        )
+
+
+class CaptureReader:
+    """
+    Iterate over the Automower frames in a btsnoop file. `handles` maps
+    connection handles to {attribute handle: characteristic UUID}, for
+    captures without the GATT discovery.
+    """
+
+    def __init__(self, path: str, handles: dict | None = None):
+        self.path = path
+        self.handles = {} if handles is None else handles
+
+        self.records = 0
+        self.att_packets = 0
+        self.frames = 0
+
+        # (connection, direction) -> ACL payload being reassembled
+        self._l2cap = {}
+        # (connection, direction) -> FrameAssembler
+        self._framers = {}
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield from self._records(data)
+
+    def _records(self, data):
+        if len(data) < _FILE_HEADER.size:
+            raise ValueError("Not a btsnoop file: " + self.path)
+        magic, version, datalink = _FILE_HEADER.unpack_from(data)
+        if magic != _MAGIC or datalink not in (DATALINK_H1, DATALINK_H4):
+            raise ValueError("Not a supported btsnoop file: " + self.path)
+
+        pos = _FILE_HEADER.size
+        end = len(data)
+        while pos + _RECORD_HEADER.size <= end:
+            _, length, flags, _, timestamp = _RECORD_HEADER.unpack_from(data, pos)
+            pos += _RECORD_HEADER.size
+            if pos + length > end:
+                # Truncated capture
+                break
+            self.records += 1
+
+            start = pos
+            pos += length
+            if datalink == DATALINK_H4:
+                if length < 1 or data[start] != _H4_ACL:
+                    continue
+                start += 1
+            elif flags & 0x02:
+                # Command or event
+                continue
+
+            direction = RECEIVED if flags & 0x01 else SENT
+            packet = self._acl(data[start:pos], direction)
+            if packet is None:
+                continue
+
+            timestamp = (timestamp - _EPOCH) / 1e6
+            yield from self._att(timestamp, direction, *packet)
+
+    def _acl(self, acl: bytes, direction: str):
+        """Return (connection, L2CAP payload) once an ATT packet is complete"""
+        if len(acl) < 4:
+            return None
+        header, length = struct.unpack_from("<HH", acl)
+        connection = header & 0x0FFF
+        boundary = (header >> 12) & 0x03
+        key = (connection, direction)
+
+        if boundary == 0x01:
+            # Continuation fragment
+            buffer = self._l2cap.get(key)
+            if buffer is None:
+                return None
+            buffer += acl[4 : 4 + length]
+        else:
+            buffer = bytearray(acl[4 : 4 + length])
+            self._l2cap[key] = buffer
+
+        if len(buffer) < 4:
+            return None
+        l2cap_length, cid = struct.unpack_from("<HH", buffer)
+        if len(buffer) < l2cap_length + 4:
+            return None
+
+        del self._l2cap[key]
+        if cid != _L2CAP_ATT:
+            return None
+        return connection, bytes(buffer[4 : 4 + l2cap_length])
+
+    def _att(self, timestamp: float, direction: str, connection: int, att: bytes):
+        if not att:
+            return
+        self.att_packets += 1
+        opcode = att[0]
+        handles = self.handles.setdefault(connection, {})
+
+        if opcode == ATT_READ_BY_TYPE_RESPONSE:
+            self._learn_characteristics(handles, att)
+            return
+
+        if opcode in (ATT_WRITE_COMMAND, ATT_WRITE_REQUEST):
+            if direction != SENT:
+                return
+            uuid_wanted = WRITE_CHAR_UUID
+        elif opcode == ATT_NOTIFICATION:
+            if direction != RECEIVED:
+                return
+            uuid_wanted = READ_CHAR_UUID
+        else:
+            return
+
+        if len(att) < 3:
+            return
+        handle = att[1] | (att[2] << 8)
+        value = att[3:]
+
+        characteristic = handles.get(handle)
+        if characteristic is None and uuid_wanted not in handles.values():
+            # No discovery seen, the first packet starting a frame tells
+            # which handle is used
+            if value[:2] == b"\x02\xfd":
+                handles[handle] = characteristic = uuid_wanted
+        if characteristic != uuid_wanted:
+            return
+
+        key = (connection, direction)
+        framer = self._framers.get(key)
+        if framer is None:
+            framer = self._framers[key] = FrameAssembler()
+
+        for frame in framer.feed(value):
+            self.frames += 1
+            frame = bytes(frame)
+            yield CapturedFrame(
+                timestamp, direction, connection, frame, *decode_frame(frame)
+            )
+
+    @staticmethod
+    def _learn_characteristics(handles: dict, att: bytes) -> None:
+        """Map value handles to UUIDs from characteristic declarations"""
+        if len(att) < 2 or att[1] not in (7, 21):
+            return
+        size = att[1]
+        for pos in range(2, len(att) - size + 1, size):
+            value_handle = att[pos + 3] | (att[pos + 4] << 8)
+            uuid_bytes = att[pos + 5 : pos + size]
+            if len(uuid_bytes) == 16:
+                handles[value_handle] = str(uuid.UUID(bytes=uuid_bytes[::-1]))
+
+
+def read_capture(path: str, handles: dict | None = None):
+    """Iterate over the Automower frames in a btsnoop file"""
+    return iter(CaptureReader(path, handles))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m automower_ble.capture",
+        description="Print the Automower frames in a btsnoop capture",
+    )
+    parser.add_argument("capture", help="btsnoop_hci.log file")
+    args = parser.parse_args()
+
+    reader = CaptureReader(args.capture)
+    for frame in reader:
+        print(frame)
+    print(
+        "%d records, %d ATT packets, %d frames"
+        % (reader.records, reader.att_packets, reader.frames)
+    )
+
+
+if __name__ == "__main__":
+    main()
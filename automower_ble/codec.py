@@ -0,0 +1,312 @@
+"""
+Compiled encoders and decoders for the commands in protocol.json
+
+Each command is turned into `struct.Struct` layouts once, so encoding a
+request is a single pack plus CRC and decoding a response is a single
+`unpack_from`.
+"""
+
+import struct
+
+from .helpers import Crc8, crc
+
+# struct format characters of the data types used in protocol.json
+FORMATS = {
+    "uint8": "B",
+    "bool": "B",
+    "uint16": "H",
+    "uint32": "I",
+    "tUnixTime": "I",
+}
+
+# Start of packet (0x02), LINKED_PACKET_TYPE (0xFD), length, channel ID,
+# is_linked, header CRC, packet type, 0xAF, major, minor and data length
+REQUEST_HEADER = struct.Struct("<BBHIBBBBHHH")
+
+# Responses have a result byte in front of the data length
+RESPONSE_HEADER = struct.Struct("<BBHIBBBBHHBH")
+
+# Request headers kept per command, a new channel ID is used on every
+# reconnect so only the most recently used ones are kept
+HEADER_CACHE_SIZE = 8
+
+# Packet types, byte 10 of the header
+PACKET_REQUEST = 0x00
+PACKET_RESPONSE = 0x01
+PACKET_EVENT = 0x02
+
+
+def _layout(types: dict, what: str) -> tuple[tuple[str, ...], struct.Struct]:
+    fields = []
+    fmt = "<"
+    for name, dtype in types.items():
+        if dtype not in FORMATS:
+            raise ValueError("Unknown " + what + " type: " + str(dtype))
+        fields.append(name)
+        fmt += FORMATS[dtype]
+    return tuple(fields), struct.Struct(fmt)
+
+
+class CommandCodec:
+    """
+    The compiled form of a single protocol.json entry
+    """
+
+    __slots__ = (
+        "major",
+        "minor",
+        "request_fields",
+        "request_struct",
+        "response_fields",
+        "response_struct",
+        "response_ascii",
+        "no_response",
+        "_headers",
+    )
+
+    def __init__(
+        self,
+        major: int,
+        minor: int,
+        request_type: dict | None = None,
+        response_type: dict | str | None = None,
+    ):
+        self.major = major
+        self.minor = minor
+
+        self.request_fields, self.request_struct = _layout(
+            request_type or {}, "request"
+        )
+
+        if response_type is None:
+            response_type = "no_response"
+        if not isinstance(response_type, dict):
+            response_type = {"response": response_type}
+
+        self.no_response = "no_response" in response_type.values()
+        self.response_ascii = "ascii" in response_type.values()
+        if self.response_ascii and len(response_type) != 1:
+            raise ValueError(
+                "ASCII response type can currently only be used when there is only one response type"
+            )
+
+        if self.no_response or self.response_ascii:
+            self.response_fields = tuple(response_type)
+            self.response_struct = None
+        else:
+            self.response_fields, self.response_struct = _layout(response_type, "data")
+
+        # channel_id -> (header bytes, CRC state after the header), least
+        # recently used first
+        self._headers = {}
+
+    def header(self, channel_id: int) -> tuple[bytes, int]:
+        """
+        Return the request header template for `channel_id` together with
+        the running CRC over it, so only the payload needs to be added.
+        """
+        headers = self._headers
+        header = headers.pop(channel_id, None)
+        if header is None:
+            size = self.request_struct.size
+            data = bytearray(
+                REQUEST_HEADER.pack(
+                    0x02,
+                    0xFD,
+                    REQUEST_HEADER.size + size - 2,
+                    channel_id,
+                    0x01,  # is_linked
+                    0x00,  # header CRC, filled in below
+                    PACKET_REQUEST,
+                    0xAF,
+                    self.major,
+                    self.minor,
+                    size,
+                )
+            )
+            data[9] = crc(data, 1, 8)
+            header = (bytes(data), Crc8(data[1:]).value)
+            if len(headers) >= HEADER_CACHE_SIZE:
+                del headers[next(iter(headers))]
+
+        headers[channel_id] = header
+        return header
+
+    def encode_request(self, channel_id: int, **kwargs) -> bytearray:
+        try:
+            values = [kwargs[name] for name in self.request_fields]
+        except KeyError as e:
+            raise ValueError(
+                "Missing request parameter: "
+                + e.args[0]
+                + " for command ("
+                + str(self.major)
+                + ", "
+                + str(self.minor)
+                + ")"
+            ) from None
+
+        header, header_crc = self.header(channel_id)
+        payload = self.request_struct.pack(*values)
+
+        data = bytearray(header)
+        data += payload
+        data.append(Crc8(payload, header_crc).value)
+        data.append(0x03)
+
+        return data
+
+    def decode_request(self, request_data: bytes) -> dict:
+        """Return the request parameters of a request frame"""
+        return dict(
+            zip(
+                self.request_fields,
+                self.request_struct.unpack_from(request_data, REQUEST_HEADER.size),
+            )
+        )
+
+    def encode_response(
+        self,
+        channel_id: int,
+        value=None,
+        result: int = 0,
+        packet_type: int = PACKET_RESPONSE,
+    ) -> bytearray:
+        """
+        Build the frame the mower would answer with. `value` is a dict of
+        the response fields, or a plain value for single field responses.
+        """
+        if self.no_response or value is None:
+            payload = b""
+        elif self.response_ascii:
+            payload = value.encode("ascii") + b"\x00"
+        else:
+            if not isinstance(value, dict):
+                value = {self.response_fields[0]: value}
+            payload = self.response_struct.pack(
+                *(value[name] for name in self.response_fields)
+            )
+
+        data = bytearray(
+            RESPONSE_HEADER.pack(
+                0x02,
+                0xFD,
+                RESPONSE_HEADER.size + len(payload) - 2,
+                channel_id,
+                0x01,  # is_linked
+                0x00,  # header CRC, filled in below
+                packet_type,
+                0xAF,
+                self.major,
+                self.minor,
+                result,
+                len(payload),
+            )
+        )
+        data[9] = crc(data, 1, 8)
+        data += payload
+        data.append(crc(data, 1, len(data) - 1))
+        data.append(0x03)
+
+        return data
+
+    def unpack_response(self, response_data: bytes) -> tuple | str | None:
+        """
+        Return the response values in `response_fields` order, the string
+        for ASCII responses and None for commands without a response
+        """
+        if self.no_response:
+            return None
+
+        response_length = response_data[17]
+        data = response_data[19 : 19 + response_length]
+
+        if self.response_ascii:
+            # Remove trailing null bytes
+            return data.decode("ascii").rstrip("\x00")
+
+        if self.response_struct.size != len(data):
+            raise ValueError(
+                "Data length mismatch. Read %d bytes of %d"
+                % (self.response_struct.size, len(data))
+            )
+
+        return self.response_struct.unpack_from(data)
+
+    def decode_response(self, response_data: bytes) -> dict | None:
+        values = self.unpack_response(response_data)
+        if values is None:
+            return None
+        if self.response_ascii:
+            return {self.response_fields[0]: values}
+        return dict(zip(self.response_fields, values))
+
+    def validate_response(self, channel_id: int, response_data: bytes) -> bool:
+        if len(response_data) < RESPONSE_HEADER.size:
+            return False
+
+        (
+            start,
+            packet_type,
+            length,
+            channel,
+            is_linked,
+            header_crc,
+            kind,
+            magic,
+            major,
+            minor,
+            result,
+            _,
+        ) = RESPONSE_HEADER.unpack_from(response_data)
+
+        return (
+            start == 0x02
+            and packet_type == 0xFD
+            and length <= 0xFF
+            and channel == channel_id
+            # is_linked 0x00 is a valid config, but we don't support it
+            and is_linked == 0x01
+            and header_crc == crc(response_data, 1, 8)
+            and kind == PACKET_RESPONSE
+            and magic == 0xAF
+            and major == self.major
+            and minor == self.minor
+            # result: OK(0), UNKNOWN_ERROR(1), INVALID_VALUE(2), OUT_OF_RANGE(3),
+            # NOT_AVAILABLE(4), NOT_ALLOWED(5), INVALID_GROUP(6), INVALID_ID(7),
+            # DEVICE_BUSY(8), INVALID_PIN(9), MOWER_BLOCKED(10)
+            and result == 0x00
+        )
+
+
+_codecs = {}
+
+
+def _freeze(types) -> tuple | str | None:
+    if isinstance(types, dict):
+        return tuple(types.items())
+    return types
+
+
+def compile_command(parameter: dict) -> CommandCodec:
+    """
+    Return the `CommandCodec` for a protocol.json entry, compiling it the
+    first time the entry is seen
+    """
+    key = (
+        parameter["major"],
+        parameter["minor"],
+        _freeze(parameter.get("requestType")),
+        _freeze(parameter.get("responseType")),
+    )
+    codec = _codecs.get(key)
+    if codec is None:
+        codec = CommandCodec(
+            parameter["major"],
+            parameter["minor"],
+            parameter.get("requestType"),
+            parameter.get("responseType"),
+        )
+        _codecs[key] = codec
+
+    return codec
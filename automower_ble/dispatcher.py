@@ -0,0 +1,189 @@
+"""
+Correlation of responses with the requests waiting for them
+
+Every linked frame carries the channel ID and the (major, minor) pair of
+the command, a response is handed to the oldest request that is waiting
+for the same key. Channel setup and handshake frames are not linked, so
+they share a single key.
+
+Responses do not echo the parameters of the request, requests for the
+same command are told apart by their order: the mower answers them in the
+order they were sent. A request that timed out keeps its place, its late
+response is discarded instead of being taken for the answer to a newer
+request. Only a retry, with the same parameters, may take it. Until the
+late responses have turned up, or have been waited for long enough,
+requests for the same command with other parameters are held back.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+# Key used for frames that are not linked (channel setup and handshake)
+UNLINKED = (None, None, None)
+
+
+def frame_key(frame: bytes) -> tuple:
+    """Return the (channel_id, major, minor) a request or response belongs to"""
+    if len(frame) < 16 or frame[8] != 0x01:
+        return UNLINKED
+
+    return (
+        int.from_bytes(frame[4:8], byteorder="little"),
+        frame[12] | (frame[13] << 8),
+        frame[14] | (frame[15] << 8),
+    )
+
+
+class ResponseDispatcher:
+    """
+    Tracks the outstanding requests of one link. At most `window` requests
+    are in flight at the same time. The late response to an abandoned
+    request is waited for up to `late_timeout` seconds, unless `abandon()`
+    is given another time.
+    """
+
+    def __init__(self, window: int = 1, late_timeout: float = 10.0):
+        if window < 1:
+            raise ValueError("The window must be at least 1")
+
+        self.window = window
+        self.late_timeout = late_timeout
+        self._slots = asyncio.Semaphore(window)
+        # Key -> (future, request) of the requests waiting, oldest first
+        self._pending = {}
+        # Key -> (deadline, request) of the late responses, oldest first
+        self._late = {}
+        # Key -> set once no late response is expected for it
+        self._late_cleared = {}
+
+        self.matched = 0
+        self.late_responses = 0
+        self.expired = 0
+        self.unsolicited = 0
+
+    @property
+    def in_flight(self) -> int:
+        return sum(len(futures) for futures in self._pending.values())
+
+    def slot(self) -> asyncio.Semaphore:
+        """Acquire with `async with` before sending a request"""
+        return self._slots
+
+    def _expected_late(self, key: tuple) -> deque | None:
+        """The late responses of `key` that are still expected"""
+        late = self._late.get(key)
+        if late is None:
+            return None
+
+        now = time.monotonic()
+        while late and late[0][0] < now:
+            late.popleft()
+            self.expired += 1
+        if not late:
+            self._clear_late(key)
+            return None
+        return late
+
+    def _clear_late(self, key: tuple) -> None:
+        del self._late[key]
+        self._late_cleared.pop(key).set()
+
+    async def wait_late(self, key: tuple, request: bytes) -> None:
+        """
+        Wait until `request` can be sent without taking the late response
+        to another request for `key`
+        """
+        while True:
+            late = self._expected_late(key)
+            if late is None or all(other == request for _, other in late):
+                return
+
+            try:
+                await asyncio.wait_for(
+                    self._late_cleared[key].wait(), late[0][0] - time.monotonic()
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def expect(self, key: tuple, request: bytes = b"") -> asyncio.Future:
+        """Register interest in the next response to `request`, sent for `key`"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, deque()).append((future, bytes(request)))
+        return future
+
+    def abandon(
+        self, key: tuple, future: asyncio.Future, late_timeout: float | None = None
+    ) -> None:
+        """
+        Stop waiting for a response, for example after a timeout. The
+        response is still expected for `late_timeout` seconds and discarded
+        when it turns up, pass 0 if the request was never sent.
+        """
+        futures = self._pending.get(key)
+        if futures is None:
+            return
+
+        for entry in futures:
+            if entry[0] is future:
+                break
+        else:
+            return
+
+        futures.remove(entry)
+        if not futures:
+            del self._pending[key]
+        if not future.done():
+            future.cancel()
+
+        if late_timeout is None:
+            late_timeout = self.late_timeout
+        if late_timeout > 0:
+            if key not in self._late:
+                self._late[key] = deque()
+                self._late_cleared[key] = asyncio.Event()
+            self._late[key].append((time.monotonic() + late_timeout, entry[1]))
+
+    def dispatch(self, frame: bytes) -> bool:
+        """
+        Hand `frame` to the request waiting for it. Late responses to
+        abandoned requests are discarded. Returns False if the frame was
+        not expected at all.
+        """
+        key = frame_key(frame)
+        futures = self._pending.get(key)
+
+        late = self._expected_late(key)
+        if late is not None and not (futures and futures[0][1] == late[0][1]):
+            # Responses come in order, this one is for a request that was
+            # given up on before the ones still waiting
+            late.popleft()
+            if not late:
+                self._clear_late(key)
+            self.late_responses += 1
+            return True
+
+        # Nothing is late, or the oldest request waiting is a retry of the
+        # late one and either response answers it. The other response is
+        # then still expected.
+        if futures:
+            future = futures.popleft()[0]
+            if not futures:
+                del self._pending[key]
+            future.set_result(frame)
+            self.matched += 1
+            return True
+
+        self.unsolicited += 1
+
+        return False
+
+    def cancel_all(self) -> None:
+        """Fail every outstanding request, used when the link goes down"""
+        for futures in self._pending.values():
+            for future, _ in futures:
+                if not future.done():
+                    future.cancel()
+        self._pending.clear()
+        for key in list(self._late):
+            self._clear_late(key)
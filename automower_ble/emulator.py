@@ -0,0 +1,389 @@
+"""
+An Automower emulated in process
+
+`EmulatedMower` answers the channel setup, the handshake and every command
+in protocol.json with frames built the same way the mower builds them,
+split into notifications of `chunk_size` bytes. Latency, MTU and the gap
+between notifications are configurable, so the whole request/response
+stack can be tested and benchmarked without hardware:
+
+    mower = EmulatedMower(latency=0.05, battery_level=42)
+    client = Mower(channel_id, address, transport_factory=mower.transport)
+    await client.connect(device)
+"""
+
+import asyncio
+import logging
+
+from .codec import PACKET_EVENT
+from .framing import FrameAssembler
+from .protocol import MowerActivity, MowerState, ModeOfOperation, OverrideAction
+from .registry import get_registry
+from .transport import (
+    DEVICE_NAME_CHAR_UUID,
+    DEVICE_TYPE_CHAR_UUID,
+    READ_CHAR_UUID,
+    SERVICE_UUID,
+    WRITE_CHAR_UUID,
+    GattCharacteristic,
+    GattService,
+    GattServices,
+    Transport,
+)
+
+logger = logging.getLogger(__name__)
+
+# Response result codes
+RESULT_OK = 0
+RESULT_INVALID_ID = 7
+RESULT_INVALID_PIN = 9
+
+# Byte 10 of the unlinked channel setup request
+_SETUP_CHANNEL = 0x14
+
+DEFAULT_STATISTICS = {
+    "totalRunningTime": 3600 * 300,
+    "totalCuttingTime": 3600 * 250,
+    "totalChargingTime": 3600 * 120,
+    "totalSearchingTime": 3600 * 20,
+    "numberOfCollisions": 4321,
+    "numberOfChargingCycles": 654,
+    "cuttingBladeUsageTime": 3600 * 40,
+}
+
+
+class EmulatedMower:
+    """
+    The state of an emulated mower. `transport` is a transport factory,
+    the state is kept across connections.
+
+    `messages` is the message log, newest first, as dicts with `time`,
+    `code` and `severity`. `tasks` is the schedule as dicts with the
+    GetTask response fields. `values` overrides the response of any
+    command, either with a value or with a function of the request
+    parameters.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        mtu_size: int = 23,
+        chunk_size: int | None = None,
+        chunk_interval: float = 0.0,
+        manufacturer: str = "Husqvarna",
+        device_type: str = "Automower",
+        model_name: str = "305",
+        device_type_id: int = 23,
+        device_variant: int = 1,
+        serial_number: int = 123456789,
+        name: str = "Emulated mower",
+        pin: int | None = None,
+        battery_level: int = 100,
+        is_charging: bool = False,
+        remaining_charging_time: int = 0,
+        mode: ModeOfOperation = ModeOfOperation.AUTO,
+        state: MowerState = MowerState.RESTRICTED,
+        activity: MowerActivity = MowerActivity.PARKED,
+        error: int = 0,
+        next_start_time: int = 0,
+        restriction_reason: int = 0,
+        statistics: dict | None = None,
+        messages: list[dict] | None = None,
+        tasks: list[dict] | None = None,
+        values: dict | None = None,
+    ):
+        self.latency = latency
+        self.mtu_size = mtu_size
+        self.chunk_size = mtu_size - 3 if chunk_size is None else chunk_size
+        self.chunk_interval = chunk_interval
+
+        self.manufacturer = manufacturer
+        self.device_type = device_type
+        self.model_name = model_name
+        self.device_type_id = device_type_id
+        self.device_variant = device_variant
+        self.serial_number = serial_number
+        self.name = name
+        self.pin = pin
+
+        self.battery_level = battery_level
+        self.is_charging = is_charging
+        self.remaining_charging_time = remaining_charging_time
+        self.mode = mode
+        self.state = state
+        self.activity = activity
+        self.error = error
+        self.next_start_time = next_start_time
+        self.restriction_reason = restriction_reason
+        self.statistics = dict(DEFAULT_STATISTICS if statistics is None else statistics)
+        self.messages = [] if messages is None else messages
+        self.tasks = [] if tasks is None else tasks
+        self.values = {} if values is None else values
+
+        self.override = {"action": OverrideAction.NONE, "startTime": 0, "duration": 0}
+        self.logged_in = False
+        self.channel_id = None
+
+        # Command name -> number of requests received
+        self.requests = {}
+        self.connections = 0
+        self._transports = []
+
+        self.registry = get_registry()
+
+    def transport(self, device=None, disconnected_callback=None) -> "EmulatedTransport":
+        transport = EmulatedTransport(self, disconnected_callback)
+        self._transports.append(transport)
+        return transport
+
+    def emit_event(self, name: str, value=None) -> None:
+        """Send an event frame of command `name` to every connection"""
+        frame = self.registry[name].codec.encode_response(
+            self.channel_id, value, packet_type=PACKET_EVENT
+        )
+        for transport in self._transports:
+            transport.notify(frame)
+
+    def _zero(self, definition):
+        codec = definition.codec
+        if codec.no_response:
+            return None
+        if codec.response_ascii:
+            return ""
+        return {name: 0 for name in codec.response_fields}
+
+    def respond(self, name: str, params: dict) -> tuple[int, object]:
+        """Return (result, value) for a request, changing state as needed"""
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+        if name in self.values:
+            value = self.values[name]
+            return RESULT_OK, value(params) if callable(value) else value
+
+        if name == "GetMessage":
+            if params["messageId"] >= len(self.messages):
+                return RESULT_INVALID_ID, None
+            return RESULT_OK, self.messages[params["messageId"]]
+        if name == "GetTask":
+            if params["taskId"] >= len(self.tasks):
+                return RESULT_INVALID_ID, None
+            return RESULT_OK, self.tasks[params["taskId"]]
+        if name == "EnterOperatorPin":
+            if self.pin is not None and params["code"] != self.pin:
+                return RESULT_INVALID_PIN, None
+            self.logged_in = True
+            return RESULT_OK, None
+
+        getter = {
+            "GetBatteryLevel": lambda: self.battery_level,
+            "IsCharging": lambda: int(self.is_charging),
+            "GetRemainingChargingTime": lambda: self.remaining_charging_time,
+            "GetModel": lambda: {
+                "deviceType": self.device_type_id,
+                "deviceVariant": self.device_variant,
+            },
+            "GetSerialNumber": lambda: self.serial_number,
+            "GetUserMowerNameAsAsciiString": lambda: self.name,
+            "GetMode": lambda: int(self.mode),
+            "GetState": lambda: int(self.state),
+            "GetActivity": lambda: int(self.activity),
+            "GetError": lambda: self.error,
+            "GetNextStartTime": lambda: self.next_start_time,
+            "GetRestrictionReason": lambda: self.restriction_reason,
+            "GetOverride": lambda: dict(self.override),
+            "GetAllStatistics": lambda: self.statistics,
+            "GetNumberOfMessages": lambda: len(self.messages),
+            "GetNumberOfTasks": lambda: len(self.tasks),
+            "IsOperatorLoggedIn": lambda: int(self.logged_in),
+        }.get(name)
+        if getter is not None:
+            return RESULT_OK, getter()
+
+        if name == "SetMode":
+            self.mode = ModeOfOperation(params["mode"])
+        elif name == "Pause":
+            self.state = MowerState.PAUSED
+        elif name == "StartTrigger":
+            self.state = MowerState.IN_OPERATION
+            self.activity = MowerActivity.GOING_OUT
+        elif name == "SetOverrideMow":
+            self.override = {
+                "action": OverrideAction.FORCEDMOW,
+                "startTime": 0,
+                "duration": params["duration"],
+            }
+            self.state = MowerState.IN_OPERATION
+            self.activity = MowerActivity.GOING_OUT
+        elif name in ("SetOverridePark", "SetOverrideParkUntilNextStart"):
+            self.override = {
+                "action": OverrideAction.FORCEDPARK,
+                "startTime": 0,
+                "duration": params.get("duration", 0),
+            }
+            self.activity = MowerActivity.GOING_HOME
+        elif name == "ClearOverride":
+            self.override = {
+                "action": OverrideAction.NONE,
+                "startTime": 0,
+                "duration": 0,
+            }
+
+        return RESULT_OK, self._zero(self.registry[name])
+
+    def handle_frame(self, frame: bytes) -> bytes | None:
+        """Return the response to a request frame, None to ignore it"""
+        if frame[8] != 0x01:
+            if frame[10] == _SETUP_CHANNEL:
+                self.channel_id = int.from_bytes(frame[11:15], byteorder="little")
+            # BLEClient does not look at the answers to the channel setup
+            # and the handshake, the frame is echoed
+            return bytes(frame)
+
+        channel_id = int.from_bytes(frame[4:8], byteorder="little")
+        if channel_id != self.channel_id:
+            logger.warning("Request on unknown channel %08x", channel_id)
+            return None
+
+        definition = self.registry.lookup_frame(frame)
+        if definition is None:
+            logger.warning("Unknown command %d, %d", frame[12], frame[14])
+            return None
+
+        codec = definition.codec
+        result, value = self.respond(definition.name, codec.decode_request(frame))
+        return codec.encode_response(
+            channel_id, value if result == RESULT_OK else None, result=result
+        )
+
+
+class EmulatedTransport(Transport):
+    """One connection to an `EmulatedMower`"""
+
+    def __init__(self, mower: EmulatedMower, disconnected_callback=None):
+        self.mower = mower
+        self.disconnected_callback = disconnected_callback
+        self.mtu_size = mower.mtu_size
+        self.services = GattServices(
+            [
+                GattService(
+                    SERVICE_UUID,
+                    mower.manufacturer,
+                    [
+                        GattCharacteristic(
+                            WRITE_CHAR_UUID, ["write-without-response", "write"]
+                        ),
+                        GattCharacteristic(READ_CHAR_UUID, ["notify"]),
+                        GattCharacteristic(
+                            DEVICE_TYPE_CHAR_UUID,
+                            ["read"],
+                            mower.device_type.encode(),
+                        ),
+                        GattCharacteristic(
+                            DEVICE_NAME_CHAR_UUID,
+                            ["read"],
+                            mower.model_name.encode(),
+                        ),
+                    ],
+                )
+            ]
+        )
+
+        self.framer = FrameAssembler()
+        self._connected = False
+        self._callback = None
+        self._outgoing = None
+        self._sender = None
+
+        self.frames_received = 0
+        self.notifications = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def connect(self) -> None:
+        self._connected = True
+        self.mower.connections += 1
+
+    async def pair(self) -> None:
+        pass
+
+    async def _close(self) -> None:
+        if self._sender is not None:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+            self._sender = None
+        self._callback = None
+        self._connected = False
+
+    async def disconnect(self) -> None:
+        await self._close()
+
+    async def drop_link(self) -> None:
+        """Emulate the link going down, the disconnected callback is called"""
+        await self._close()
+        if self.disconnected_callback is not None:
+            self.disconnected_callback(self)
+
+    def _characteristic(self, char) -> GattCharacteristic:
+        uuid = char if isinstance(char, str) else char.uuid
+        characteristic = self.services.get_characteristic(uuid)
+        if characteristic is None:
+            raise ValueError("Unknown characteristic " + uuid)
+        return characteristic
+
+    async def read_gatt_char(self, char) -> bytearray:
+        if not self._connected:
+            raise ConnectionError("Not connected")
+        return bytearray(self._characteristic(char).value)
+
+    async def write_gatt_char(self, char, data, response: bool = False) -> None:
+        if not self._connected:
+            raise ConnectionError("Not connected")
+        if self._characteristic(char).uuid != WRITE_CHAR_UUID:
+            raise ValueError("Characteristic is not writable")
+        if len(data) > self.mtu_size - 3:
+            raise ValueError("Write of %d bytes exceeds the MTU" % len(data))
+
+        for frame in self.framer.feed(data):
+            self.frames_received += 1
+            response = self.mower.handle_frame(frame)
+            if response is not None:
+                self.notify(response, self.mower.latency)
+
+    def notify(self, frame: bytes, delay: float = 0.0) -> None:
+        """Queue a frame for the client, after the ones already queued"""
+        if self._connected and self._outgoing is not None:
+            loop = asyncio.get_running_loop()
+            self._outgoing.put_nowait((loop.time() + delay, frame))
+
+    async def start_notify(self, char, callback) -> None:
+        if self._characteristic(char).uuid != READ_CHAR_UUID:
+            raise ValueError("Characteristic does not notify")
+        self._callback = callback
+        self._outgoing = asyncio.Queue()
+        self._sender = asyncio.get_running_loop().create_task(self._send(char))
+
+    async def stop_notify(self, char) -> None:
+        self._callback = None
+
+    async def _send(self, char) -> None:
+        # Responses leave one after the other, like from a single radio
+        loop = asyncio.get_running_loop()
+        chunk_size = self.mower.chunk_size
+        while True:
+            ready, frame = await self._outgoing.get()
+            delay = ready - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            for i in range(0, len(frame), chunk_size):
+                if i and self.mower.chunk_interval:
+                    await asyncio.sleep(self.mower.chunk_interval)
+                if self._callback is None:
+                    break
+                self.notifications += 1
+                self._callback(char, bytearray(frame[i : i + chunk_size]))
@@ -0,0 +1,145 @@
+"""
+Frames the mower sends on its own
+
+Byte 10 of the header is 0x02 for events. They are never the answer to a
+request, so `BLEClient` hands them to its `EventStream` instead of the
+response dispatcher. Consumers either register a callback or iterate over
+the events, both get them as they arrive.
+
+Events are decoded through the protocol.json registry, assuming the same
+layout as responses. Events of commands that are not in protocol.json are
+still delivered, with `command` and `values` set to None.
+"""
+
+import asyncio
+import logging
+import time
+
+from .registry import decode_frame
+
+logger = logging.getLogger(__name__)
+
+
+class MowerEvent:
+    """
+    An event frame. `command` is its protocol.json entry and `values` the
+    decoded fields, or the value for commands with a single field. `error`
+    is set if decoding failed.
+    """
+
+    __slots__ = ("timestamp", "command", "values", "error", "frame")
+
+    def __init__(self, timestamp: float, command, values, error, frame: bytes):
+        self.timestamp = timestamp
+        self.command = command
+        self.values = values
+        self.error = error
+        self.frame = frame
+
+    @property
+    def name(self) -> str | None:
+        return None if self.command is None else self.command.name
+
+    @property
+    def major(self) -> int:
+        return self.frame[12] | (self.frame[13] << 8)
+
+    @property
+    def minor(self) -> int:
+        return self.frame[14] | (self.frame[15] << 8)
+
+    def __repr__(self) -> str:
+        return "MowerEvent(%s, %r)" % (
+            self.name or "(%d, %d)" % (self.major, self.minor),
+            self.values,
+        )
+
+
+def decode_event(frame: bytes, timestamp: float | None = None) -> MowerEvent:
+    if timestamp is None:
+        timestamp = time.time()
+
+    frame = bytes(frame)
+    command, values, error = decode_frame(frame)
+    if error is not None:
+        logger.warning("Unable to decode %s event: %s", command.name, error)
+    elif isinstance(values, dict) and list(values) == ["response"]:
+        # Single values are unwrapped, like `Mower.command` does
+        values = values["response"]
+
+    return MowerEvent(timestamp, command, values, error, frame)
+
+
+class EventStream:
+    """
+    Delivers events to callbacks and async iterators. Every iterator has
+    its own queue of up to `queue_size` events, when a consumer falls
+    behind its oldest events are dropped.
+    """
+
+    def __init__(self, queue_size: int = 64):
+        self.queue_size = queue_size
+        self._callbacks = []
+        self._queues = []
+
+        self.events = 0
+        self.dropped = 0
+
+    def subscribe(self, callback, name: str | None = None):
+        """
+        Call `callback` with every event, or only the events of command
+        `name`. Returns a function that removes the subscription.
+        """
+        entry = (callback, name)
+        self._callbacks.append(entry)
+
+        def unsubscribe():
+            if entry in self._callbacks:
+                self._callbacks.remove(entry)
+
+        return unsubscribe
+
+    async def iterate(self, name: str | None = None):
+        """Async iterator over the events, or only those of command `name`"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        entry = (queue, name)
+        self._queues.append(entry)
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self._queues.remove(entry)
+
+    def __aiter__(self):
+        return self.iterate()
+
+    def publish(self, frame: bytes, timestamp: float | None = None) -> MowerEvent:
+        event = decode_event(frame, timestamp)
+        self.events += 1
+
+        for callback, name in list(self._callbacks):
+            if name is None or name == event.name:
+                try:
+                    callback(event)
+                except Exception:
+                    logger.exception("Event callback failed")
+
+        for queue, name in self._queues:
+            if name is None or name == event.name:
+                self._put(queue, event)
+
+        return event
+
+    def _put(self, queue: asyncio.Queue, event) -> None:
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(event)
+
+    def close(self) -> None:
+        """End every iterator"""
+        for queue, _ in self._queues:
+            self._put(queue, None)
@@ -0,0 +1,255 @@
+"""
+Polling many mowers from one host
+
+Only a limited number of BLE connections can be open at the same time, so
+the fleet connects to each mower in turn, polls it and disconnects again.
+Of the mowers whose poll is due the one with the highest priority goes
+first, then the one that has been waiting longest. Results from every
+mower come out of a single stream.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+
+from .mower import Mower
+from .session import find_device_by_address
+
+logger = logging.getLogger(__name__)
+
+
+class FleetMember:
+    """A mower managed by a `Fleet`"""
+
+    def __init__(
+        self,
+        address: str,
+        pin: int | None = None,
+        channel_id: int | None = None,
+        poll_interval: float = 60.0,
+        priority: int = 0,
+    ):
+        self.address = address
+        self.pin = pin
+        if channel_id is None:
+            channel_id = random.randint(1, 0xFFFFFFFF)
+        self.channel_id = channel_id
+        self.poll_interval = poll_interval
+        self.priority = priority
+
+        self.mower = None
+        self.polls = 0
+        self.failures = 0
+
+
+class PollResult:
+    """The outcome of polling one mower"""
+
+    def __init__(self, address: str, timestamp: float, duration: float, value, error):
+        self.address = address
+        self.timestamp = timestamp
+        self.duration = duration
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def poll_snapshot(mower: Mower):
+    return await mower.snapshot()
+
+
+def create_mower(member: FleetMember) -> Mower:
+    return Mower(member.channel_id, member.address, member.pin, fast_connect=True)
+
+
+class Fleet:
+    """
+    Poll a set of mowers using at most `max_connections` connections at a
+    time. `poll` is called with the connected mower and its return value
+    is the value of the `PollResult`.
+    """
+
+    def __init__(
+        self,
+        members: list[FleetMember],
+        max_connections: int = 3,
+        poll=poll_snapshot,
+        mower_factory=create_mower,
+        find_device=find_device_by_address,
+        poll_timeout: float = 120.0,
+        max_results: int = 1000,
+    ):
+        self.max_connections = max_connections
+        self.poll = poll
+        self.mower_factory = mower_factory
+        self.find_device = find_device
+        self.poll_timeout = poll_timeout
+
+        self.active_connections = 0
+        self.peak_connections = 0
+        self.dropped_results = 0
+
+        self._results = asyncio.Queue(maxsize=max_results)
+        self._slots = asyncio.Semaphore(max_connections)
+        self._wakeup = asyncio.Event()
+        self._order = itertools.count()
+        # (due, order, member) waiting for their poll to be due, and
+        # (-priority, due, order, member) that are due
+        self._waiting = []
+        self._ready = []
+        self._tasks = set()
+        self._scheduler = None
+        self._stopping = False
+
+        self.members = {}
+        for member in members:
+            self.add(member)
+
+    def add(self, member: FleetMember, delay: float = 0.0) -> None:
+        """Add a mower, its first poll is due after `delay` seconds"""
+        self.members[member.address] = member
+        self._push(member, time.monotonic() + delay)
+
+    def remove(self, address: str) -> None:
+        """Stop polling a mower, a poll in progress is completed"""
+        self.members.pop(address, None)
+
+    def _push(self, member: FleetMember, due: float) -> None:
+        heapq.heappush(self._waiting, (due, next(self._order), member))
+        self._wakeup.set()
+
+    async def _next_due(self) -> FleetMember | None:
+        while not self._stopping:
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                due, order, member = heapq.heappop(self._waiting)
+                heapq.heappush(self._ready, (-member.priority, due, order, member))
+
+            while self._ready:
+                member = heapq.heappop(self._ready)[3]
+                # Skip mowers that have been removed from the fleet
+                if self.members.get(member.address) is member:
+                    return member
+
+            delay = self._waiting[0][0] - now if self._waiting else None
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+        return None
+
+    async def _schedule(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            await self._slots.acquire()
+            member = await self._next_due()
+            if member is None:
+                self._slots.release()
+                break
+
+            task = loop.create_task(self._poll_member(member))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _connect_and_poll(self, member: FleetMember):
+        if member.mower is None:
+            member.mower = self.mower_factory(member)
+        mower = member.mower
+
+        device = await self.find_device(member.address)
+        if device is None:
+            raise ConnectionError("Device not found")
+
+        # Also disconnects when connecting fails or hangs past the timeout
+        try:
+            if not await mower.connect(
+                device, read_device_info=mower.device_info is None
+            ):
+                raise ConnectionError("Unable to connect")
+
+            return await self.poll(mower)
+        finally:
+            if mower.is_connected():
+                await mower.disconnect()
+
+    async def _poll_member(self, member: FleetMember) -> None:
+        start = time.monotonic()
+        value = error = None
+
+        self.active_connections += 1
+        self.peak_connections = max(self.peak_connections, self.active_connections)
+        try:
+            value = await asyncio.wait_for(
+                self._connect_and_poll(member), self.poll_timeout
+            )
+        except Exception as e:
+            logger.warning("Polling '%s' failed: %s", member.address, e)
+            error = e
+        finally:
+            self.active_connections -= 1
+            self._slots.release()
+
+        member.polls += 1
+        if error is not None:
+            member.failures += 1
+
+        self._put_result(
+            PollResult(
+                member.address, time.time(), time.monotonic() - start, value, error
+            )
+        )
+
+        if self.members.get(member.address) is member and not self._stopping:
+            self._push(member, start + member.poll_interval)
+
+    def _put_result(self, result: PollResult | None) -> None:
+        if self._results.full():
+            # Nobody is consuming the results, drop the oldest
+            self._results.get_nowait()
+            self.dropped_results += 1
+        self._results.put_nowait(result)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._scheduler = asyncio.get_running_loop().create_task(self._schedule())
+
+    async def stop(self) -> None:
+        """Stop scheduling polls and wait for the ones in progress"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        self._put_result(None)
+
+    async def __aenter__(self) -> "Fleet":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def results(self):
+        """Async iterator over the results of every mower, ends on `stop()`"""
+        while True:
+            result = await self._results.get()
+            if result is None:
+                return
+            yield result
@@ -0,0 +1,92 @@
+"""
+Reassembly of Automower frames from a stream of BLE notifications
+
+A frame looks like:
+    0x02 0xFD <length: uint16> ... <header CRC at byte 9> ... <CRC> 0x03
+where the total size of the frame is `length + 4`.
+"""
+
+from .helpers import crc
+
+# The smallest possible frame is the 10 byte header plus CRC and end byte
+MIN_FRAME_SIZE = 12
+
+
+class FrameAssembler:
+    """
+    Incremental framer. Chunks are passed to `feed()` as they arrive and
+    complete, CRC checked frames are returned. Any number of frames can be
+    in a single chunk and a frame can be split over any number of chunks.
+    Garbage is skipped by resynchronising on the 0x02 start byte.
+    """
+
+    def __init__(self, max_frame_size: int = 1024):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+        self.frames = 0
+        self.header_errors = 0
+        self.crc_errors = 0
+        self.discarded_bytes = 0
+
+    @property
+    def buffered(self) -> int:
+        """Number of bytes received that are not part of a complete frame yet"""
+        return len(self._buffer)
+
+    def reset(self) -> None:
+        self._buffer.clear()
+
+    def feed(self, data: bytes) -> list[bytearray]:
+        buffer = self._buffer
+        buffer += data
+
+        frames = []
+        pos = 0
+        end_of_data = len(buffer)
+        while pos < end_of_data:
+            start = buffer.find(0x02, pos)
+            if start < 0:
+                self.discarded_bytes += end_of_data - pos
+                pos = end_of_data
+                break
+            self.discarded_bytes += start - pos
+            pos = start
+
+            if end_of_data - pos < 10:
+                # Wait for the rest of the header
+                break
+
+            size = (buffer[pos + 2] | (buffer[pos + 3] << 8)) + 4
+            if (
+                buffer[pos + 1] != 0xFD
+                or buffer[pos + 9] != crc(buffer, pos + 1, pos + 8)
+                or size < MIN_FRAME_SIZE
+                or size > self.max_frame_size
+            ):
+                # Not the start of a frame, skip over this 0x02
+                self.header_errors += 1
+                self.discarded_bytes += 1
+                pos += 1
+                continue
+
+            end = pos + size
+            if end > end_of_data:
+                # Wait for the rest of the frame
+                break
+
+            if buffer[end - 1] != 0x03 or buffer[end - 2] != crc(
+                buffer, pos + 1, end - 3
+            ):
+                self.crc_errors += 1
+                self.discarded_bytes += 1
+                pos += 1
+                continue
+
+            frames.append(buffer[pos:end])
+            self.frames += 1
+            pos = end
+
+        del buffer[:pos]
+
+        return frames
@@ -0,0 +1,89 @@
+"""
+The message log of the mower
+
+Message 0 is the newest one. `Mower.messages()` streams the log with
+several GetMessage requests in flight, and `Mower.sync_messages()` only
+fetches the messages that are newer than the ones seen at the previous
+sync, using a high-water mark kept in a `MessageStore`.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .error_codes import ErrorCodes
+
+
+class MowerMessage:
+    __slots__ = ("time", "code", "severity")
+
+    def __init__(self, time: int, code: int, severity: int):
+        self.time = time
+        self.code = code
+        self.severity = severity
+
+    @property
+    def key(self) -> tuple[int, int]:
+        """(time, code), identifies a message in the log"""
+        return (self.time, self.code)
+
+    @property
+    def datetime(self) -> datetime:
+        return datetime.fromtimestamp(self.time, timezone.utc)
+
+    @property
+    def error(self) -> "ErrorCodes | None":
+        # The table is only loaded when it is needed
+        from .error_codes import ErrorCodes
+
+        try:
+            return ErrorCodes(self.code)
+        except ValueError:
+            return None
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, MowerMessage):
+            return NotImplemented
+        return (self.time, self.code, self.severity) == (
+            other.time,
+            other.code,
+            other.severity,
+        )
+
+    def __repr__(self) -> str:
+        return "MowerMessage(time=%d, code=%d, severity=%d)" % (
+            self.time,
+            self.code,
+            self.severity,
+        )
+
+
+class MessageStore:
+    """
+    The high-water mark of every mower, the (time, code) of the newest
+    message seen, kept in a small JSON file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path) as f:
+                self._marks = json.load(f)
+        except FileNotFoundError:
+            self._marks = {}
+
+    def get(self, address: str) -> tuple[int, int] | None:
+        mark = self._marks.get(address)
+        return None if mark is None else tuple(mark)
+
+    def set(self, address: str, mark: tuple[int, int]) -> None:
+        self._marks[address] = list(mark)
+
+        # Write a new file and rename it, so a crash never leaves a
+        # truncated store behind
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._marks, f)
+        os.replace(tmp, self.path)
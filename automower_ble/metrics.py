@@ -0,0 +1,202 @@
+"""
+Metrics of the BLE link
+
+Every client records into a process wide `MetricsRegistry`, labelled with
+the device address and, where it applies, the command name:
+
+    automower_requests_total              requests answered or given up
+    automower_request_latency_seconds     time to the response, histogram
+    automower_retries_total               requests sent again
+    automower_timeouts_total              attempts without a response
+    automower_request_failures_total      requests given up after retrying
+    automower_validation_failures_total   responses failing validation
+    automower_tx_bytes_total / _chunks    data written to the mower
+    automower_rx_bytes_total / _chunks    notifications received
+    automower_connect_phase_seconds       time per connect phase, histogram
+
+Recording is a dictionary update, cheap enough to be always on. The
+registry is exported in the OpenMetrics text format with
+`to_openmetrics()`, and callbacks added with `subscribe()` see every
+update as it happens.
+"""
+
+import bisect
+import threading
+
+# Upper bounds of the histogram buckets in seconds, +Inf is implied
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+# Metric family -> (type, help)
+METRICS = {
+    "automower_requests": (COUNTER, "Requests answered or given up"),
+    "automower_request_latency_seconds": (
+        HISTOGRAM,
+        "Time from sending a request to its response",
+    ),
+    "automower_retries": (COUNTER, "Requests sent again after a timeout"),
+    "automower_timeouts": (COUNTER, "Attempts that got no response in time"),
+    "automower_request_failures": (COUNTER, "Requests given up after retrying"),
+    "automower_validation_failures": (COUNTER, "Responses that failed validation"),
+    "automower_tx_bytes": (COUNTER, "Bytes written to the mower"),
+    "automower_tx_chunks": (COUNTER, "Writes to the mower"),
+    "automower_rx_bytes": (COUNTER, "Bytes received in notifications"),
+    "automower_rx_chunks": (COUNTER, "Notifications received"),
+    "automower_connect_phase_seconds": (HISTOGRAM, "Time taken by a connect phase"),
+}
+
+
+class Histogram:
+    """Counts of observed values per bucket, with their sum"""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # The last count is for values above every bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, count of values up to it), ending with +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: str = "") -> str:
+    parts = ['%s="%s"' % (name, _escape(value)) for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms keyed on the metric family and a tuple of
+    (label, value) pairs
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # (family, labels) -> value
+        self.counters = {}
+        # (family, labels) -> Histogram
+        self.histograms = {}
+        self._hooks = []
+
+    def inc(self, family: str, labels: tuple, value: int = 1) -> None:
+        key = (family, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+        if self._hooks:
+            self._notify(family, labels, value)
+
+    def observe(self, family: str, labels: tuple, value: float) -> None:
+        key = (family, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+        if self._hooks:
+            self._notify(family, labels, value)
+
+    def subscribe(self, callback):
+        """
+        Call `callback(family, labels, value)` on every update, with the
+        increment for counters and the observed value for histograms.
+        Returns a function that removes the callback.
+        """
+        self._hooks.append(callback)
+
+        def unsubscribe():
+            if callback in self._hooks:
+                self._hooks.remove(callback)
+
+        return unsubscribe
+
+    def _notify(self, family: str, labels: tuple, value) -> None:
+        for callback in list(self._hooks):
+            callback(family, labels, value)
+
+    def counter(self, family: str, **labels) -> int:
+        """The value of a counter, 0 if it was never incremented"""
+        return self.counters.get((family, tuple(labels.items())), 0)
+
+    def histogram(self, family: str, **labels) -> Histogram | None:
+        return self.histograms.get((family, tuple(labels.items())))
+
+    def clear(self) -> None:
+        self.counters.clear()
+        self.histograms.clear()
+
+    def to_openmetrics(self) -> str:
+        """The registry in the OpenMetrics text exposition format"""
+        families = {}
+        for (family, labels), value in self.counters.items():
+            families.setdefault(family, []).append((labels, value))
+        for (family, labels), histogram in self.histograms.items():
+            families.setdefault(family, []).append((labels, histogram))
+
+        lines = []
+        for family in sorted(families):
+            samples = families[family]
+            kind = HISTOGRAM if isinstance(samples[0][1], Histogram) else COUNTER
+            description = METRICS.get(family, (kind, ""))[1]
+            lines.append("# TYPE %s %s" % (family, kind))
+            if description:
+                lines.append("# HELP %s %s" % (family, description))
+
+            for labels, value in sorted(samples, key=lambda item: item[0]):
+                if kind == COUNTER:
+                    lines.append(
+                        "%s_total%s %d" % (family, _format_labels(labels), value)
+                    )
+                    continue
+
+                for bound, count in value.cumulative():
+                    le = 'le="%s"' % _format_bound(bound)
+                    lines.append(
+                        "%s_bucket%s %d" % (family, _format_labels(labels, le), count)
+                    )
+                lines.append(
+                    "%s_sum%s %r" % (family, _format_labels(labels), value.sum)
+                )
+                lines.append(
+                    "%s_count%s %d" % (family, _format_labels(labels), value.count)
+                )
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the registry shared by every client"""
+    global _metrics
+
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = MetricsRegistry()
+
+    return _metrics
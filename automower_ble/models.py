@@ -5,6 +5,8 @@ A list of supported Automower models
 
 # Copyright: Alistair Francis <alistair@alistair23.me>
 class ModelInformation:
+    __slots__ = ("manufacturer", "model")
+
     def __init__(self, manufacturer: str, model: str):
         self.manufacturer = manufacturer
         self.model = model
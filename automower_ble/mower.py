@@ -6,85 +6,394 @@ how the request and response classes can be used.
 
 # Copyright: Alistair Francis <alistair@alistair23.me>
 
-import argparse
 import asyncio
 import logging
+from collections import deque
 from datetime import datetime, timezone
 
 from .protocol import (
     BLEClient,
-    Command,
     MowerState,
     MowerActivity,
     ModeOfOperation,
     TaskInformation,
 )
-from .models import MowerModels
-from .error_codes import ErrorCodes
-
-from bleak import BleakScanner
+from .cache import ResponseCache
+from .messages import MessageStore, MowerMessage
+from .records import as_dict, get_records
+from .registry import CommandDefinition
+from .schedule import Schedule, Task
 
 logger = logging.getLogger(__name__)
 
 
+class CommandResult:
+    """The outcome of a single command sent as part of a batch"""
+
+    def __init__(self, command_name: str, kwargs: dict, value=None, error=None):
+        self.command_name = command_name
+        self.kwargs = kwargs
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class MowerSnapshot:
+    """
+    The decoded status of a mower, as returned by `Mower.snapshot()`.
+    Fields that were not requested or could not be read are None, the
+    reason for each failed command is in `errors`. Values are typed as
+    returned by `Mower.read()`, `statistics` is a GetAllStatisticsResponse.
+    """
+
+    __slots__ = (
+        "timestamp",
+        "manufacturer",
+        "model",
+        "is_charging",
+        "battery_level",
+        "remaining_charging_time",
+        "mode",
+        "state",
+        "activity",
+        "error_code",
+        "next_start_time",
+        "statistics",
+        "serial_number",
+        "name",
+        "errors",
+    )
+
+    def __init__(self):
+        self.timestamp = None
+        self.manufacturer = None
+        self.model = None
+        self.is_charging = None
+        self.battery_level = None
+        self.remaining_charging_time = None
+        self.mode = None
+        self.state = None
+        self.activity = None
+        self.error_code = None
+        self.next_start_time = None
+        self.statistics = None
+        self.serial_number = None
+        self.name = None
+        self.errors = {}
+
+
+def _next_start_time(value) -> datetime | None:
+    if value == 0:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def _model_information(model):
+    # The table is only loaded when it is needed
+    from .models import MowerModels
+
+    return MowerModels.get((model.deviceType, model.deviceVariant))
+
+
+def _manufacturer(model) -> str:
+    model_information = _model_information(model)
+    if model_information is None:
+        return f"Unknown Manufacturer ({model.deviceType}, {model.deviceVariant})"
+    return model_information.manufacturer
+
+
+def _model(model) -> str:
+    model_information = _model_information(model)
+    if model_information is None:
+        return f"Unknown Model ({model.deviceType}, {model.deviceVariant})"
+    return model_information.model
+
+
+# Snapshot field -> (command, conversion of the command's value)
+SNAPSHOT_FIELDS = {
+    "manufacturer": ("GetModel", _manufacturer),
+    "model": ("GetModel", _model),
+    "is_charging": ("IsCharging", bool),
+    "battery_level": ("GetBatteryLevel", None),
+    "remaining_charging_time": ("GetRemainingChargingTime", None),
+    "mode": ("GetMode", ModeOfOperation),
+    "state": ("GetState", MowerState),
+    "activity": ("GetActivity", MowerActivity),
+    "error_code": ("GetError", None),
+    "next_start_time": ("GetNextStartTime", _next_start_time),
+    "statistics": ("GetAllStatistics", None),
+    "serial_number": ("GetSerialNumber", None),
+    "name": ("GetUserMowerNameAsAsciiString", None),
+}
+
+
+class FieldChange:
+    """A `MowerSnapshot` field that changed, as yielded by `Mower.watch()`"""
+
+    __slots__ = ("field", "value", "previous", "timestamp")
+
+    def __init__(self, field: str, value, previous, timestamp: datetime):
+        self.field = field
+        self.value = value
+        self.previous = previous
+        self.timestamp = timestamp
+
+    def __repr__(self) -> str:
+        return "FieldChange(%s: %r -> %r)" % (self.field, self.previous, self.value)
+
+
+# The fields `Mower.watch()` reports by default
+WATCH_FIELDS = (
+    "state",
+    "activity",
+    "battery_level",
+    "is_charging",
+    "remaining_charging_time",
+    "error_code",
+)
+
+# The fields that decide how often `Mower.watch()` polls
+_WATCH_CONTROL = ("state", "activity", "remaining_charging_time")
+
+
 class Mower(BLEClient):
-    def __init__(self, channel_id: int, address, pin=None):
-        super().__init__(channel_id, address, pin)
+    def __init__(self, channel_id: int, address, pin=None, cache_policy=None, **kwargs):
+        super().__init__(channel_id, address, pin, **kwargs)
 
-    async def command(self, command_name: str, **kwargs):
+        # Pass cache_policy={} to disable caching
+        self.cache = ResponseCache(cache_policy)
+
+    async def connect(self, device, **kwargs) -> bool:
+        self.cache.clear()
+        return await super().connect(device, **kwargs)
+
+    async def disconnect(self):
+        self.cache.clear()
+        await super().disconnect()
+
+    async def _execute(self, command_name: str, kwargs: dict) -> tuple[bool, object]:
         """
-        This function is used to simplify the communication of the mower using the commands found in protocol.json.
-        It will send a request to the mower and then wait for a response. The response will be parsed and returned to the caller.
+        Send a command and decode its response. Returns whether a response
+        was received together with the decoded value.
         """
-        command = Command(self.channel_id, self.protocol[command_name])
+        hit, value = self.cache.get(command_name, kwargs)
+        if hit:
+            return True, value
+
+        command = self.get_command(command_name)
         request = command.generate_request(**kwargs)
         response = await self._request_response(request)
+        self.cache.command_sent(command_name)
         if response is None:
-            return None
+            return False, None
 
         if command.validate_response(response) is False:
             # Just log if the response is invalid as this has been seen with user
             # logs from official apps. I.e. it is somewhat expected.
             logger.warning("Response failed validation")
+            self.metrics.inc(
+                "automower_validation_failures",
+                self._labels(command.major, command.minor),
+            )
+
+        value = get_records().decode(command.definition, response)
+
+        self.cache.put(command_name, kwargs, value)
+        return True, value
 
-        response_dict = command.parse_response(response)
-        if (
-            response_dict is not None and len(response_dict) == 1
-        ):  # If there is only one key in the response, return the value
-            return response_dict["response"]
+    async def command(self, command_name: str, **kwargs):
+        """
+        This function is used to simplify the communication of the mower using the commands found in protocol.json.
+        It will send a request to the mower and then wait for a response. The response will be parsed and returned to the caller.
+        """
+        _, value = await self._execute(command_name, kwargs)
+        return as_dict(value)
+
+    async def read(self, command: str | CommandDefinition, **kwargs):
+        """
+        Like `command()`, but responses with several fields are returned as
+        their NamedTuple from records.py instead of a dict. `command` may
+        be a `CommandDefinition` looked up ahead of time.
+        """
+        if isinstance(command, CommandDefinition):
+            command = command.name
+        _, value = await self._execute(command, kwargs)
+        return value
+
+    async def _query(
+        self, command_name: str, kwargs: dict, typed: bool = False
+    ) -> CommandResult:
+        try:
+            responded, value = await self._execute(command_name, kwargs)
+        except Exception as e:
+            logger.error("Command %s failed: %s", command_name, e)
+            return CommandResult(command_name, kwargs, error=e)
+
+        if not responded:
+            return CommandResult(
+                command_name, kwargs, error=TimeoutError("No response from device")
+            )
+
+        return CommandResult(
+            command_name, kwargs, value=value if typed else as_dict(value)
+        )
+
+    async def query_many(
+        self, commands: list, typed: bool = False
+    ) -> list[CommandResult]:
+        """
+        Send several commands as one batch. Each entry is either a command
+        name or a (command name, kwargs) tuple. All requests are issued at
+        once, so up to `window` of them are in flight together. A failing
+        command is reported in its `CommandResult` and does not abort the
+        rest of the batch. With `typed` the values are those of `read()`.
+        """
+        queries = []
+        for entry in commands:
+            if isinstance(entry, str):
+                queries.append(self._query(entry, {}, typed))
+            else:
+                queries.append(self._query(entry[0], dict(entry[1]), typed))
+
+        return list(await asyncio.gather(*queries))
+
+    async def snapshot(self, fields=None) -> MowerSnapshot:
+        """
+        Read the status of the mower in one batch. `fields` is an iterable
+        of `MowerSnapshot` attribute names, all fields are read by default.
+        Every command is only sent once, even if it feeds several fields.
+        """
+        if fields is None:
+            fields = SNAPSHOT_FIELDS.keys()
         else:
-            return response_dict
+            unknown = set(fields) - SNAPSHOT_FIELDS.keys()
+            if unknown:
+                raise ValueError("Unknown snapshot field(s): " + ", ".join(unknown))
+
+        command_names = list(dict.fromkeys(SNAPSHOT_FIELDS[f][0] for f in fields))
+        results = dict(
+            zip(command_names, await self.query_many(command_names, typed=True))
+        )
+
+        snapshot = MowerSnapshot()
+        snapshot.timestamp = datetime.now(timezone.utc)
+        for field in fields:
+            command_name, convert = SNAPSHOT_FIELDS[field]
+            result = results[command_name]
+            if not result.ok:
+                snapshot.errors[command_name] = result.error
+                continue
+
+            value = result.value
+            if convert is not None and value is not None:
+                try:
+                    value = convert(value)
+                except ValueError as e:
+                    snapshot.errors[command_name] = e
+                    continue
+            setattr(snapshot, field, value)
+
+        return snapshot
+
+    async def watch(
+        self,
+        fields=WATCH_FIELDS,
+        fast: float = 10.0,
+        normal: float = 60.0,
+        slow: float = 600.0,
+        long_charge: int = 1800,
+    ):
+        """
+        Async iterator over the `FieldChange`s of the `MowerSnapshot`
+        `fields`, every field is reported on the first poll. How often the
+        mower is polled follows what it is doing:
+
+        - every `fast` seconds while it is going out, mowing or going home
+        - every `slow` seconds while it is parked, or charging with more
+          than `long_charge` seconds to go
+        - every `normal` seconds otherwise
+        - while it is off only GetState is polled, every `slow` seconds
+
+        An event from the mower ends the wait early, and drops the cached
+        value of its command.
+        """
+        fields = tuple(fields)
+        unknown = set(fields) - SNAPSHOT_FIELDS.keys()
+        if unknown:
+            raise ValueError("Unknown snapshot field(s): " + ", ".join(unknown))
+        polled = tuple(dict.fromkeys(fields + _WATCH_CONTROL))
+
+        wake = asyncio.Event()
+
+        def on_event(event):
+            if event.name is not None:
+                self.cache.invalidate(event.name)
+            wake.set()
+
+        unsubscribe = self.events.subscribe(on_event)
+        last = {}
+        try:
+            while True:
+                wake.clear()
+                off = last.get("state") == MowerState.OFF
+                snapshot = await self.snapshot(("state",) if off else polled)
+
+                for field in ("state",) if off else polled:
+                    if SNAPSHOT_FIELDS[field][0] in snapshot.errors:
+                        continue
+                    value = getattr(snapshot, field)
+                    if field in last and last[field] == value:
+                        continue
+                    previous = last.get(field)
+                    last[field] = value
+                    if field in fields:
+                        yield FieldChange(field, value, previous, snapshot.timestamp)
+
+                activity = last.get("activity")
+                if last.get("state") == MowerState.OFF:
+                    interval = slow
+                elif activity in (
+                    MowerActivity.GOING_OUT,
+                    MowerActivity.MOWING,
+                    MowerActivity.GOING_HOME,
+                ):
+                    interval = fast
+                elif activity == MowerActivity.PARKED or (
+                    activity == MowerActivity.CHARGING
+                    and (last.get("remaining_charging_time") or 0) > long_charge
+                ):
+                    interval = slow
+                else:
+                    interval = normal
+
+                try:
+                    await asyncio.wait_for(wake.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            unsubscribe()
 
     async def get_manufacturer(self) -> str | None:
         """Get the mower manufacturer"""
-        model = await self.command("GetModel")
+        model = await self.read("GetModel")
         if model is None:
             return None
 
-        model_information = MowerModels.get(
-            (model["deviceType"], model["deviceVariant"])
-        )
-        if model_information is None:
-            return f"Unknown Manufacturer ({model['deviceType']}, {model['deviceVariant']})"
-
-        return model_information.manufacturer
+        return _manufacturer(model)
 
     async def get_model(self) -> str | None:
         """Get the mower model"""
-        model = await self.command("GetModel")
+        model = await self.read("GetModel")
         if model is None:
             return None
 
-        model_information = MowerModels.get(
-            (model["deviceType"], model["deviceVariant"])
-        )
-        if model_information is None:
-            return f"Unknown Model ({model['deviceType']}, {model['deviceVariant']})"
-
-        return model_information.model
+        return _model(model)
 
     async def is_charging(self) -> bool:
-        if await mower.command("IsCharging"):
+        if await self.command("IsCharging"):
             return True
         else:
             return False
@@ -143,27 +452,105 @@ class Mower(BLEClient):
         # Request trigger to start, the response validation is expected to fail
         await self.command("StartTrigger")
 
+    async def messages(self, prefetch: int = 4, since: tuple[int, int] | None = None):
+        """
+        Async iterator over the message log, newest first. Up to `prefetch`
+        GetMessage requests are sent ahead of the message being yielded.
+        With `since`, the (time, code) of a message, iteration stops at
+        that message or the first one older than it.
+        """
+        self.cache.invalidate("GetNumberOfMessages")
+        count = await self.command("GetNumberOfMessages")
+        if count is None:
+            raise TimeoutError("No response from device")
+
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        next_id = 0
+        try:
+            while next_id < count or pending:
+                while next_id < count and len(pending) < max(1, prefetch):
+                    pending.append(
+                        loop.create_task(self.read("GetMessage", messageId=next_id))
+                    )
+                    next_id += 1
+
+                value = await pending.popleft()
+                if value is None:
+                    raise TimeoutError("No response from device")
+
+                message = MowerMessage(value.time, int(value.code), value.severity)
+                if since is not None and (
+                    message.key == tuple(since) or message.time < since[0]
+                ):
+                    return
+
+                yield message
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def sync_messages(self, store: MessageStore, prefetch: int = 4):
+        """
+        Async iterator over the messages that are newer than the previous
+        sync, newest first. The high-water mark in `store` is only moved
+        once every new message has been yielded, so an interrupted sync
+        is repeated the next time.
+        """
+        newest = None
+        async for message in self.messages(prefetch, since=store.get(self.address)):
+            if newest is None:
+                newest = message
+            yield message
+
+        if newest is not None:
+            store.set(self.address, newest.key)
+
     async def get_task(self, taskid: int) -> TaskInformation | None:
         """
         Get information about a specific task
         """
-        task = await self.command("GetTask", taskId=taskid)
+        task = await self.read("GetTask", taskId=taskid)
         if task is None:
             return None
         return TaskInformation(
-            task["start"],
-            task["duration"],
-            task["useOnMonday"],
-            task["useOnTuesday"],
-            task["useOnWednesday"],
-            task["useOnThursday"],
-            task["useOnFriday"],
-            task["useOnSaturday"],
-            task["useOnSunday"],
+            task.start,
+            task.duration,
+            task.useOnMonday,
+            task.useOnTuesday,
+            task.useOnWednesday,
+            task.useOnThursday,
+            task.useOnFriday,
+            task.useOnSaturday,
+            task.useOnSunday,
+        )
+
+    async def get_schedule(self) -> Schedule | None:
+        """
+        Get every task, all GetTask requests are sent as one batch. Returns
+        None if any of them fails, as a partial schedule would look like a
+        changed one.
+        """
+        # Always read from the mower, a cached schedule would hide changes
+        self.cache.invalidate("GetNumberOfTasks")
+        self.cache.invalidate("GetTask")
+        count = await self.command("GetNumberOfTasks")
+        if count is None:
+            return None
+
+        results = await self.query_many(
+            [("GetTask", {"taskId": task_id}) for task_id in range(count)]
         )
+        if not all(result.ok for result in results):
+            return None
+
+        return Schedule(Task.from_response(result.value) for result in results)
 
 
 async def main(mower: Mower):
+    from bleak import BleakScanner
+
     device = await BleakScanner.find_device_by_address(mower.address)
 
     if device is None:
@@ -174,45 +561,43 @@ async def main(mower: Mower):
         return
 
     await mower.connect(device)
+    for phase, duration in mower.connect_timings.items():
+        logger.info("Connect phase %s took %.3fs", phase, duration)
 
-    manufacturer = await mower.get_manufacturer()
-    print("Mower manufacturer: " + manufacturer)
+    snapshot = await mower.snapshot()
+    for command_name, error in snapshot.errors.items():
+        print("Unable to read " + command_name + ": " + str(error))
 
-    model = await mower.get_model()
-    print("Mower model: " + model)
+    print("Mower manufacturer: " + str(snapshot.manufacturer))
+    print("Mower model: " + str(snapshot.model))
 
-    charging = await mower.is_charging()
-    if charging:
+    if snapshot.is_charging:
         print("Mower is charging")
     else:
         print("Mower is not charging")
 
-    battery_level = await mower.battery_level()
-    print("Battery is: " + str(battery_level) + "%")
+    print("Battery is: " + str(snapshot.battery_level) + "%")
 
-    state = await mower.mower_state()
-    if state is not None:
-        print("Mower state: " + state.name)
+    if snapshot.state is not None:
+        print("Mower state: " + snapshot.state.name)
 
-    activity = await mower.mower_activity()
-    if activity is not None:
-        print("Mower activity: " + activity.name)
+    if snapshot.activity is not None:
+        print("Mower activity: " + snapshot.activity.name)
 
-    next_start_time = await mower.mower_next_start_time()
-    if next_start_time:
-        print("Next start time: " + next_start_time.strftime("%Y-%m-%d %H:%M:%S"))
+    if snapshot.next_start_time:
+        print(
+            "Next start time: " + snapshot.next_start_time.strftime("%Y-%m-%d %H:%M:%S")
+        )
     else:
         print("No next start time")
 
-    statuses = await mower.command("GetAllStatistics")
-    for status, value in statuses.items():
-        print(status, value)
+    if snapshot.statistics is not None:
+        for status, value in snapshot.statistics._asdict().items():
+            print(status, value)
 
-    serial_number = await mower.command("GetSerialNumber")
-    print("Serial number: " + str(serial_number))
+    print("Serial number: " + str(snapshot.serial_number))
 
-    mower_name = await mower.command("GetUserMowerNameAsAsciiString")
-    print("Mower name: " + mower_name)
+    print("Mower name: " + str(snapshot.name))
 
     # print("Running for 3 hours")
     # await mower.mower_override()
@@ -247,20 +632,19 @@ async def main(mower: Mower):
         print("command result = " + str(cmd_result))
 
     # moved last message after command, this seems to cause all future commands/queries to fail
-    last_message = await mower.command("GetMessage", messageId=0)
-    print("Last message: ")
-    print(
-        "\t"
-        + datetime.fromtimestamp(last_message["time"], timezone.utc).strftime(
-            "%Y-%m-%d %H:%M:%S"
-        )
-    )
-    print("\t" + ErrorCodes(last_message["code"]).name)
+    print("Messages:" if args.messages else "Last message: ")
+    async for message in mower.messages(prefetch=4 if args.messages else 1):
+        print("\t" + message.datetime.strftime("%Y-%m-%d %H:%M:%S"))
+        print("\t" + (message.error.name if message.error else str(message.code)))
+        if not args.messages:
+            break
 
     await mower.disconnect()
 
 
 if __name__ == "__main__":
+    import argparse
+
     parser = argparse.ArgumentParser()
 
     device_group = parser.add_mutually_exclusive_group(required=True)
@@ -279,6 +663,18 @@ if __name__ == "__main__":
         help="Send PIN to authenticate. This feature is experimental and might not work.",
     )
 
+    parser.add_argument(
+        "--fast-connect",
+        action="store_true",
+        help="Skip the characteristic dump and the fixed delay when connecting",
+    )
+
+    parser.add_argument(
+        "--messages",
+        action="store_true",
+        help="Print the whole message log instead of only the last message",
+    )
+
     parser.add_argument(
         "--command",
         metavar="<command>",
@@ -288,7 +684,7 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    mower = Mower(1197489078, args.address, args.pin)
+    mower = Mower(1197489078, args.address, args.pin, fast_connect=args.fast_connect)
 
     log_level = logging.INFO
     logging.basicConfig(
@@ -1,15 +1,38 @@
-import binascii
 from .helpers import crc
+from .codec import PACKET_EVENT
+from .dispatcher import ResponseDispatcher, frame_key
+from .events import EventStream
+from .framing import FrameAssembler
+from .metrics import get_metrics
+from .recorder import RECEIVED, SENT, FlightRecorder
+from .registry import CommandDefinition, get_protocol, get_registry
+from .rtt import RttEstimator
+from .transport import (
+    DEVICE_NAME_CHAR_UUID,
+    DEVICE_TYPE_CHAR_UUID,
+    READ_CHAR_UUID,
+    SERVICE_UUID,
+    WRITE_CHAR_UUID,
+    bleak_transport,
+)
+from collections.abc import Mapping
 from enum import IntEnum
 import asyncio
+import contextlib
 import logging
-import json
-from importlib.resources import files
-from bleak import BleakClient
-from bleak.backends.characteristic import BleakGATTCharacteristic
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # bleak is only imported when a real transport is created
+    from bleak.backends.characteristic import BleakGATTCharacteristic
 
 logger = logging.getLogger(__name__)
 
+# Used until the MTU is known, below the BLE minimum of 23 so the chunks
+# are never too large
+DEFAULT_MTU_SIZE = 20
+
 
 class ModeOfOperation(IntEnum):
     # ProtocolTypes$IMowerAppMowerMode, used in modeOfOperation: 4586, 1
@@ -56,6 +79,18 @@ class OverrideAction(IntEnum):
 
 
 class TaskInformation(object):
+    __slots__ = (
+        "next_start_time",
+        "duration_in_seconds",
+        "on_monday",
+        "on_tuesday",
+        "on_wednesday",
+        "on_thursday",
+        "on_friday",
+        "on_saturday",
+        "on_sunday",
+    )
+
     def __init__(
         self,
         next_start_time,
@@ -80,320 +115,410 @@ class TaskInformation(object):
 
 
 class Command:
-    def __init__(self, channel_id: int, parameter: dict):
+    def __init__(self, channel_id: int, parameter: dict | CommandDefinition):
         self.channel_id = channel_id
 
-        self.major = parameter["major"]
-        self.minor = parameter["minor"]
+        if not isinstance(parameter, CommandDefinition):
+            parameter = CommandDefinition(None, parameter)
+        self.definition = parameter
+
+        self.name = parameter.name
+        self.major = parameter.major
+        self.minor = parameter.minor
 
-        if "requestType" in parameter:
-            self.request_data_type = parameter["requestType"]
+        if parameter.request_type is not None:
+            self.request_data_type = dict(parameter.request_type)
         else:
             self.request_data_type = None
 
-        if "responseType" not in parameter:
-            parameter["responseType"] = "no_response"
+        response_type = parameter.response_type
+        if response_type is None:
+            response_type = "no_response"
 
-        if not isinstance(parameter["responseType"], dict):  # Always wrap in list
-            self.response_data_type = {"response": parameter["responseType"]}
+        if not isinstance(response_type, Mapping):  # Always wrap in list
+            self.response_data_type = {"response": response_type}
         else:
-            self.response_data_type = parameter["responseType"]
+            self.response_data_type = dict(response_type)
         self.request_data = bytearray()
 
-    def generate_request(self, **kwargs) -> bytearray:
-        self.request_data = bytearray(18)
-        self.request_data[0] = 0x02  # Hard coded value (start of packet)
-        self.request_data[1] = 0xFD  # 0xFD = LINKED_PACKET_TYPE
-        self.request_data[2] = 0x00  # Length, low byte, updated later
-        self.request_data[3] = 0x00  # Length, high byte, updated later
-
-        # ChannelID
-        id = self.channel_id.to_bytes(4, byteorder="little")
-        self.request_data[4] = id[0]
-        self.request_data[5] = id[1]
-        self.request_data[6] = id[2]
-        self.request_data[7] = id[3]
-
-        self.request_data[8] = 0x01  # is_linked (usually 0x01)
-
-        self.request_data[9] = 0x00  # CRC, Updated later
-        self.request_data[10] = (
-            0x00  # Packet type (0x00 = request, 0x01 = response, 0x02 = event)
-        )
-        self.request_data[11] = 0xAF  # Hard coded value
-
-        major_bytes = self.major.to_bytes(2, byteorder="little")
-
-        self.request_data[12] = major_bytes[0]  # low byte of 'module'
-        self.request_data[13] = major_bytes[1]  # high byte of 'module'
-        self.request_data[14] = self.minor  # low byte of 'command'
-        self.request_data[15] = 0x00  # high byte of 'command'
-
-        # Byte 16 represents length of request data type
-        request_length = 0
-        request_data = bytearray()
-        if self.request_data_type is not None:
-            for request_name, request_type in self.request_data_type.items():
-                if request_name not in kwargs:
-                    raise ValueError(
-                        "Missing request parameter: "
-                        + request_name
-                        + " for command ("
-                        + str(self.major)
-                        + ", "
-                        + str(self.minor)
-                        + ")"
-                    )
-
-                if request_type == "uint32":
-                    request_length += 4
-                    request_data += kwargs[request_name].to_bytes(4, byteorder="little")
-                elif request_type == "uint16":
-                    request_length += 2
-                    request_data += kwargs[request_name].to_bytes(2, byteorder="little")
-                elif request_type == "uint8":
-                    request_length += 1
-                    request_data += kwargs[request_name].to_bytes(1, byteorder="little")
-                else:
-                    raise ValueError("Unknown request type: " + self.request_type)
-        self.request_data[16] = request_length
-
-        self.request_data[17] = 0x00  # high byte of request_length
-        if request_length > 0:
-            self.request_data += request_data
-
-        self.request_data[2] = len(self.request_data) - 2  # Length
-
-        self.request_data[9] = crc(self.request_data, 1, 8)  # CRC
-
-        # Two last bytes are crc and 0x03
-        self.request_data.append(crc(self.request_data, 1, len(self.request_data) - 1))
-        self.request_data.append(0x03)  # Hard coded value
+        self.codec = parameter.codec
 
+    def generate_request(self, **kwargs) -> bytearray:
+        self.request_data = self.codec.encode_request(self.channel_id, **kwargs)
         return self.request_data
 
     def parse_response(self, response_data: bytearray) -> int | str | dict | None:
-        response_length = response_data[17]
-        data = response_data[19 : 19 + response_length]
-        response = dict()
-        dpos = 0  # data position
-        for name, dtype in self.response_data_type.items():
-            if dtype == "no_response":
-                return None
-            elif (dtype == "tUnixTime") or (dtype == "uint32"):
-                response[name] = int.from_bytes(
-                    data[dpos : dpos + 4], byteorder="little"
-                )
-                dpos += 4
-            elif dtype == "uint16":
-                response[name] = int.from_bytes(
-                    data[dpos : dpos + 2], byteorder="little"
-                )
-                dpos += 2
-            elif (dtype == "uint8") or (dtype == "bool"):
-                response[name] = data[dpos]
-                dpos += 1
-            elif dtype == "ascii":
-                if len(self.response_data_type) != 1:
-                    raise ValueError(
-                        "ASCII response type can currently only be used when there is only one response type"
-                    )
-                response[name] = data.decode("ascii").rstrip(
-                    "\x00"
-                )  # Remove trailing null bytes
-                dpos += len(data)
-            else:
-                raise ValueError("Unknown data type: " + dtype)
-        if dpos != len(data):
-            raise ValueError(
-                "Data length mismatch. Read %d bytes of %d" % (dpos, len(data))
-            )
-        return response
+        return self.codec.decode_response(response_data)
 
     def validate_response(self, response_data: bytearray) -> bool:
-        if response_data[0] != 0x02:
-            return False
-
-        if response_data[1] != 0xFD:
-            return False
-
-        if response_data[3] != 0x00:  # high byte of length
-            return False
-
-        id = self.channel_id.to_bytes(4, byteorder="little")
-        if response_data[4] != id[0]:
-            return False
-        if response_data[5] != id[1]:
-            return False
-        if response_data[6] != id[2]:
-            return False
-        if response_data[7] != id[3]:
-            return False
-
-        if response_data[8] != 0x01:
-            # This is a valid config, but we don't support it
-            # return m1656b(decodeState, c10786f);
-            return False
-
-        if response_data[9] != crc(response_data, 1, 8):
-            return False
-
-        if response_data[10] != 0x01:  # packet type is not 0x01 = response
-            return False
-
-        if response_data[11] != 0xAF:
-            return False
+        return self.codec.validate_response(self.channel_id, response_data)
 
-        major_bytes = self.major.to_bytes(4, byteorder="little")
-        if response_data[12] != major_bytes[0]:
-            return False
-        if response_data[13] != major_bytes[1]:
-            return False
-        if response_data[14] != self.minor:
-            return False
 
-        if response_data[15] != 0x00:  # high byte of 'command' (self.minor)
-            return False
+def _cancelling() -> bool:
+    """Whether the current task is being cancelled, always False before 3.11"""
+    cancelling = getattr(asyncio.current_task(), "cancelling", None)
+    return cancelling is not None and cancelling() > 0
 
-        if (
-            response_data[16] != 0x00
-        ):  # result: OK(0), UNKNOWN_ERROR(1), INVALID_VALUE(2), OUT_OF_RANGE(3), NOT_AVAILABLE(4), NOT_ALLOWED(5), INVALID_GROUP(6), INVALID_ID(7), DEVICE_BUSY(8), INVALID_PIN(9), MOWER_BLOCKED(10);
-            return False
 
-        return True
+def _retrieve(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
 
 
 class BLEClient:
-    def __init__(self, channel_id: int, address, pin=None):
+    def __init__(
+        self,
+        channel_id: int,
+        address,
+        pin=None,
+        queue_size: int = 16,
+        window: int = 1,
+        fast_connect: bool = False,
+        write_burst: int = 8,
+        write_burst_interval: float = 0.01,
+        transport_factory=bleak_transport,
+        metrics=None,
+        recorder: FlightRecorder | None = None,
+    ):
         self.channel_id = channel_id
         self.address = address
         self.pin = pin
-        self.MTU_SIZE = 20
-
-        self.queue = asyncio.Queue()
-
-        with files("automower_ble").joinpath("protocol.json").open("r") as f:
-            self.protocol = json.load(f)  # Load the JSON file
-
-    async def _get_response(self):
-        try:
-            data = await asyncio.wait_for(self.queue.get(), timeout=10)
+        # Replaced by the negotiated MTU once connected
+        self.MTU_SIZE = DEFAULT_MTU_SIZE
+        self.fast_connect = fast_connect
+        # Creates the link to the mower, see transport.py
+        self.transport_factory = transport_factory
+        self.write_burst = write_burst
+        self.write_burst_interval = write_burst_interval
+
+        self.client = None
+        self.connect_timings = {}
+        self.device_info = None
+
+        # Called with this client when the link drops
+        self.disconnect_callbacks = []
+        # Awaited before every request that `connect()` does not make
+        # itself, `MowerSession` holds requests back during a reconnect
+        self.request_gate = None
+        self._connect_task = None
+        # When a chunk was last written or received
+        self.last_activity = time.monotonic()
+
+        # Notifications are reassembled into frames, events go to the
+        # subscribers, responses are handed to the request waiting for them
+        # and anything else is queued
+        self.framer = FrameAssembler()
+        self.dispatcher = ResponseDispatcher(window)
+        self.events = EventStream()
+        self._write_lock = asyncio.Lock()
+        self._tx_pending = []
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped_frames = 0
+
+        self.bytes_written = 0
+        self.writes = 0
+        self.frames_written = 0
+
+        # Shared by every client unless a `MetricsRegistry` is given, the
+        # label tuples are built once per command
+        self.metrics = get_metrics() if metrics is None else metrics
+        self._device_labels = (("device", address),)
+        self._command_labels = {}
+
+        # The raw chunks sent and received, see recorder.py
+        self.recorder = FlightRecorder() if recorder is None else recorder
+
+        # Timeouts follow the measured round trip time of requests and the
+        # gaps between the notifications that make up one frame
+        self.rtt = RttEstimator(initial_timeout=10.0, min_timeout=0.2)
+        self.chunk_rtt = RttEstimator(
+            initial_timeout=5.0, min_timeout=0.1, max_timeout=5.0
+        )
+        self._last_notification = 0.0
 
-        except TimeoutError:
-            logger.error("Unable to get response from device: '%s'", self.address)
-            if self.is_connected():
-                await self.disconnect()
-            return None
+        # Shared by every client, protocol.json is only parsed once. The
+        # raw entries stay available as `protocol`, commands are built
+        # from `registry`.
+        self.protocol = get_protocol()
+        self.registry = get_registry()
+        self._commands = {}
 
-        return data
+    def get_command(self, command_name: str) -> Command:
+        """
+        Return the `Command` for `command_name` bound to this client's
+        channel, it is created on first use and then reused
+        """
+        command = self._commands.get(command_name)
+        if command is None:
+            command = Command(self.channel_id, self.registry[command_name])
+            self._commands[command_name] = command
 
-    async def _write_data(self, data):
-        logger.info("Writing: " + str(binascii.hexlify(data)))
+        return command
 
+    async def _write_chunks(self, data) -> None:
         chunk_size = self.MTU_SIZE - 3
-        for chunk in (
-            data[i : i + chunk_size] for i in range(0, len(data), chunk_size)
-        ):
+        for n, i in enumerate(range(0, len(data), chunk_size)):
+            if n and n % self.write_burst == 0:
+                # Writes without response are not flow controlled, give the
+                # controller time to send the burst before queueing more
+                await asyncio.sleep(self.write_burst_interval)
+            chunk = data[i : i + chunk_size]
             await self.client.write_gatt_char(self.write_char, chunk, response=False)
+            self.recorder.record(SENT, chunk)
+            self.last_activity = time.monotonic()
+            self.writes += 1
+            self.metrics.inc("automower_tx_chunks", self._device_labels)
+        self.bytes_written += len(data)
+        self.metrics.inc("automower_tx_bytes", self._device_labels, len(data))
 
-        logger.debug("Finished writing")
-
-    async def _read_data(self):
-        data = await self._get_response()
-
-        if data is None:
-            return None
-
-        if len(data) < 3:
-            # We got such a small amount of data, let's try again
-            data = data + await self._get_response()
-
-            if len(data) < 3:
-                # Something is wrong
-                return None
+    async def _write_data(self, data):
+        # Frames from concurrent requests are not interleaved, the ones
+        # queued at the same time are packed into as few writes as possible
+        done = asyncio.get_running_loop().create_future()
+        # The request may be cancelled before its frame is written, nobody
+        # would then retrieve a write error
+        done.add_done_callback(_retrieve)
+        self._tx_pending.append((data, done))
+        async with self._write_lock:
+            if self._tx_pending:
+                # Let requests sent at the same time queue their frames
+                await asyncio.sleep(0)
+                batch, self._tx_pending = self._tx_pending, []
+                try:
+                    await self._write_chunks(b"".join(frame for frame, _ in batch))
+                except BaseException as e:
+                    for _, future in batch:
+                        if future is done or future.done():
+                            continue
+                        if isinstance(e, Exception):
+                            future.set_exception(e)
+                        else:
+                            future.cancel()
+                    raise
+
+                self.frames_written += len(batch)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+        await done
 
-        length = data[2] + 4
+        logger.debug("Finished writing")
 
-        logger.debug("Waiting for %d bytes", length)
+    def _queue_frame(self, frame) -> None:
+        if self.queue.full():
+            # Nobody is reading, drop the oldest frame to make room
+            self.queue.get_nowait()
+            self.dropped_frames += 1
+            logger.warning(
+                "Frame queue full, dropped %d frames so far", self.dropped_frames
+            )
+        self.queue.put_nowait(frame)
 
-        while len(data) < length:
+    def notification_handler(
+        self, characteristic: "BleakGATTCharacteristic", data: bytearray
+    ):
+        now = time.monotonic()
+        self.last_activity = now
+        self.recorder.record(RECEIVED, data, now)
+        self.metrics.inc("automower_rx_chunks", self._device_labels)
+        self.metrics.inc("automower_rx_bytes", self._device_labels, len(data))
+
+        if self.framer.buffered:
+            # Continuation of a frame, measure the gap since the last chunk
+            self.chunk_rtt.sample(now - self._last_notification)
+        self._last_notification = now
+
+        for frame in self.framer.feed(data):
+            if frame[8] == 0x01 and frame[10] == PACKET_EVENT:
+                # Never the answer to a request, even with the same ID
+                self.events.publish(frame)
+            elif not self.dispatcher.dispatch(frame):
+                # Nobody is waiting for this frame
+                self._queue_frame(frame)
+
+    async def _wait_response(self, future: asyncio.Future, timeout: float):
+        """
+        Wait for the response, as long as chunks of a frame keep arriving
+        the wait is extended by the inter-chunk timeout
+        """
+        extended = False
+        while True:
             try:
-                data = data + await asyncio.wait_for(self.queue.get(), timeout=5)
-            except TimeoutError:
-                logger.error(
-                    "Unable to get full response from device: '%s', currently have"
-                    + str(binascii.hexlify(data)),
-                    self.address,
-                )
-                logger.error("Expecting %d bytes, only have %d", length, len(data))
-                return None
-
-        logger.info("Final response: " + str(binascii.hexlify(data)))
-
-        return data
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                timeout = self.chunk_rtt.timeout
+                if (
+                    self.framer.buffered
+                    and time.monotonic() - self._last_notification < timeout
+                ):
+                    extended = True
+                    continue
 
-    async def _request_response(self, request_data):
-        i = 5
-        while i > 0:
-            try:
-                # If there are previous responses, flush them out
-                while not self.queue.empty():
-                    await self.queue.get()
+                if extended:
+                    self.chunk_rtt.on_timeout()
+                else:
+                    self.rtt.on_timeout()
+                raise
 
-                await self._write_data(request_data)
+    async def _request_response(self, request_data, timeout: float | None = None):
+        """
+        Send a request and wait for the response matching it. Up to
+        `window` requests can be outstanding at the same time.
 
-                response_data = await self._read_data()
-                if response_data is None:
+        Without an explicit `timeout` it is derived from the round trip
+        time measured on this link.
+        """
+        if (
+            self.request_gate is not None
+            and asyncio.current_task() is not self._connect_task
+        ):
+            await self.request_gate()
+
+        key = frame_key(request_data)
+        labels = self._labels(key[1], key[2])
+        metrics = self.metrics
+
+        async with self.dispatcher.slot():
+            i = 5
+            started = None
+            while i > 0:
+                if i < 5:
+                    metrics.inc("automower_retries", labels)
+                # Must not take the late response to an earlier request
+                await self.dispatcher.wait_late(key, request_data)
+                attempt_timeout = self.rtt.timeout if timeout is None else timeout
+                future = self.dispatcher.expect(key, request_data)
+                try:
+                    await self._write_data(request_data)
+                    sent = time.monotonic()
+                    if started is None:
+                        started = sent
+
+                    response_data = await self._wait_response(future, attempt_timeout)
+
+                except asyncio.TimeoutError:
+                    logger.error(
+                        "Unable to get response from device: '%s'", self.address
+                    )
+                    metrics.inc("automower_timeouts", labels)
+                    # The response may still come, for another timeout
+                    self.dispatcher.abandon(key, future, attempt_timeout)
                     i = i - 1
                     continue
 
-            except asyncio.exceptions.CancelledError:
-                logger.debug("Received CancelledError")
-                i = i - 1
-                continue
+                except asyncio.exceptions.CancelledError:
+                    # Only a response cancelled by the dispatcher is retried,
+                    # a cancelled caller stops the request
+                    retry = future.cancelled() and not _cancelling()
+                    self.dispatcher.abandon(key, future, attempt_timeout)
+                    if not retry:
+                        raise
+                    logger.debug("Response cancelled by the dispatcher")
+                    i = i - 1
+                    continue
 
-            break
+                except Exception:
+                    # The write failed, no response will come
+                    self.dispatcher.abandon(key, future, 0)
+                    raise
+
+                # Only measure requests that were answered at the first
+                # attempt, after a retry it is unknown which one was answered
+                now = time.monotonic()
+                if i == 5:
+                    self.rtt.sample(now - sent)
+                # From the first attempt, as seen by the caller
+                metrics.observe(
+                    "automower_request_latency_seconds", labels, now - started
+                )
+                break
 
+        metrics.inc("automower_requests", labels)
         if i == 0:
+            metrics.inc("automower_request_failures", labels)
             logger.error("Unable to communicate with device: '%s'", self.address)
+            path = self.recorder.dump_on_error()
+            if path is not None:
+                logger.error("Recent traffic saved to %s", path)
             if self.is_connected():
                 await self.disconnect()
             return None
 
         return response_data
 
-    async def connect(self, device) -> bool:
-        """
-        Connect to a device and setup the channel
-
-        Returns True on success
-        """
-        logger.info("starting scan...")
+    @contextlib.contextmanager
+    def _connect_phase(self, phase: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.connect_timings[phase] = time.monotonic() - start
+            logger.debug("%s took %.3fs", phase, self.connect_timings[phase])
+            self.metrics.observe(
+                "automower_connect_phase_seconds",
+                self._device_labels + (("phase", phase),),
+                self.connect_timings[phase],
+            )
 
-        if device is None:
-            logger.error("could not find device with address '%s'", self.address)
-            return False
+    def _labels(self, major: int | None, minor: int | None) -> tuple:
+        """The metric labels of a command, by its (major, minor) pair"""
+        labels = self._command_labels.get((major, minor))
+        if labels is None:
+            if major is None:
+                name = "unlinked"
+            else:
+                definition = self.registry.lookup(major, minor)
+                name = (
+                    "%d.%d" % (major, minor) if definition is None else definition.name
+                )
+            labels = self._device_labels + (("command", name),)
+            self._command_labels[(major, minor)] = labels
+        return labels
+
+    async def _negotiated_mtu(self, client) -> int:
+        """Return the MTU negotiated with the mower, or the default"""
+        # BlueZ only knows the MTU once it has been acquired
+        backend = getattr(client, "_backend", None)
+        acquire = getattr(backend, "_acquire_mtu", None)
+        if acquire is not None and getattr(backend, "_mtu_size", 0) is None:
+            try:
+                await acquire()
+            except Exception as e:
+                logger.warning("Unable to acquire the MTU: %s", e)
+                return DEFAULT_MTU_SIZE
 
-        logger.info("connecting to device...")
-        self.client = BleakClient(
-            device, services=["98bd0001-0b0e-421a-84e5-ddbf75dc6de4"], use_cached=True
-        )
-        await self.client.connect()
-        logger.info("connected")
+        try:
+            mtu = client.mtu_size
+        except Exception:
+            return DEFAULT_MTU_SIZE
+
+        if not isinstance(mtu, int) or mtu < DEFAULT_MTU_SIZE:
+            return DEFAULT_MTU_SIZE
+        return mtu
+
+    async def _read_device_info(self, client) -> tuple[str, str, str] | None:
+        """Read (manufacturer, device type, model) from the GATT database"""
+        service = client.services.get_service(SERVICE_UUID)
+        model_char = client.services.get_characteristic(DEVICE_NAME_CHAR_UUID)
+        device_type_char = client.services.get_characteristic(DEVICE_TYPE_CHAR_UUID)
+        if service is None or model_char is None or device_type_char is None:
+            return None
 
-        logger.info("pairing device...")
-        await self.client.pair()
-        logger.info("paired")
+        model = await client.read_gatt_char(model_char)
+        device_type = await client.read_gatt_char(device_type_char)
 
-        self.client._backend._mtu_size = self.MTU_SIZE
+        return (service.description, device_type.decode(), model.decode())
 
-        for service in self.client.services:
+    async def _log_characteristics(self, client):
+        """Read and log every readable characteristic, only for debugging"""
+        for service in client.services:
             logger.info("[Service] %s", service)
 
             for char in service.characteristics:
                 if "read" in char.properties:
                     try:
-                        value = await self.client.read_gatt_char(char.uuid)
+                        value = await client.read_gatt_char(char.uuid)
                         logger.debug(
                             "  [Characteristic] %s (%s), Value: %r",
                             char,
@@ -412,99 +537,167 @@ class BLEClient:
                     logger.debug(
                         "  [Characteristic] %s (%s)", char, ",".join(char.properties)
                     )
-                if char.uuid == "98bd0002-0b0e-421a-84e5-ddbf75dc6de4":
-                    self.write_char = char
 
-                if char.uuid == "98bd0003-0b0e-421a-84e5-ddbf75dc6de4":
-                    self.read_char = char
+    def _on_disconnected(self, client) -> None:
+        logger.info("Device '%s' disconnected", self.address)
+        # Nothing will answer the outstanding requests any more
+        self.dispatcher.cancel_all()
+        for callback in list(self.disconnect_callbacks):
+            callback(self)
 
-        async def notification_handler(
-            characteristic: BleakGATTCharacteristic, data: bytearray
-        ):
-            logger.info("Received: " + str(binascii.hexlify(data)))
-            await self.queue.put(data)
+    async def connect(
+        self,
+        device,
+        read_device_info: bool | None = None,
+        check_login: bool = False,
+    ) -> bool:
+        """
+        Connect to a device and setup the channel
 
-        await self.client.start_notify(self.read_char, notification_handler)
+        With `fast_connect` only the characteristics that are needed are
+        looked up and nothing else is read, and the channel setup is
+        retried with a short timeout instead of waiting a fixed time for
+        the mower to become ready.
 
-        await asyncio.sleep(5.0)
+        If `read_device_info` is set the device information is read over
+        the same connection and `probe_gatts()` will return it without
+        connecting again. By default it is read unless `fast_connect` is
+        set.
 
-        request = self.generate_request_setup_channel_id()
-        response = await self._request_response(request)
-        if response is None:
-            return False
+        If `check_login` is set the PIN is only sent when
+        `IsOperatorLoggedIn` reports that the operator is not logged in.
 
-        ### TODO: Check response
+        The time each phase took is stored in `connect_timings`.
+
+        Returns True on success
+        """
+        if read_device_info is None:
+            read_device_info = not self.fast_connect
 
-        request = self.generate_request_handshake()
-        response = await self._request_response(request)
-        if response is None:
+        # The requests made here must not wait for `request_gate`
+        self._connect_task = asyncio.current_task()
+        try:
+            return await self._connect(device, read_device_info, check_login)
+        finally:
+            self._connect_task = None
+
+    async def _connect(self, device, read_device_info: bool, check_login: bool) -> bool:
+        logger.info("starting scan...")
+
+        if device is None:
+            logger.error("could not find device with address '%s'", self.address)
             return False
 
+        self.connect_timings = {}
+        if read_device_info:
+            self.device_info = None
+
+        logger.info("connecting to device...")
+        with self._connect_phase("connect"):
+            self.client = self.transport_factory(
+                device, disconnected_callback=self._on_disconnected
+            )
+            await self.client.connect()
+        logger.info("connected")
+
+        logger.info("pairing device...")
+        with self._connect_phase("pair"):
+            await self.client.pair()
+        logger.info("paired")
+
+        with self._connect_phase("discovery"):
+            if not self.fast_connect:
+                await self._log_characteristics(self.client)
+
+            self.write_char = self.client.services.get_characteristic(WRITE_CHAR_UUID)
+            self.read_char = self.client.services.get_characteristic(READ_CHAR_UUID)
+            if self.write_char is None or self.read_char is None:
+                logger.error(
+                    "Automower characteristics not found on '%s'", self.address
+                )
+                await self.client.disconnect()
+                return False
+
+            self.MTU_SIZE = await self._negotiated_mtu(self.client)
+            logger.info("MTU: %d", self.MTU_SIZE)
+
+            if read_device_info:
+                self.device_info = await self._read_device_info(self.client)
+
+        with self._connect_phase("notify"):
+            self.framer.reset()
+            await self.client.start_notify(self.read_char, self.notification_handler)
+
+            if not self.fast_connect:
+                await asyncio.sleep(5.0)
+
+        with self._connect_phase("channel_setup"):
+            # A successful subscription means the link is up, but the mower
+            # might need a moment before it answers. Probe with a short
+            # timeout instead of sleeping.
+            request = self.generate_request_setup_channel_id()
+            response = await self._request_response(
+                request, timeout=1.0 if self.fast_connect else None
+            )
+            if response is None:
+                return False
+
         ### TODO: Check response
 
-        if self.pin is not None:
-            command = Command(self.channel_id, self.protocol["EnterOperatorPin"])
-            request = command.generate_request(code=self.pin)
+        with self._connect_phase("handshake"):
+            request = self.generate_request_handshake()
             response = await self._request_response(request)
             if response is None:
                 return False
 
+        ### TODO: Check response
+
+        if self.pin is not None:
+            with self._connect_phase("pin"):
+                if check_login and await self._is_logged_in():
+                    logger.info("Operator already logged in, not sending the PIN")
+                    return True
+
+                command = self.get_command("EnterOperatorPin")
+                request = command.generate_request(code=self.pin)
+                response = await self._request_response(request)
+                if response is None:
+                    return False
+
         return True
 
+    async def _is_logged_in(self) -> bool:
+        command = self.get_command("IsOperatorLoggedIn")
+        response = await self._request_response(command.generate_request())
+        if response is None or not command.validate_response(response):
+            return False
+        return bool(command.parse_response(response)["response"])
+
     def is_connected(self) -> bool:
-        return self.client.is_connected
+        return self.client is not None and self.client.is_connected
 
     async def probe_gatts(self, device):
+        """
+        Return (manufacturer, device type, model). If `connect()` already
+        read them the connection is not opened a second time.
+        """
+        if self.device_info is not None:
+            return self.device_info
+
         logger.info("connecting to device...")
-        client = BleakClient(
-            device, services=["98bd0001-0b0e-421a-84e5-ddbf75dc6de4"], use_cached=True
-        )
+        client = self.transport_factory(device)
 
         await client.connect()
         logger.info("connected")
 
-        manufacture = None
-        model = None
-        device_type = None
-
-        for service in client.services:
-            logger.debug("[Service] %s", service)
-
-            if service.uuid == "98bd0001-0b0e-421a-84e5-ddbf75dc6de4":
-                manufacture = service.description
-
-            for char in service.characteristics:
-                if "read" in char.properties:
-                    try:
-                        value = await client.read_gatt_char(char.uuid)
-                        logger.debug(
-                            "  [Characteristic] %s (%s), Value: %r",
-                            char,
-                            ",".join(char.properties),
-                            value,
-                        )
-                    except Exception as e:
-                        logger.error(
-                            "  [Characteristic] %s (%s), Error: %s",
-                            char,
-                            ",".join(char.properties),
-                            e,
-                        )
-
-                else:
-                    logger.debug(
-                        "  [Characteristic] %s (%s)", char, ",".join(char.properties)
-                    )
-
-                if char.uuid == "00002a00-0000-1000-8000-00805f9b34fb":
-                    model = await client.read_gatt_char(char)
+        if not self.fast_connect:
+            await self._log_characteristics(client)
 
-                if char.uuid == "98bd0004-0b0e-421a-84e5-ddbf75dc6de4":
-                    device_type = await client.read_gatt_char(char)
+        device_info = await self._read_device_info(client)
 
         await client.disconnect()
 
-        return (manufacture, device_type.decode(), model.decode())
+        return device_info
 
     async def disconnect(self):
         """
@@ -513,7 +706,8 @@ class BLEClient:
         """
 
         await self.client.stop_notify(self.read_char)
-        await self.queue.put(None)
+        self.dispatcher.cancel_all()
+        self._queue_frame(None)
 
         logger.info("disconnecting...")
         await self.client.disconnect()
@@ -0,0 +1,124 @@
+"""
+A flight recorder of the raw BLE traffic
+
+Every chunk written to and notified by the mower is kept in a bounded
+ring buffer together with its `time.monotonic()` timestamp, nothing is
+formatted while recording. The buffer is written out as a btsnoop file on
+demand with `dump()`, or automatically when a request is given up if
+`error_path` is set. The file opens in Wireshark, where
+husqvarna_automower_protocol.lua decodes the requests, and in
+`automower_ble.capture`:
+
+    client.recorder.dump("automower.btsnoop")
+"""
+
+import collections
+import logging
+import struct
+import time
+
+from .transport import READ_CHAR_UUID, WRITE_CHAR_UUID
+
+logger = logging.getLogger(__name__)
+
+SENT = 0
+RECEIVED = 1
+
+# Attribute handles used in the dump. husqvarna_automower_protocol.lua
+# decodes writes to handle 0x000b.
+WRITE_HANDLE = 0x000B
+READ_HANDLE = 0x000D
+_CONNECTION = 0x0040
+
+
+class FlightRecorder:
+    """The last `size` chunks sent and received, oldest first"""
+
+    def __init__(self, size: int = 1024, error_path: str | None = None):
+        self.size = size
+        # Dumped to when something goes wrong, after time.strftime()
+        self.error_path = error_path
+        # (monotonic timestamp, SENT or RECEIVED, data)
+        self.records = collections.deque(maxlen=size)
+        self.dumps = 0
+
+    def record(self, direction: int, data, timestamp: float | None = None) -> None:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.records.append((timestamp, direction, bytes(data)))
+
+    def clear(self) -> None:
+        self.records.clear()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def dump(self, path: str) -> int:
+        """Write the buffer to `path` as btsnoop, returns the number of chunks"""
+        # Imported here, recording must not depend on the capture reader
+        import uuid
+
+        from .capture import (
+            _EPOCH,
+            ATT_NOTIFICATION,
+            ATT_READ_BY_TYPE_RESPONSE,
+            ATT_WRITE_COMMAND,
+            DATALINK_H4,
+        )
+
+        records = list(self.records)
+        # Monotonic timestamps are converted to wall clock time
+        offset = time.time() - time.monotonic()
+
+        def packet(timestamp: float, received: bool, att: bytes) -> bytes:
+            l2cap = struct.pack("<HH", len(att), 4) + att
+            acl = struct.pack("<HH", _CONNECTION | (0x2 << 12), len(l2cap)) + l2cap
+            data = b"\x02" + acl
+            return (
+                struct.pack(
+                    ">IIIIq",
+                    len(data),
+                    len(data),
+                    int(received),
+                    0,
+                    int((timestamp + offset) * 1e6) + _EPOCH,
+                )
+                + data
+            )
+
+        with open(path, "wb") as f:
+            f.write(b"btsnoop\x00" + struct.pack(">II", 1, DATALINK_H4))
+
+            # A characteristic discovery, so the handles can be mapped back
+            # to the characteristics
+            discovery = bytes([ATT_READ_BY_TYPE_RESPONSE, 21])
+            for handle, char_uuid in (
+                (WRITE_HANDLE, WRITE_CHAR_UUID),
+                (READ_HANDLE, READ_CHAR_UUID),
+            ):
+                discovery += struct.pack("<HBH", handle - 1, 0x1C, handle)
+                discovery += uuid.UUID(char_uuid).bytes[::-1]
+            first = records[0][0] if records else time.monotonic()
+            f.write(packet(first, True, discovery))
+
+            for timestamp, direction, data in records:
+                if direction == SENT:
+                    att = struct.pack("<BH", ATT_WRITE_COMMAND, WRITE_HANDLE) + data
+                else:
+                    att = struct.pack("<BH", ATT_NOTIFICATION, READ_HANDLE) + data
+                f.write(packet(timestamp, direction == RECEIVED, att))
+
+        self.dumps += 1
+        return len(records)
+
+    def dump_on_error(self) -> str | None:
+        """Dump to `error_path` if it is set, returns the file written"""
+        if self.error_path is None:
+            return None
+        path = time.strftime(self.error_path)
+        try:
+            self.dump(path)
+        except OSError as e:
+            logger.error("Unable to save the flight recorder to %s: %s", path, e)
+            return None
+        return path
@@ -0,0 +1,134 @@
+"""
+Typed response values
+
+A NamedTuple is generated from protocol.json for every command that
+responds with several fields, the first time the records are needed.
+Responses are decoded straight into them, with the fields converted on
+the way: bools to `bool` and states, activities, modes and error codes to
+their enums. Commands with a single field decode to the bare, converted
+value. Values without a matching enum member are kept as plain ints. The
+`ErrorCodes` table is loaded together with the records.
+
+    records = get_records()
+    records.decode(definition, frame)  # GetAllStatisticsResponse(...)
+"""
+
+import threading
+from collections.abc import Mapping
+from typing import NamedTuple
+
+from .protocol import ModeOfOperation, MowerActivity, MowerState, OverrideAction
+from .registry import CommandDefinition, get_registry
+
+# Command name -> conversion of its single response value, a name is
+# looked up in error_codes.py
+VALUE_TYPES = {
+    "GetMode": ModeOfOperation,
+    "GetState": MowerState,
+    "GetActivity": MowerActivity,
+    "GetError": "ErrorCodes",
+}
+
+# (command name, field) -> conversion of a field of a multi field response
+FIELD_TYPES = {
+    ("GetMessage", "code"): "ErrorCodes",
+    ("GetOverride", "action"): OverrideAction,
+}
+
+
+def _conversion(kind, dtype: str):
+    """Return (annotation, function) for a value, function is None if unchanged"""
+    if isinstance(kind, str):
+        from . import error_codes
+
+        kind = getattr(error_codes, kind)
+    if kind is not None:
+        members = kind._value2member_map_
+        return kind | int, lambda value: members.get(value, value)
+    if dtype == "bool":
+        return bool, bool
+    if dtype == "ascii":
+        return str, None
+    return int, None
+
+
+class ResponseRecords:
+    """The record types and decoders of every command in a registry"""
+
+    def __init__(self, registry):
+        self.types = {}
+        self._decoders = {}
+        for definition in registry.values():
+            self._decoders[definition.name] = self._compile(definition)
+
+    def _compile(self, definition: CommandDefinition):
+        codec = definition.codec
+        if codec.no_response:
+            return lambda values: None
+
+        if codec.response_ascii:
+            return lambda values: values
+
+        response_type = definition.response_type
+        if not isinstance(response_type, Mapping):
+            _, convert = _conversion(VALUE_TYPES.get(definition.name), response_type)
+            if convert is None:
+                return lambda values: values[0]
+            return lambda values: convert(values[0])
+
+        fields = []
+        conversions = []
+        for index, (field, dtype) in enumerate(response_type.items()):
+            annotation, convert = _conversion(
+                FIELD_TYPES.get((definition.name, field)), dtype
+            )
+            fields.append((field, annotation))
+            if convert is not None:
+                conversions.append((index, convert))
+
+        record = NamedTuple(definition.name + "Response", fields)
+        record.__module__ = __name__
+        self.types[definition.name] = record
+
+        make = record._make
+        if not conversions:
+            return make
+
+        def decode(values):
+            values = list(values)
+            for index, convert in conversions:
+                values[index] = convert(values[index])
+            return make(values)
+
+        return decode
+
+    def record_type(self, command_name: str) -> type | None:
+        """The NamedTuple of `command_name`, None for single value responses"""
+        return self.types.get(command_name)
+
+    def decode(self, definition: CommandDefinition, frame: bytes):
+        """Decode a response frame into the typed value of its command"""
+        return self._decoders[definition.name](definition.codec.unpack_response(frame))
+
+
+def as_dict(value):
+    """The value as returned by `Mower.command()`: records become dicts"""
+    if isinstance(value, tuple):
+        return value._asdict()
+    return value
+
+
+_records = None
+_records_lock = threading.Lock()
+
+
+def get_records() -> ResponseRecords:
+    """Return the records of the shared registry, built on first use"""
+    global _records
+
+    if _records is None:
+        with _records_lock:
+            if _records is None:
+                _records = ResponseRecords(get_registry())
+
+    return _records
@@ -0,0 +1,170 @@
+"""
+A process wide registry of the commands described in protocol.json
+
+protocol.json is only loaded the first time the registry is needed, and
+the result is shared by every client. Commands can be looked up by name
+or by their (major, minor) pair, so any received frame can be mapped
+back to the command it belongs to.
+"""
+
+import struct
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from .codec import PACKET_REQUEST, compile_command
+
+
+class CommandDefinition:
+    """
+    An immutable protocol.json entry together with its compiled codec
+    """
+
+    __slots__ = (
+        "name",
+        "major",
+        "minor",
+        "request_type",
+        "response_type",
+        "description",
+        "codec",
+    )
+
+    def __init__(self, name: str | None, parameter: dict):
+        init = object.__setattr__
+        init(self, "name", name)
+        init(self, "major", parameter["major"])
+        init(self, "minor", parameter["minor"])
+
+        request_type = parameter.get("requestType")
+        if request_type is not None:
+            request_type = MappingProxyType(dict(request_type))
+        init(self, "request_type", request_type)
+
+        response_type = parameter.get("responseType")
+        if isinstance(response_type, dict):
+            response_type = MappingProxyType(dict(response_type))
+        init(self, "response_type", response_type)
+
+        init(self, "description", parameter.get("description"))
+        init(self, "codec", compile_command(parameter))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CommandDefinition is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CommandDefinition is immutable")
+
+    def __repr__(self) -> str:
+        return "CommandDefinition(%r, major=%d, minor=%d)" % (
+            self.name,
+            self.major,
+            self.minor,
+        )
+
+
+class ProtocolRegistry(Mapping):
+    """
+    Read only mapping of command name to `CommandDefinition`, with a
+    reverse index on (major, minor)
+    """
+
+    def __init__(self, protocol: dict):
+        by_name = {}
+        by_id = {}
+        for name, parameter in protocol.items():
+            definition = CommandDefinition(name, parameter)
+            key = (definition.major, definition.minor)
+            if key in by_id:
+                raise ValueError(
+                    "Duplicate command (%d, %d): %s and %s"
+                    % (key[0], key[1], by_id[key].name, name)
+                )
+            by_name[name] = definition
+            by_id[key] = definition
+
+        self._by_name = MappingProxyType(by_name)
+        self._by_id = MappingProxyType(by_id)
+
+    def __getitem__(self, name: str) -> CommandDefinition:
+        return self._by_name[name]
+
+    def __iter__(self):
+        return iter(self._by_name)
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def lookup(self, major: int, minor: int) -> CommandDefinition | None:
+        """Find a command by its (major, minor) pair"""
+        return self._by_id.get((major, minor))
+
+    def lookup_frame(self, frame: bytes) -> CommandDefinition | None:
+        """Find the command a linked request, response or event frame belongs to"""
+        if len(frame) < 16 or frame[8] != 0x01:
+            return None
+        return self._by_id.get(
+            (frame[12] | (frame[13] << 8), frame[14] | (frame[15] << 8))
+        )
+
+
+_protocol = None
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def load_protocol() -> dict:
+    """Read the raw protocol.json shipped with the package"""
+    # Only needed once, so not imported with the module
+    import json
+    from importlib.resources import files
+
+    with files("automower_ble").joinpath("protocol.json").open("r") as f:
+        return json.load(f)
+
+
+def get_protocol() -> dict:
+    """Return the shared raw protocol.json, loading it on first use"""
+    global _protocol
+
+    if _protocol is None:
+        with _registry_lock:
+            if _protocol is None:
+                _protocol = load_protocol()
+
+    return _protocol
+
+
+def get_registry() -> ProtocolRegistry:
+    """Return the shared registry, loading protocol.json on first use"""
+    global _registry
+
+    if _registry is None:
+        protocol = get_protocol()
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProtocolRegistry(protocol)
+
+    return _registry
+
+
+def decode_frame(frame: bytes) -> tuple:
+    """
+    Return (command, values, error) for a linked frame. Requests are
+    decoded into their parameters, responses and events into their fields.
+    """
+    command = get_registry().lookup_frame(frame)
+    if command is None:
+        return None, None, None
+
+    try:
+        if frame[10] == PACKET_REQUEST:
+            values = command.codec.decode_request(frame)
+        elif frame[16] != 0:
+            return command, None, "result %d" % frame[16]
+        else:
+            values = command.codec.decode_response(frame)
+    except (ValueError, struct.error, UnicodeDecodeError) as e:
+        return command, None, str(e)
+
+    return command, values, None
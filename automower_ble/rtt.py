@@ -0,0 +1,69 @@
+"""
+Round trip time estimation, used to derive timeouts from how the link
+is actually performing
+
+This follows the retransmission timer of TCP (RFC 6298): a smoothed RTT
+and RTT variance are kept, the timeout is `srtt + 4 * rttvar` within
+bounds, and it is doubled for every consecutive timeout.
+"""
+
+
+class RttEstimator:
+    def __init__(
+        self,
+        initial_timeout: float = 10.0,
+        min_timeout: float = 0.2,
+        max_timeout: float = 10.0,
+        alpha: float = 1 / 8,
+        beta: float = 1 / 4,
+        k: float = 4.0,
+    ):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.alpha = alpha
+        self.beta = beta
+        self.k = k
+
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.timeouts = 0
+        self._backoff = 1
+
+    def sample(self, rtt: float) -> None:
+        """Add a measurement, in seconds"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(
+                self.srtt - rtt
+            )
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * rtt
+        self.samples += 1
+        self._backoff = 1
+
+    def on_timeout(self) -> None:
+        """Record a timeout, the next timeout is doubled"""
+        self.timeouts += 1
+        self._backoff = min(self._backoff * 2, 64)
+
+    @property
+    def timeout(self) -> float:
+        if self.srtt is None:
+            timeout = self.initial_timeout
+        else:
+            timeout = self.srtt + self.k * self.rttvar
+        timeout = max(self.min_timeout, timeout) * self._backoff
+        return min(self.max_timeout, timeout)
+
+    def __repr__(self) -> str:
+        if self.srtt is None:
+            return "RttEstimator(no samples, timeout=%.3f)" % self.timeout
+        return "RttEstimator(srtt=%.3f, rttvar=%.3f, timeout=%.3f, timeouts=%d)" % (
+            self.srtt,
+            self.rttvar,
+            self.timeout,
+            self.timeouts,
+        )
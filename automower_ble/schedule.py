@@ -0,0 +1,125 @@
+"""
+The weekly schedule of the mower
+
+A `Schedule` is the list of tasks together with a hash of their content,
+so checking whether the schedule changed since the last poll is a single
+comparison. `Schedule.diff()` then tells which tasks changed.
+"""
+
+import hashlib
+import struct
+
+# GetTask response fields, bit 0 of the weekday mask is Monday
+WEEKDAYS = (
+    "useOnMonday",
+    "useOnTuesday",
+    "useOnWednesday",
+    "useOnThursday",
+    "useOnFriday",
+    "useOnSaturday",
+    "useOnSunday",
+)
+
+_TASK = struct.Struct("<IIB")
+
+
+class Task:
+    """
+    One scheduled task. `start` and `duration` are in seconds, `start`
+    from midnight, and bit N of `weekdays` is set if the task runs on day
+    N of the week, Monday being 0.
+    """
+
+    __slots__ = ("start", "duration", "weekdays")
+
+    def __init__(self, start: int, duration: int, weekdays: int):
+        self.start = start
+        self.duration = duration
+        self.weekdays = weekdays
+
+    @classmethod
+    def from_response(cls, value: dict) -> "Task":
+        """Create a task from a decoded GetTask response"""
+        weekdays = 0
+        for day, name in enumerate(WEEKDAYS):
+            if value[name]:
+                weekdays |= 1 << day
+        return cls(value["start"], value["duration"], weekdays)
+
+    def runs_on(self, weekday: int) -> bool:
+        """`weekday` as in `datetime.weekday()`, Monday is 0"""
+        return bool(self.weekdays & (1 << weekday))
+
+    def pack(self) -> bytes:
+        return _TASK.pack(self.start, self.duration, self.weekdays)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Task):
+            return NotImplemented
+        return (self.start, self.duration, self.weekdays) == (
+            other.start,
+            other.duration,
+            other.weekdays,
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.start, self.duration, self.weekdays))
+
+    def __repr__(self) -> str:
+        return "Task(start=%d, duration=%d, weekdays=0b%s)" % (
+            self.start,
+            self.duration,
+            format(self.weekdays, "07b"),
+        )
+
+
+class Schedule:
+    """
+    The tasks of a mower, in task ID order. `hash` only depends on the
+    tasks and is the same in every process, so it can also be stored.
+    """
+
+    __slots__ = ("tasks", "hash")
+
+    def __init__(self, tasks):
+        self.tasks = tuple(tasks)
+        digest = hashlib.blake2b(
+            b"".join(task.pack() for task in self.tasks), digest_size=8
+        ).digest()
+        self.hash = int.from_bytes(digest, byteorder="little")
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def __getitem__(self, index: int) -> Task:
+        return self.tasks[index]
+
+    def diff(self, previous: "Schedule") -> list[tuple[int, Task | None, Task | None]]:
+        """
+        (task ID, previous task, task) for every task that was added,
+        removed or changed since `previous`, the missing side is None
+        """
+        if self.hash == previous.hash and self.tasks == previous.tasks:
+            return []
+
+        changes = []
+        for task_id in range(max(len(self.tasks), len(previous.tasks))):
+            old = previous.tasks[task_id] if task_id < len(previous.tasks) else None
+            new = self.tasks[task_id] if task_id < len(self.tasks) else None
+            if old != new:
+                changes.append((task_id, old, new))
+        return changes
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Schedule):
+            return NotImplemented
+        return self.hash == other.hash and self.tasks == other.tasks
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __repr__(self) -> str:
+        return "Schedule(%r)" % (list(self.tasks),)
@@ -0,0 +1,178 @@
+"""
+A long lived connection to a mower
+
+The session keeps the link alive with KeepAlive while it is idle and
+reconnects with jittered exponential backoff when it drops. Requests made
+while a reconnect is in progress wait for it instead of failing, also the
+ones made through the `Mower` directly.
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+from .mower import Mower
+
+logger = logging.getLogger(__name__)
+
+
+async def find_device_by_address(address: str):
+    from bleak import BleakScanner
+
+    return await BleakScanner.find_device_by_address(address)
+
+
+class MowerSession:
+    def __init__(
+        self,
+        mower: Mower,
+        find_device=find_device_by_address,
+        keepalive_interval: float = 30.0,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 300.0,
+    ):
+        self.mower = mower
+        self.find_device = find_device
+        self.keepalive_interval = keepalive_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+
+        self.reconnects = 0
+        self.keepalives = 0
+
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._last_keepalive = time.monotonic()
+        self._reconnect_task = None
+        self._keepalive_task = None
+
+        mower.disconnect_callbacks.append(self._on_disconnected)
+
+    @property
+    def connected(self) -> bool:
+        return self._ready.is_set() and not self._closed
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before reconnect attempt `attempt`, with jitter"""
+        delay = min(self.backoff_max, self.backoff_initial * (2**attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def _connect(self, first: bool) -> bool:
+        try:
+            device = await self.find_device(self.mower.address)
+            if device is None:
+                logger.warning("Device '%s' not found", self.mower.address)
+                return False
+
+            return await self.mower.connect(
+                device,
+                # Both only need to be done once
+                read_device_info=first or self.mower.device_info is None,
+                check_login=not first,
+            )
+        except Exception as e:
+            logger.warning("Connecting to '%s' failed: %s", self.mower.address, e)
+            return False
+
+    async def _connect_loop(self, first: bool) -> None:
+        attempt = 0
+        while not self._closed:
+            if await self._connect(first):
+                if not first:
+                    self.reconnects += 1
+                self._ready.set()
+                return
+
+            delay = self.backoff(attempt)
+            attempt += 1
+            logger.info(
+                "Retrying connection to '%s' in %.1fs", self.mower.address, delay
+            )
+            await asyncio.sleep(delay)
+
+    async def start(self) -> None:
+        """Connect, retrying until it works, and start sending KeepAlive"""
+        self._closed = False
+        self.mower.request_gate = self.wait_ready
+        await self._connect_loop(first=True)
+        self._keepalive_task = asyncio.get_running_loop().create_task(self._keepalive())
+
+    async def stop(self) -> None:
+        self._closed = True
+        # Wake up anything waiting for a reconnect, it will see the session
+        # is closed
+        self._ready.set()
+        for task in (self._keepalive_task, self._reconnect_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, ConnectionError):
+                    pass
+        self._keepalive_task = self._reconnect_task = None
+        self.mower.request_gate = None
+
+        if self.mower.is_connected():
+            await self.mower.disconnect()
+
+    def _on_disconnected(self, mower) -> None:
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if self._closed:
+            return
+        self._ready.clear()
+        if self._reconnect_task is None or self._reconnect_task.done():
+            logger.info("Link to '%s' lost, reconnecting", self.mower.address)
+            self._reconnect_task = asyncio.get_running_loop().create_task(
+                self._connect_loop(first=False)
+            )
+
+    async def wait_ready(self) -> None:
+        """Wait until the link is up, raises if the session is stopped"""
+        await self._ready.wait()
+        if self._closed:
+            raise ConnectionError("Session is closed")
+
+    async def command(self, command_name: str, **kwargs):
+        """
+        Same as `Mower.command()`, but waits for a reconnect if the link
+        is down and sends the command again if the link drops while it
+        is in flight.
+        """
+        for _ in range(2):
+            await self.wait_ready()
+            try:
+                value = await self.mower.command(command_name, **kwargs)
+            except Exception:
+                if self.mower.is_connected():
+                    raise
+                value = None
+
+            if value is not None or self.mower.is_connected():
+                return value
+
+            self._schedule_reconnect()
+
+        return None
+
+    async def _keepalive(self) -> None:
+        while not self._closed:
+            # Any traffic on the link counts, not only this session's
+            last = max(self.mower.last_activity, self._last_keepalive)
+            idle = time.monotonic() - last
+            if idle < self.keepalive_interval:
+                await asyncio.sleep(self.keepalive_interval - idle)
+                continue
+
+            await self.wait_ready()
+            self._last_keepalive = time.monotonic()
+            try:
+                await self.mower.command("KeepAlive")
+                self.keepalives += 1
+            except Exception as e:
+                logger.warning("KeepAlive to '%s' failed: %s", self.mower.address, e)
+
+            if not self.mower.is_connected():
+                self._schedule_reconnect()
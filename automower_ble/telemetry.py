@@ -0,0 +1,429 @@
+"""
+Compact recording of polled statistics and state
+
+Samples are fixed width rows: a timestamp and one value per field, with
+the field types taken from the protocol.json response types. They are
+stored in segment files with a column layout, every column is a
+contiguous little endian array at a fixed offset, so a segment can be
+memory mapped and a column used without copying or parsing.
+
+Counters that only ever go up, like the statistics, are stored as 16 bit
+deltas from the previous row. When a delta does not fit, or a counter
+goes down, a new segment is started with new base values.
+
+    with TelemetryRecorder("telemetry") as recorder:
+        await recorder.poll(mower)
+
+    reader = TelemetryReader("telemetry")
+    battery = reader.values("GetBatteryLevel")
+"""
+
+import itertools
+import mmap
+import os
+import struct
+import time
+
+from .codec import FORMATS
+from .helpers import load_numpy
+from .registry import get_registry
+
+RAW = 0
+DELTA = 1
+
+# Delta columns, the largest value is the marker for a missing sample
+_DELTA_FORMAT = "H"
+_MAX_DELTA = 0xFFFE
+
+_MAGIC = b"AMTL"
+_VERSION = 1
+# magic, version, capacity, rows, number of fields
+_HEADER = struct.Struct("<4sHIIH")
+# name, format, encoding, base value, last value
+_FIELD = struct.Struct("<32sccII")
+
+_SEGMENT = "telemetry-%06d.seg"
+
+
+class Field:
+    """
+    A column. `command` is the command whose response holds the value and
+    `key` the response field, None for single value responses.
+    """
+
+    __slots__ = ("name", "command", "key", "format", "encoding")
+
+    def __init__(self, name: str, command: str, key: str | None, encoding: int = RAW):
+        self.name = name
+        self.command = command
+        self.key = key
+        self.encoding = encoding
+
+        definition = get_registry()[command]
+        response_type = definition.response_type
+        dtype = response_type if key is None else response_type[key]
+        self.format = FORMATS[dtype]
+
+    @property
+    def stored_format(self) -> str:
+        return _DELTA_FORMAT if self.encoding == DELTA else self.format
+
+    @property
+    def missing(self) -> int:
+        """Stored for samples that could not be read"""
+        return (1 << (8 * struct.calcsize(self.stored_format))) - 1
+
+
+def _default_fields() -> list[Field]:
+    fields = [
+        Field("GetBatteryLevel", "GetBatteryLevel", None),
+        Field("IsCharging", "IsCharging", None),
+        Field("GetRemainingChargingTime", "GetRemainingChargingTime", None),
+        Field("GetMode", "GetMode", None),
+        Field("GetState", "GetState", None),
+        Field("GetActivity", "GetActivity", None),
+        Field("GetError", "GetError", None),
+    ]
+    statistics = get_registry()["GetAllStatistics"].response_type
+    fields += [Field(key, "GetAllStatistics", key, DELTA) for key in statistics]
+    return fields
+
+
+def _layout(formats: list[str], capacity: int) -> tuple[int, list[int]]:
+    """Return the file size and the offset of every column"""
+    offset = _HEADER.size + _FIELD.size * len(formats)
+    offsets = []
+    for field_format in formats:
+        offset = (offset + 7) & ~7
+        offsets.append(offset)
+        offset += struct.calcsize(field_format) * capacity
+    return offset, offsets
+
+
+class _SegmentWriter:
+    def __init__(
+        self,
+        path: str,
+        fields: list[Field],
+        capacity: int,
+        base: dict,
+        last: dict | None = None,
+        rows: int = 0,
+    ):
+        self.path = path
+        self.fields = fields
+        self.capacity = capacity
+        self.rows = rows
+        self.base = base
+        self.last = dict(base) if last is None else last
+        self.formats = ["I"] + [field.stored_format for field in fields]
+        self.size, self.offsets = _layout(self.formats, capacity)
+
+        if rows:
+            self._file = open(path, "r+b")
+        else:
+            self._file = open(path, "w+b")
+            # Sparse on most file systems, only written pages take space
+            self._file.truncate(self.size)
+            self._write_header()
+
+    @classmethod
+    def resume(cls, path: str, fields: list[Field]) -> "_SegmentWriter | None":
+        """Continue an existing segment if it has the same fields and room"""
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER.size + _FIELD.size * (len(fields) + 1))
+            magic, version, capacity, rows, count = _HEADER.unpack_from(header)
+        except (OSError, struct.error):
+            return None
+        if magic != _MAGIC or version != _VERSION or count != len(fields):
+            return None
+        if rows == 0 or rows >= capacity:
+            return None
+
+        base = {}
+        last = {}
+        for i, field in enumerate(fields, start=1):
+            name, field_format, encoding, field_base, field_last = _FIELD.unpack_from(
+                header, _HEADER.size + _FIELD.size * i
+            )
+            if (
+                name.rstrip(b"\x00").decode("ascii") != field.name
+                or field_format.decode("ascii") != field.format
+                or encoding[0] != field.encoding
+            ):
+                return None
+            if field.encoding == DELTA:
+                base[field.name] = field_base
+                last[field.name] = field_last
+
+        return cls(path, fields, capacity, base, last, rows)
+
+    def _write_header(self) -> None:
+        header = bytearray(
+            _HEADER.pack(_MAGIC, _VERSION, self.capacity, self.rows, len(self.fields))
+        )
+        header += _FIELD.pack(b"timestamp", b"I", bytes([RAW]), 0, 0)
+        for field in self.fields:
+            header += _FIELD.pack(
+                field.name.encode("ascii"),
+                field.format.encode("ascii"),
+                bytes([field.encoding]),
+                self.base.get(field.name, 0),
+                self.last.get(field.name, 0),
+            )
+        self._file.seek(0)
+        self._file.write(header)
+
+    def write(self, columns: list[tuple[int, ...]]) -> None:
+        """Append rows, given as the stored values of each column"""
+        count = len(columns[0])
+        for offset, field_format, values in zip(self.offsets, self.formats, columns):
+            self._file.seek(offset + struct.calcsize(field_format) * self.rows)
+            self._file.write(struct.pack("<%d%s" % (count, field_format), *values))
+        # The row count is only updated once the rows are in place
+        self.rows += count
+        self._write_header()
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class TelemetryRecorder:
+    """
+    Appends samples to the segments in directory `path`. Rows are kept in
+    memory and written `batch_size` at a time, `flush()` writes them now.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fields: list[Field] | None = None,
+        batch_size: int = 64,
+        segment_rows: int = 65536,
+    ):
+        self.path = path
+        self.fields = _default_fields() if fields is None else fields
+        self.batch_size = batch_size
+        self.segment_rows = segment_rows
+
+        os.makedirs(path, exist_ok=True)
+        segments = _segment_paths(path)
+        self._next_segment = len(segments)
+        self._segment = None
+        if segments:
+            self._segment = _SegmentWriter.resume(segments[-1], self.fields)
+        self._pending = []
+        # Last absolute value of every counter
+        self._last = {} if self._segment is None else dict(self._segment.last)
+        self.rows = 0
+
+    @property
+    def commands(self) -> list[str]:
+        """The commands to send for a sample"""
+        return list(dict.fromkeys(field.command for field in self.fields))
+
+    def append(self, values: dict, timestamp: float | None = None) -> None:
+        """
+        Add a sample. `values` maps command names to their decoded
+        responses, commands that are missing or None are recorded as such.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        row = [int(timestamp)]
+        for field in self.fields:
+            value = values.get(field.command)
+            if value is not None and field.key is not None:
+                value = value.get(field.key)
+            row.append(None if value is None else int(value))
+
+        self._pending.append(row)
+        self.rows += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    async def poll(self, mower, timestamp: float | None = None) -> None:
+        """Read every command needed with one batch and append the sample"""
+        commands = self.commands
+        # Every sample is read from the mower, cached values would be
+        # recorded with a fresh timestamp
+        for command_name in commands:
+            mower.cache.invalidate(command_name)
+        results = await mower.query_many(commands)
+        self.append(
+            {result.command_name: result.value for result in results if result.ok},
+            timestamp,
+        )
+
+    def _open_segment(self, row: list) -> None:
+        if self._segment is not None:
+            self._segment.close()
+
+        base = {}
+        for field, value in zip(self.fields, row[1:]):
+            if field.encoding == DELTA:
+                base[field.name] = (
+                    self._last.get(field.name, 0) if value is None else value
+                )
+        self._last = dict(base)
+
+        path = os.path.join(self.path, _SEGMENT % self._next_segment)
+        self._next_segment += 1
+        self._segment = _SegmentWriter(path, self.fields, self.segment_rows, base)
+
+    def _encode(self, row: list) -> list | None:
+        """Return the stored values of a row, None if it needs a new segment"""
+        stored = [row[0]]
+        last = dict(self._last)
+        for field, value in zip(self.fields, row[1:]):
+            if field.encoding == DELTA:
+                if value is None:
+                    stored.append(field.missing)
+                    continue
+                delta = value - last[field.name]
+                if delta < 0 or delta > _MAX_DELTA:
+                    return None
+                last[field.name] = value
+                stored.append(delta)
+            else:
+                stored.append(field.missing if value is None else value)
+
+        self._last = last
+        return stored
+
+    def flush(self) -> None:
+        rows = []
+        for row in self._pending:
+            stored = None
+            if (
+                self._segment is not None
+                and self._segment.rows + len(rows) < self._segment.capacity
+            ):
+                stored = self._encode(row)
+
+            if stored is None:
+                self._write(rows)
+                rows = []
+                self._open_segment(row)
+                stored = self._encode(row)
+
+            rows.append(stored)
+
+        self._write(rows)
+        self._pending.clear()
+
+    def _write(self, rows: list[list[int]]) -> None:
+        if rows:
+            self._segment.last = dict(self._last)
+            self._segment.write(list(zip(*rows)))
+
+    def close(self) -> None:
+        self.flush()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def __enter__(self) -> "TelemetryRecorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _segment_paths(path: str) -> list[str]:
+    return sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if name.startswith("telemetry-") and name.endswith(".seg")
+    )
+
+
+class Segment:
+    """A memory mapped segment file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, capacity, self.rows, count = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a telemetry segment: " + path)
+
+        self.formats = {}
+        self.encodings = {}
+        self.bases = {}
+        names = []
+        for i in range(count + 1):
+            name, field_format, encoding, base, _ = _FIELD.unpack_from(
+                self._mmap, _HEADER.size + _FIELD.size * i
+            )
+            name = name.rstrip(b"\x00").decode("ascii")
+            names.append(name)
+            self.encodings[name] = encoding[0]
+            self.formats[name] = (
+                _DELTA_FORMAT if encoding[0] == DELTA else field_format.decode("ascii")
+            )
+            self.bases[name] = base
+
+        self.names = names
+        self.capacity = capacity
+        _, offsets = _layout([self.formats[name] for name in names], capacity)
+        self.offsets = dict(zip(names, offsets))
+
+    def column(self, name: str) -> memoryview:
+        """The stored values, deltas for counters, without copying"""
+        field_format = self.formats[name]
+        offset = self.offsets[name]
+        size = struct.calcsize(field_format) * self.rows
+        return memoryview(self._mmap)[offset : offset + size].cast(field_format)
+
+    def values(self, name: str):
+        """
+        The values of a column, counters are reconstructed from their
+        deltas. A NumPy array if NumPy is installed, otherwise a list.
+        Missing samples of counters repeat the previous value.
+        """
+        np = load_numpy()
+        column = self.column(name)
+        if self.encodings[name] != DELTA:
+            return np.asarray(column) if np is not None else column.tolist()
+
+        base = self.bases[name]
+        missing = (1 << (8 * column.itemsize)) - 1
+        if np is not None:
+            deltas = np.asarray(column, dtype=np.int64)
+            deltas[deltas == missing] = 0
+            return base + np.cumsum(deltas)
+
+        deltas = (0 if delta == missing else delta for delta in column)
+        return list(itertools.accumulate(deltas, initial=base))[1:]
+
+    def close(self) -> None:
+        """All views returned by `column()` have to be released first"""
+        self._mmap.close()
+
+
+class TelemetryReader:
+    """All segments in directory `path`, oldest first"""
+
+    def __init__(self, path: str):
+        self.segments = [Segment(segment) for segment in _segment_paths(path)]
+
+    @property
+    def rows(self) -> int:
+        return sum(segment.rows for segment in self.segments)
+
+    def values(self, name: str):
+        """The values of a column over every segment"""
+        np = load_numpy()
+        parts = [segment.values(name) for segment in self.segments]
+        if np is not None:
+            return np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+        return list(itertools.chain.from_iterable(parts))
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
@@ -0,0 +1,106 @@
+"""
+The link between `BLEClient` and a mower
+
+`BLEClient` only uses the methods of `Transport` to talk to the mower.
+`BleakClient` already provides all of them, so real mowers are reached
+through it as is, and `emulator.EmulatedMower` implements them in process.
+A transport factory is called with the device and a `disconnected_callback`
+keyword argument, called when the link drops, and returns a new `Transport`.
+`Transport` is a `typing.Protocol`, anything with these methods is one.
+"""
+
+from typing import Protocol, runtime_checkable
+
+SERVICE_UUID = "98bd0001-0b0e-421a-84e5-ddbf75dc6de4"
+WRITE_CHAR_UUID = "98bd0002-0b0e-421a-84e5-ddbf75dc6de4"
+READ_CHAR_UUID = "98bd0003-0b0e-421a-84e5-ddbf75dc6de4"
+DEVICE_TYPE_CHAR_UUID = "98bd0004-0b0e-421a-84e5-ddbf75dc6de4"
+DEVICE_NAME_CHAR_UUID = "00002a00-0000-1000-8000-00805f9b34fb"
+
+
+@runtime_checkable
+class Transport(Protocol):
+    """The part of the `BleakClient` API that `BLEClient` uses"""
+
+    # GattServices, or the bleak equivalent
+    services: "GattServices"
+
+    # ATT MTU of the link
+    mtu_size: int
+
+    @property
+    def is_connected(self) -> bool: ...
+
+    async def connect(self) -> None: ...
+
+    async def pair(self) -> None: ...
+
+    async def disconnect(self) -> None: ...
+
+    async def read_gatt_char(self, char) -> bytearray: ...
+
+    async def write_gatt_char(self, char, data, response: bool = False) -> None: ...
+
+    async def start_notify(self, char, callback) -> None:
+        """`callback` is called with the characteristic and the data"""
+        ...
+
+    async def stop_notify(self, char) -> None: ...
+
+
+def bleak_transport(device, disconnected_callback=None) -> Transport:
+    """Transport factory for real mowers"""
+    from bleak import BleakClient
+
+    return BleakClient(
+        device,
+        services=[SERVICE_UUID],
+        use_cached=True,
+        disconnected_callback=disconnected_callback,
+    )
+
+
+class GattCharacteristic:
+    def __init__(self, uuid: str, properties: list[str], value: bytes = b""):
+        self.uuid = uuid
+        self.properties = properties
+        self.value = value
+        self.descriptors = []
+
+    def __str__(self) -> str:
+        return self.uuid
+
+
+class GattService:
+    def __init__(
+        self, uuid: str, description: str, characteristics: list[GattCharacteristic]
+    ):
+        self.uuid = uuid
+        self.description = description
+        self.characteristics = characteristics
+
+    def __str__(self) -> str:
+        return self.uuid + " (" + self.description + ")"
+
+
+class GattServices:
+    """GATT database for transports that are not backed by bleak"""
+
+    def __init__(self, services: list[GattService]):
+        self._services = services
+
+    def __iter__(self):
+        return iter(self._services)
+
+    def get_service(self, uuid: str) -> GattService | None:
+        for service in self._services:
+            if service.uuid == uuid:
+                return service
+        return None
+
+    def get_characteristic(self, uuid: str) -> GattCharacteristic | None:
+        for service in self._services:
+            for char in service.characteristics:
+                if char.uuid == uuid:
+                    return char
+        return None
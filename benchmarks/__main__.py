@@ -0,0 +1,88 @@
+"""
+Run the benchmark suites
+
+    python -m benchmarks --json results.json
+    python -m benchmarks --compare results.json --threshold 0.2
+
+With `--compare` the results are checked against a saved run and the exit
+status is 1 if any metric regressed by more than the threshold.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from automower_ble.helpers import np
+
+from . import bench_codec, bench_crc, bench_e2e, bench_framing, bench_import
+from .common import compare, print_table
+
+SUITES = {
+    "crc": bench_crc,
+    "codec": bench_codec,
+    "framing": bench_framing,
+    "e2e": bench_e2e,
+    "import": bench_import,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "--suite",
+        action="append",
+        choices=sorted(SUITES),
+        help="Suite to run, can be repeated. Defaults to all of them",
+    )
+    parser.add_argument("--json", help="Save the results to this file")
+    parser.add_argument("--compare", help="Results of an earlier run to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed regression as a fraction, 0.2 is 20%% (default)",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.suite or SUITES:
+        suite = SUITES[name].run()
+        print_table(name, suite, unit="")
+        results.update((name + "." + metric, value) for metric, value in suite.items())
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "timestamp": time.time(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "numpy": np is not None,
+                    "results": results,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare(baseline, results, args.threshold)
+        for metric, old, new, change in regressions:
+            print(
+                "REGRESSION %s: %.3f -> %.3f (%+.1f%%)"
+                % (metric, old, new, change * 100)
+            )
+        if regressions:
+            return 1
+        print("No regressions above %.0f%%" % (args.threshold * 100))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
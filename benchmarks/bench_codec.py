@@ -0,0 +1,90 @@
+"""
+Benchmark the compiled command codec against the original interpreter
+
+Run with: python -m benchmarks.bench_codec
+"""
+
+import json
+from importlib.resources import files
+
+from automower_ble.protocol import Command
+
+from . import legacy
+from .common import build_response, measure, print_table
+
+CHANNEL_ID = 0x13A51453
+
+# Values used for commands that take parameters
+REQUEST_ARGUMENTS = {
+    "messageId": 0,
+    "code": 1234,
+    "mode": 0,
+    "duration": 3600,
+    "taskId": 0,
+}
+
+
+def load_protocol() -> dict:
+    with files("automower_ble").joinpath("protocol.json").open("r") as f:
+        return json.load(f)
+
+
+def run() -> dict[str, float]:
+    protocol = load_protocol()
+
+    cases = []
+    for name, parameter in protocol.items():
+        arguments = {
+            key: REQUEST_ARGUMENTS[key] for key in parameter.get("requestType", {})
+        }
+        old = legacy.Command(CHANNEL_ID, dict(parameter))
+        new = Command(CHANNEL_ID, dict(parameter))
+        response = build_response(CHANNEL_ID, parameter)
+
+        # The compiled codec has to produce exactly the same results
+        assert old.generate_request(**arguments) == new.generate_request(**arguments)
+        assert old.parse_response(response) == new.parse_response(response)
+        assert old.validate_response(response) == new.validate_response(response)
+
+        cases.append((old, new, arguments, response, name))
+
+    def encode(index):
+        for case in cases:
+            case[index].generate_request(**case[2])
+
+    def decode(index):
+        for case in cases:
+            case[index].parse_response(case[3])
+
+    def validate(index):
+        for case in cases:
+            case[index].validate_response(case[3])
+
+    results = {}
+    for label, func in (("encode", encode), ("decode", decode), ("validate", validate)):
+        results[label + "_all.legacy"] = measure(lambda: func(0), number=500)
+        results[label + "_all.compiled"] = measure(lambda: func(1), number=500)
+
+    # Every command on its own, so a slow layout is not hidden in the total
+    for _, command, arguments, response, name in cases:
+        results["encode." + name] = measure(
+            lambda c=command, a=arguments: c.generate_request(**a), 2000, 3
+        )
+        results["decode." + name] = measure(
+            lambda c=command, r=response: c.parse_response(r), 2000, 3
+        )
+        results["validate." + name] = measure(
+            lambda c=command, r=response: c.validate_response(r), 2000, 3
+        )
+
+    results["construct_and_encode.compiled"] = measure(
+        lambda: Command(CHANNEL_ID, protocol["GetTask"]).generate_request(taskId=0)
+    )
+
+    return results
+
+
+if __name__ == "__main__":
+    print_table(
+        "Codec, all %d protocol.json commands per call" % len(load_protocol()), run()
+    )
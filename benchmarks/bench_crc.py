@@ -0,0 +1,67 @@
+"""
+Benchmark the packet CRC implementations
+
+Run with: python -m benchmarks.bench_crc
+"""
+
+import random
+
+from automower_ble.helpers import Crc8, crc, crc_batch, np, validate_crc_batch
+
+from . import legacy
+from .common import measure, print_table
+
+
+def _frames(count: int) -> list[bytearray]:
+    rng = random.Random(0)
+    frames = []
+    for _ in range(count):
+        frame = bytearray(rng.randbytes(rng.randint(20, 48)))
+        frame[9] = crc(frame, 1, 8)
+        frame[-2] = crc(frame, 1, len(frame) - 3)
+        frames.append(frame)
+    return frames
+
+
+def run() -> dict[str, float]:
+    frames = _frames(1000)
+    frame = frames[0]
+    end = len(frame) - 3
+
+    # The optimized implementations must be bit exact with the original
+    for data in frames:
+        expected = legacy.crc(data, 1, len(data) - 3)
+        assert crc(data, 1, len(data) - 3) == expected
+        assert Crc8(data[1 : len(data) - 2]).value == expected
+    assert crc_batch([data[1:-2] for data in frames]) == [
+        legacy.crc(data, 1, len(data) - 3) for data in frames
+    ]
+    assert all(validate_crc_batch(frames))
+
+    def incremental():
+        state = Crc8()
+        for i in range(1, end + 1, 17):
+            state.update(frame[i : min(i + 17, end + 1)])
+        return state.value
+
+    def legacy_batch():
+        for data in frames:
+            data[9] == legacy.crc(data, 1, 8)
+            data[-2] == legacy.crc(data, 1, len(data) - 3)
+
+    return {
+        "crc.legacy": measure(lambda: legacy.crc(frame, 1, end)),
+        "crc.table": measure(lambda: crc(frame, 1, end)),
+        "crc.incremental_17b_chunks": measure(incremental),
+        "validate_1000_frames.legacy": measure(legacy_batch, number=20),
+        "validate_1000_frames.batch": measure(
+            lambda: validate_crc_batch(frames), number=20
+        ),
+    }
+
+
+if __name__ == "__main__":
+    print_table(
+        "CRC (NumPy %s)" % ("available" if np is not None else "not available"),
+        run(),
+    )
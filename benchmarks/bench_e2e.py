@@ -0,0 +1,104 @@
+"""
+Benchmark commands end to end, through `Mower.command` and the whole
+request/response stack, against the in-process emulator
+
+Run with: python -m benchmarks.bench_e2e
+"""
+
+import asyncio
+import time
+
+from automower_ble.emulator import EmulatedMower
+from automower_ble.mower import SNAPSHOT_FIELDS, Mower
+
+from .common import print_table
+
+CHANNEL_ID = 0x13A51453
+
+# (label, emulated latency in seconds, commands), without latency only the
+# overhead of the stack is measured
+SCENARIOS = (("local", 0.0, 1000), ("latency_5ms", 0.005, 200))
+
+# Pipelined batches cycle through the commands of a snapshot, so requests
+# for different commands are in flight together
+PIPELINED_COMMANDS = list(
+    dict.fromkeys(command for command, _ in SNAPSHOT_FIELDS.values())
+)
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def _connect(window: int, latency: float) -> Mower:
+    emulator = EmulatedMower(latency=latency)
+    mower = Mower(
+        CHANNEL_ID,
+        "00:00:00:00:00:00",
+        # Every command has to go to the emulator
+        cache_policy={},
+        window=window,
+        fast_connect=True,
+        transport_factory=emulator.transport,
+    )
+    assert await mower.connect(object())
+    return mower
+
+
+async def _sequential(label: str, latency: float, count: int) -> dict[str, float]:
+    mower = await _connect(1, latency)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        assert await mower.command("GetBatteryLevel") == 100
+        latencies.append((time.perf_counter() - sent) * 1e6)
+    elapsed = time.perf_counter() - start
+    await mower.disconnect()
+
+    return {
+        label + ".sequential.commands_per_s": count / elapsed,
+        label + ".sequential.p50_us": percentile(latencies, 0.5),
+        label + ".sequential.p99_us": percentile(latencies, 0.99),
+    }
+
+
+async def _pipelined(
+    label: str, latency: float, count: int, window: int
+) -> dict[str, float]:
+    mower = await _connect(window, latency)
+    start = time.perf_counter()
+    results = await mower.query_many(
+        [PIPELINED_COMMANDS[i % len(PIPELINED_COMMANDS)] for i in range(count)]
+    )
+    elapsed = time.perf_counter() - start
+    await mower.disconnect()
+
+    assert all(result.ok for result in results)
+    return {label + ".pipelined_%d.commands_per_s" % window: count / elapsed}
+
+
+async def _run() -> dict[str, float]:
+    results = {}
+    for label, latency, count in SCENARIOS:
+        results.update(await _sequential(label, latency, count))
+        results.update(await _pipelined(label, latency, count, 4))
+
+        # With latency to hide, pipelining has to pay off
+        sequential = results[label + ".sequential.commands_per_s"]
+        pipelined = results[label + ".pipelined_4.commands_per_s"]
+        if latency > 0 and pipelined <= sequential:
+            raise RuntimeError(
+                "%s: pipelined %.0f commands/s is not faster than sequential %.0f"
+                % (label, pipelined, sequential)
+            )
+    return results
+
+
+def run() -> dict[str, float]:
+    return asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    print_table("End to end through Mower.command", run(), unit="")
@@ -0,0 +1,51 @@
+"""
+Benchmark reassembly of notifications into frames at different chunk sizes
+
+Run with: python -m benchmarks.bench_framing
+"""
+
+from automower_ble.framing import FrameAssembler
+
+from .bench_codec import load_protocol
+from .common import build_response, measure, print_table
+
+CHANNEL_ID = 0x13A51453
+
+# 17 and 20 are the payloads of the default MTU, 244 and 512 of larger ones
+CHUNK_SIZES = (1, 17, 20, 64, 244, 512)
+
+
+def _stream(protocol: dict) -> bytes:
+    """One response to every command, back to back"""
+    stream = bytearray()
+    for parameter in protocol.values():
+        stream += build_response(CHANNEL_ID, parameter)
+    return bytes(stream)
+
+
+def run() -> dict[str, float]:
+    protocol = load_protocol()
+    stream = _stream(protocol)
+    frames = len(protocol)
+
+    results = {}
+    for size in CHUNK_SIZES:
+        chunks = [stream[i : i + size] for i in range(0, len(stream), size)]
+
+        framer = FrameAssembler()
+        assert sum(len(framer.feed(chunk)) for chunk in chunks) == frames
+
+        def feed(chunks=chunks):
+            for chunk in chunks:
+                framer.feed(chunk)
+
+        # Time per frame, so the chunk sizes can be compared
+        results["reassemble.chunk_%d" % size] = (
+            measure(feed, number=200, repeat=5) / frames
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    print_table("Frame reassembly, per frame", run())
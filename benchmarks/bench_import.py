@@ -0,0 +1,48 @@
+"""
+Benchmark the import time of the package
+
+Every module is imported in a fresh interpreter with `-X importtime`, the
+cumulative time of the module itself is reported, best of a few runs.
+
+Run with: python -m benchmarks.bench_import
+"""
+
+import subprocess
+import sys
+
+from .common import print_table
+
+MODULES = (
+    "automower_ble.codec",
+    "automower_ble.protocol",
+    "automower_ble.mower",
+    "automower_ble.capture",
+)
+
+
+def import_time(module: str) -> float:
+    """Cumulative import time of `module` in microseconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return float(fields[1])
+    raise RuntimeError("No import time reported for " + module)
+
+
+def run(repeat: int = 5) -> dict[str, float]:
+    return {
+        "import." + module.split(".")[-1]: min(
+            import_time(module) for _ in range(repeat)
+        )
+        for module in MODULES
+    }
+
+
+if __name__ == "__main__":
+    print_table("Import time", run())
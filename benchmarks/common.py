@@ -0,0 +1,59 @@
+"""Shared helpers for the benchmark scripts"""
+
+import timeit
+
+
+def measure(func, number: int = 10000, repeat: int = 5) -> float:
+    """Return the best time per call of `func` in microseconds"""
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def print_table(title: str, results: dict[str, float], unit: str = "us") -> None:
+    print(title)
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f"  {name:<{width}}  {value:10.3f} {unit}")
+
+
+def build_response(channel_id: int, parameter: dict) -> bytearray:
+    """Build a plausible response frame for a protocol.json entry"""
+    from automower_ble.codec import compile_command
+
+    codec = compile_command(parameter)
+    if codec.response_ascii:
+        value = "Automower"
+    elif codec.no_response:
+        value = None
+    else:
+        value = {name: i + 1 for i, name in enumerate(codec.response_fields)}
+
+    return codec.encode_response(channel_id, value)
+
+
+def higher_is_better(metric: str) -> bool:
+    """Rates end in `_per_s`, everything else is a time"""
+    return metric.endswith("_per_s")
+
+
+def compare(
+    baseline: dict[str, float], current: dict[str, float], threshold: float
+) -> list[tuple[str, float, float, float]]:
+    """
+    Return (metric, baseline, current, change) for every metric that got
+    worse by more than `threshold`, a fraction of the baseline value.
+    Metrics missing from either side are ignored.
+    """
+    regressions = []
+    for metric in sorted(baseline.keys() & current.keys()):
+        old = baseline[metric]
+        new = current[metric]
+        if old <= 0:
+            continue
+
+        change = (new - old) / old
+        worse = -change if higher_is_better(metric) else change
+        if worse > threshold:
+            regressions.append((metric, old, new, change))
+
+    return regressions
@@ -0,0 +1,459 @@
+"""
+Reference copies of the original pure Python implementations.
+
+These are kept only so the benchmarks can measure the optimized code
+against what it replaced, and check the results are unchanged.
+"""
+
+
+def crc(data: bytearray, offset: int, length: int) -> int:
+    """Used to generate CRCs for the packets"""
+    f162a = [
+        0,
+        94,
+        -68,
+        -30,
+        97,
+        63,
+        -35,
+        -125,
+        -62,
+        -100,
+        126,
+        32,
+        -93,
+        -3,
+        31,
+        65,
+        -99,
+        -61,
+        33,
+        255,
+        -4,
+        -94,
+        64,
+        30,
+        95,
+        1,
+        -29,
+        -67,
+        62,
+        96,
+        -126,
+        -36,
+        35,
+        125,
+        -97,
+        -63,
+        66,
+        28,
+        -2,
+        -96,
+        -31,
+        -65,
+        93,
+        3,
+        -255,
+        -34,
+        60,
+        98,
+        -66,
+        -32,
+        2,
+        92,
+        -33,
+        -127,
+        99,
+        61,
+        124,
+        34,
+        -64,
+        -98,
+        29,
+        67,
+        -95,
+        -1,
+        70,
+        24,
+        -6,
+        -92,
+        39,
+        121,
+        -101,
+        -59,
+        -124,
+        -38,
+        56,
+        102,
+        -27,
+        -69,
+        89,
+        7,
+        -37,
+        -123,
+        103,
+        57,
+        -70,
+        -28,
+        6,
+        88,
+        25,
+        71,
+        -91,
+        -5,
+        120,
+        38,
+        -60,
+        -102,
+        101,
+        59,
+        -39,
+        -121,
+        4,
+        90,
+        -72,
+        -26,
+        -89,
+        -7,
+        27,
+        69,
+        -58,
+        -104,
+        122,
+        36,
+        -8,
+        -90,
+        68,
+        26,
+        -103,
+        -57,
+        37,
+        123,
+        58,
+        100,
+        -122,
+        -40,
+        91,
+        5,
+        -25,
+        -71,
+        -116,
+        -46,
+        48,
+        110,
+        -19,
+        -77,
+        81,
+        15,
+        78,
+        16,
+        -14,
+        -84,
+        47,
+        113,
+        -109,
+        -51,
+        17,
+        79,
+        -83,
+        -13,
+        112,
+        46,
+        -52,
+        -110,
+        -45,
+        -115,
+        111,
+        49,
+        -78,
+        -20,
+        14,
+        80,
+        -81,
+        -15,
+        19,
+        77,
+        -50,
+        -112,
+        114,
+        44,
+        109,
+        51,
+        -47,
+        -113,
+        12,
+        82,
+        -80,
+        -18,
+        50,
+        108,
+        -114,
+        -48,
+        83,
+        13,
+        -17,
+        -79,
+        -16,
+        -82,
+        76,
+        18,
+        -111,
+        -49,
+        45,
+        115,
+        -54,
+        -108,
+        118,
+        40,
+        -85,
+        -11,
+        23,
+        73,
+        8,
+        86,
+        -76,
+        -22,
+        105,
+        55,
+        -43,
+        -117,
+        87,
+        9,
+        -21,
+        -75,
+        54,
+        104,
+        -118,
+        -44,
+        -107,
+        -53,
+        41,
+        119,
+        -12,
+        -86,
+        72,
+        22,
+        -23,
+        -73,
+        85,
+        11,
+        -120,
+        -42,
+        52,
+        106,
+        43,
+        117,
+        -105,
+        -55,
+        74,
+        20,
+        -10,
+        -88,
+        116,
+        42,
+        -56,
+        -106,
+        21,
+        75,
+        -87,
+        -9,
+        -74,
+        -24,
+        10,
+        84,
+        -41,
+        -119,
+        107,
+        53,
+    ]
+
+    b = 0
+    while offset <= length:
+        b = f162a[b ^ data[offset]]
+        offset = offset + 1
+
+    return b & 0xFF
+
+
+class Command:
+    def __init__(self, channel_id: int, parameter: dict):
+        self.channel_id = channel_id
+
+        self.major = parameter["major"]
+        self.minor = parameter["minor"]
+
+        if "requestType" in parameter:
+            self.request_data_type = parameter["requestType"]
+        else:
+            self.request_data_type = None
+
+        if "responseType" not in parameter:
+            parameter["responseType"] = "no_response"
+
+        if not isinstance(parameter["responseType"], dict):  # Always wrap in list
+            self.response_data_type = {"response": parameter["responseType"]}
+        else:
+            self.response_data_type = parameter["responseType"]
+        self.request_data = bytearray()
+
+    def generate_request(self, **kwargs) -> bytearray:
+        self.request_data = bytearray(18)
+        self.request_data[0] = 0x02  # Hard coded value (start of packet)
+        self.request_data[1] = 0xFD  # 0xFD = LINKED_PACKET_TYPE
+        self.request_data[2] = 0x00  # Length, low byte, updated later
+        self.request_data[3] = 0x00  # Length, high byte, updated later
+
+        # ChannelID
+        id = self.channel_id.to_bytes(4, byteorder="little")
+        self.request_data[4] = id[0]
+        self.request_data[5] = id[1]
+        self.request_data[6] = id[2]
+        self.request_data[7] = id[3]
+
+        self.request_data[8] = 0x01  # is_linked (usually 0x01)
+
+        self.request_data[9] = 0x00  # CRC, Updated later
+        self.request_data[10] = (
+            0x00  # Packet type (0x00 = request, 0x01 = response, 0x02 = event)
+        )
+        self.request_data[11] = 0xAF  # Hard coded value
+
+        major_bytes = self.major.to_bytes(2, byteorder="little")
+
+        self.request_data[12] = major_bytes[0]  # low byte of 'module'
+        self.request_data[13] = major_bytes[1]  # high byte of 'module'
+        self.request_data[14] = self.minor  # low byte of 'command'
+        self.request_data[15] = 0x00  # high byte of 'command'
+
+        # Byte 16 represents length of request data type
+        request_length = 0
+        request_data = bytearray()
+        if self.request_data_type is not None:
+            for request_name, request_type in self.request_data_type.items():
+                if request_name not in kwargs:
+                    raise ValueError(
+                        "Missing request parameter: "
+                        + request_name
+                        + " for command ("
+                        + str(self.major)
+                        + ", "
+                        + str(self.minor)
+                        + ")"
+                    )
+
+                if request_type == "uint32":
+                    request_length += 4
+                    request_data += kwargs[request_name].to_bytes(4, byteorder="little")
+                elif request_type == "uint16":
+                    request_length += 2
+                    request_data += kwargs[request_name].to_bytes(2, byteorder="little")
+                elif request_type == "uint8":
+                    request_length += 1
+                    request_data += kwargs[request_name].to_bytes(1, byteorder="little")
+                else:
+                    raise ValueError("Unknown request type: " + self.request_type)
+        self.request_data[16] = request_length
+
+        self.request_data[17] = 0x00  # high byte of request_length
+        if request_length > 0:
+            self.request_data += request_data
+
+        self.request_data[2] = len(self.request_data) - 2  # Length
+
+        self.request_data[9] = crc(self.request_data, 1, 8)  # CRC
+
+        # Two last bytes are crc and 0x03
+        self.request_data.append(crc(self.request_data, 1, len(self.request_data) - 1))
+        self.request_data.append(0x03)  # Hard coded value
+
+        return self.request_data
+
+    def parse_response(self, response_data: bytearray) -> int | str | dict | None:
+        response_length = response_data[17]
+        data = response_data[19 : 19 + response_length]
+        response = dict()
+        dpos = 0  # data position
+        for name, dtype in self.response_data_type.items():
+            if dtype == "no_response":
+                return None
+            elif (dtype == "tUnixTime") or (dtype == "uint32"):
+                response[name] = int.from_bytes(
+                    data[dpos : dpos + 4], byteorder="little"
+                )
+                dpos += 4
+            elif dtype == "uint16":
+                response[name] = int.from_bytes(
+                    data[dpos : dpos + 2], byteorder="little"
+                )
+                dpos += 2
+            elif (dtype == "uint8") or (dtype == "bool"):
+                response[name] = data[dpos]
+                dpos += 1
+            elif dtype == "ascii":
+                if len(self.response_data_type) != 1:
+                    raise ValueError(
+                        "ASCII response type can currently only be used when there is only one response type"
+                    )
+                response[name] = data.decode("ascii").rstrip(
+                    "\x00"
+                )  # Remove trailing null bytes
+                dpos += len(data)
+            else:
+                raise ValueError("Unknown data type: " + dtype)
+        if dpos != len(data):
+            raise ValueError(
+                "Data length mismatch. Read %d bytes of %d" % (dpos, len(data))
+            )
+        return response
+
+    def validate_response(self, response_data: bytearray) -> bool:
+        if response_data[0] != 0x02:
+            return False
+
+        if response_data[1] != 0xFD:
+            return False
+
+        if response_data[3] != 0x00:  # high byte of length
+            return False
+
+        id = self.channel_id.to_bytes(4, byteorder="little")
+        if response_data[4] != id[0]:
+            return False
+        if response_data[5] != id[1]:
+            return False
+        if response_data[6] != id[2]:
+            return False
+        if response_data[7] != id[3]:
+            return False
+
+        if response_data[8] != 0x01:
+            # This is a valid config, but we don't support it
+            # return m1656b(decodeState, c10786f);
+            return False
+
+        if response_data[9] != crc(response_data, 1, 8):
+            return False
+
+        if response_data[10] != 0x01:  # packet type is not 0x01 = response
+            return False
+
+        if response_data[11] != 0xAF:
+            return False
+
+        major_bytes = self.major.to_bytes(4, byteorder="little")
+        if response_data[12] != major_bytes[0]:
+            return False
+        if response_data[13] != major_bytes[1]:
+            return False
+        if response_data[14] != self.minor:
+            return False
+
+        if response_data[15] != 0x00:  # high byte of 'command' (self.minor)
+            return False
+
+        if (
+            response_data[16] != 0x00
+        ):  # result: OK(0), UNKNOWN_ERROR(1), INVALID_VALUE(2), OUT_OF_RANGE(3), NOT_AVAILABLE(4), NOT_ALLOWED(5), INVALID_GROUP(6), INVALID_ID(7), DEVICE_BUSY(8), INVALID_PIN(9), MOWER_BLOCKED(10);
+            return False
+
+        return True
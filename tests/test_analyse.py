@@ -0,0 +1,70 @@
+import unittest
+import io
+import os
+import tempfile
+from automower_ble.analyse import analyse, print_report
+from automower_ble.codec import CommandCodec
+from automower_ble.protocol import BLEClient
+from automower_ble.registry import get_registry
+from tests.test_capture import CHANNEL_ID, CaptureWriter
+
+
+class TestAnalyse(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def capture(self, name: str, polls: int) -> str:
+        path = os.path.join(self.directory, name)
+        client = BLEClient(CHANNEL_ID, "00:00:00:00:00:00")
+        battery = get_registry()["GetBatteryLevel"].codec
+        unknown = CommandCodec(9999, 7, {"value": "uint8"}, "uint8")
+
+        writer = CaptureWriter(path)
+        writer.discovery()
+        writer.write(client.generate_request_setup_channel_id())
+        for _ in range(polls):
+            writer.write(client.get_command("GetBatteryLevel").generate_request())
+            writer.time += 50000
+            writer.notify(battery.encode_response(CHANNEL_ID, 80))
+        writer.write(unknown.encode_request(CHANNEL_ID, value=polls))
+        writer.notify(unknown.encode_response(CHANNEL_ID, 1))
+        writer.close()
+        return path
+
+    def test_report(self):
+        paths = [self.capture("a.log", 2), self.capture("b.log", 3)]
+
+        report = analyse(paths, jobs=1)
+        self.assertEqual(report.files, 2)
+
+        battery = report.counts[(4106, 20)]
+        self.assertEqual(battery["requests"], 5)
+        self.assertEqual(battery["responses"], 5)
+        latency = report.latency_summary((4106, 20))
+        self.assertEqual(latency["count"], 5)
+        self.assertAlmostEqual(latency["p50"], 0.052, places=6)
+
+        # Only `samples` of the four frames are kept
+        self.assertEqual(len(report.unknown[(9999, 7)]), 3)
+        self.assertEqual(report.counts[(9999, 7)]["requests"], 2)
+
+        out = io.StringIO()
+        print_report(report, out)
+        self.assertIn("GetBatteryLevel", out.getvalue())
+        self.assertIn("(9999, 7)", out.getvalue())
+
+    def test_parallel(self):
+        paths = [self.capture("%d.log" % i, i + 1) for i in range(4)]
+        paths.append(os.path.join(self.directory, "missing.log"))
+
+        serial = analyse(paths, jobs=1)
+        parallel = analyse(paths, jobs=2)
+
+        self.assertEqual(parallel.to_dict(), serial.to_dict())
+        self.assertIn(paths[-1], parallel.errors)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from automower_ble.cache import STATIC, ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(
+            policy={"GetModel": STATIC, "GetState": 2.0, "GetMessage": 60.0},
+            invalidates={"Pause": ("GetState",)},
+            clock=self.clock,
+        )
+
+    def test_ttl(self):
+        self.assertEqual(self.cache.get("GetState", {}), (False, None))
+        self.cache.put("GetState", {}, 6)
+        self.assertEqual(self.cache.get("GetState", {}), (True, 6))
+
+        self.clock.now = 2.5
+        self.assertEqual(self.cache.get("GetState", {}), (False, None))
+        self.assertEqual(self.cache.stats(), {"GetState": (1, 2)})
+
+    def test_static(self):
+        self.cache.put("GetModel", {}, {"deviceType": 23, "deviceVariant": 1})
+        self.clock.now = 1e9
+        self.assertTrue(self.cache.get("GetModel", {})[0])
+
+        self.cache.clear()
+        self.assertFalse(self.cache.get("GetModel", {})[0])
+
+    def test_parameters(self):
+        self.cache.put("GetMessage", {"messageId": 0}, "first")
+        self.cache.put("GetMessage", {"messageId": 1}, "second")
+
+        self.assertEqual(
+            self.cache.get("GetMessage", {"messageId": 1}), (True, "second")
+        )
+        self.assertFalse(self.cache.get("GetMessage", {"messageId": 2})[0])
+
+    def test_not_cached(self):
+        self.cache.put("GetBatteryLevel", {}, 50)
+        self.assertEqual(self.cache.get("GetBatteryLevel", {}), (False, None))
+        self.assertEqual(self.cache.stats(), {})
+
+    def test_invalidation(self):
+        self.cache.put("GetState", {}, 6)
+        self.cache.put("GetModel", {}, {})
+
+        self.cache.command_sent("Pause")
+        self.assertFalse(self.cache.get("GetState", {})[0])
+        self.assertTrue(self.cache.get("GetModel", {})[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import unittest
+import os
+import struct
+import tempfile
+import uuid
+from automower_ble.capture import (
+    ATT_NOTIFICATION,
+    ATT_READ_BY_TYPE_RESPONSE,
+    ATT_WRITE_COMMAND,
+    RECEIVED,
+    SENT,
+    read_capture,
+)
+from automower_ble.protocol import BLEClient
+from automower_ble.registry import get_registry
+from automower_ble.transport import READ_CHAR_UUID, WRITE_CHAR_UUID
+
+CHANNEL_ID = 0x13A51453
+CONNECTION = 0x0040
+WRITE_HANDLE = 0x0010
+READ_HANDLE = 0x0012
+
+# 2023-11-14 22:13:20 UTC in btsnoop time
+TIMESTAMP = 0x00DCDDB30F2F8000 + 1700000000 * 1000000
+
+
+class CaptureWriter:
+    """Writes a btsnoop file with H4 records"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "wb")
+        self.file.write(b"btsnoop\x00" + struct.pack(">II", 1, 1002))
+        self.time = TIMESTAMP
+
+    def record(self, payload: bytes, received: bool) -> None:
+        data = b"\x02" + payload
+        self.file.write(
+            struct.pack(">IIIIq", len(data), len(data), int(received), 0, self.time)
+        )
+        self.file.write(data)
+        self.time += 1000
+
+    def att(self, att: bytes, received: bool, fragment: int = 27) -> None:
+        """Send an ATT PDU, split into ACL fragments of `fragment` bytes"""
+        l2cap = struct.pack("<HH", len(att), 4) + att
+        for i in range(0, len(l2cap), fragment):
+            boundary = 0x2 if i == 0 else 0x1
+            header = CONNECTION | (boundary << 12)
+            chunk = l2cap[i : i + fragment]
+            self.record(struct.pack("<HH", header, len(chunk)) + chunk, received)
+
+    def discovery(self) -> None:
+        entries = b""
+        for handle, char_uuid in (
+            (WRITE_HANDLE, WRITE_CHAR_UUID),
+            (READ_HANDLE, READ_CHAR_UUID),
+        ):
+            entries += struct.pack("<HBH", handle - 1, 0x1C, handle)
+            entries += uuid.UUID(char_uuid).bytes[::-1]
+        self.att(bytes([ATT_READ_BY_TYPE_RESPONSE, 21]) + entries, received=True)
+
+    def write(self, frame: bytes, handle: int = WRITE_HANDLE) -> None:
+        for i in range(0, len(frame), 20):
+            self.att(
+                bytes([ATT_WRITE_COMMAND])
+                + struct.pack("<H", handle)
+                + frame[i : i + 20],
+                received=False,
+            )
+
+    def notify(self, frame: bytes, handle: int = READ_HANDLE) -> None:
+        for i in range(0, len(frame), 20):
+            self.att(
+                bytes([ATT_NOTIFICATION])
+                + struct.pack("<H", handle)
+                + frame[i : i + 20],
+                received=True,
+            )
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "btsnoop_hci.log")
+        self.client = BLEClient(CHANNEL_ID, "00:00:00:00:00:00")
+
+    def session(self, writer: CaptureWriter) -> None:
+        statistics = get_registry()["GetAllStatistics"].codec
+        writer.write(self.client.generate_request_setup_channel_id())
+        writer.notify(self.client.generate_request_setup_channel_id())
+        writer.write(self.client.get_command("GetTask").generate_request(taskId=3))
+        writer.write(self.client.get_command("GetAllStatistics").generate_request())
+        writer.notify(
+            statistics.encode_response(
+                CHANNEL_ID,
+                {name: i for i, name in enumerate(statistics.response_fields)},
+            )
+        )
+
+    def test_decode(self):
+        writer = CaptureWriter(self.path)
+        writer.discovery()
+        self.session(writer)
+        # Some other characteristic, ignored
+        writer.notify(get_registry()["GetMode"].codec.encode_response(1, 0), 0x0030)
+        writer.close()
+
+        frames = list(read_capture(self.path))
+
+        self.assertEqual(
+            [(frame.direction, frame.packet_type, frame.name) for frame in frames],
+            [
+                (SENT, "unlinked", None),
+                (RECEIVED, "unlinked", None),
+                (SENT, "request", "GetTask"),
+                (SENT, "request", "GetAllStatistics"),
+                (RECEIVED, "response", "GetAllStatistics"),
+            ],
+        )
+        self.assertEqual(frames[2].values, {"taskId": 3})
+        self.assertEqual(frames[4].values["totalCuttingTime"], 1)
+        self.assertEqual(frames[4].channel_id, CHANNEL_ID)
+        self.assertEqual(frames[0].datetime.year, 2023)
+
+    def test_without_discovery(self):
+        writer = CaptureWriter(self.path)
+        self.session(writer)
+        writer.close()
+
+        frames = list(read_capture(self.path))
+        self.assertEqual(len(frames), 5)
+        self.assertEqual(frames[4].name, "GetAllStatistics")
+
+    def test_decode_error(self):
+        writer = CaptureWriter(self.path)
+        writer.discovery()
+        # A response without the data GetBatteryLevel should have
+        response = get_registry()["GetBatteryLevel"].codec.encode_response(CHANNEL_ID)
+        writer.notify(response)
+        writer.close()
+
+        (frame,) = read_capture(self.path)
+        self.assertEqual(frame.name, "GetBatteryLevel")
+        self.assertIsNone(frame.values)
+        self.assertIn("mismatch", frame.error)
+
+    def test_not_btsnoop(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a capture file")
+
+        with self.assertRaises(ValueError):
+            list(read_capture(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
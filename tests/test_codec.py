@@ -0,0 +1,63 @@
+import unittest
+import json
+from importlib.resources import files
+from automower_ble.codec import HEADER_CACHE_SIZE, CommandCodec, compile_command
+
+
+class TestCodec(unittest.TestCase):
+    def setUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            self.protocol = json.load(f)  # Load the parameters to have them available
+
+    def test_compiled_once(self):
+        self.assertIs(
+            compile_command(self.protocol["GetTask"]),
+            compile_command(dict(self.protocol["GetTask"])),
+        )
+
+    def test_header_template(self):
+        codec = compile_command(self.protocol["GetTask"])
+        header, _ = codec.header(0x13A51453)
+
+        self.assertEqual(header.hex(), "02fd14005314a513019d00af521205000400")
+        self.assertIs(codec.header(0x13A51453)[0], header)
+
+    def test_header_cache_is_bounded(self):
+        codec = CommandCodec(1, 2)
+        first, _ = codec.header(1)
+
+        # A new channel ID on every reconnect
+        for channel_id in range(2, 100):
+            codec.header(channel_id)
+            # Still in use, so never evicted
+            self.assertIs(codec.header(1)[0], first)
+
+        self.assertEqual(len(codec._headers), HEADER_CACHE_SIZE)
+        self.assertEqual(list(codec._headers)[-2:], [99, 1])
+
+    def test_missing_parameter(self):
+        codec = compile_command(self.protocol["GetTask"])
+
+        with self.assertRaisesRegex(ValueError, "Missing request parameter: taskId"):
+            codec.encode_request(0x13A51453)
+
+    def test_unknown_type(self):
+        with self.assertRaisesRegex(ValueError, "Unknown data type: float"):
+            CommandCodec(1, 2, response_type={"value": "float"})
+
+    def test_length_mismatch(self):
+        codec = compile_command(self.protocol["GetBatteryLevel"])
+
+        with self.assertRaisesRegex(ValueError, "Data length mismatch"):
+            codec.decode_response(
+                bytearray.fromhex("02fd1300b63b604701e601af0a101400000200010000")
+            )
+
+    def test_validate_short_frame(self):
+        codec = compile_command(self.protocol["GetBatteryLevel"])
+
+        self.assertFalse(codec.validate_response(0, bytearray.fromhex("02fd0a00")))
+
+
+if __name__ == "__main__":
+    unittest.main()
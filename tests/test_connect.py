@@ -0,0 +1,162 @@
+import unittest
+import asyncio
+from unittest import mock
+from automower_ble import protocol
+from automower_ble.framing import FrameAssembler
+from automower_ble.protocol import BLEClient
+
+
+class FakeCharacteristic:
+    def __init__(self, uuid, value=b""):
+        self.uuid = uuid
+        self.value = value
+        self.properties = ["read"]
+
+
+class FakeService:
+    def __init__(self, uuid, description, characteristics):
+        self.uuid = uuid
+        self.description = description
+        self.characteristics = characteristics
+
+
+class FakeServices:
+    def __init__(self):
+        self.service = FakeService(
+            protocol.SERVICE_UUID,
+            "Husqvarna",
+            [
+                FakeCharacteristic(protocol.WRITE_CHAR_UUID),
+                FakeCharacteristic(protocol.READ_CHAR_UUID),
+                FakeCharacteristic(protocol.DEVICE_TYPE_CHAR_UUID, b"Automower"),
+                FakeCharacteristic(protocol.DEVICE_NAME_CHAR_UUID, b"305"),
+            ],
+        )
+
+    def __iter__(self):
+        return iter([self.service])
+
+    def get_service(self, uuid):
+        return self.service if uuid == self.service.uuid else None
+
+    def get_characteristic(self, uuid):
+        for char in self.service.characteristics:
+            if char.uuid == uuid:
+                return char
+        return None
+
+
+class FakeBleakClient:
+    """Echoes every frame back, which is enough for the channel setup"""
+
+    instances = 0
+
+    def __init__(self, device, disconnected_callback=None):
+        FakeBleakClient.instances += 1
+        self.disconnected_callback = disconnected_callback
+        self.services = FakeServices()
+        self.reads = []
+        self.framer = FrameAssembler()
+        self.mtu_size = 23
+        self.writes = []
+        self.is_connected = False
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def pair(self):
+        pass
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    async def read_gatt_char(self, char):
+        self.reads.append(char.uuid)
+        return char.value
+
+    async def start_notify(self, char, callback):
+        self.callback = callback
+
+    async def stop_notify(self, char):
+        pass
+
+    async def write_gatt_char(self, char, data, response=False):
+        self.writes.append(bytes(data))
+        for frame in self.framer.feed(data):
+            asyncio.get_running_loop().call_soon(self.callback, char, frame)
+
+
+class TestConnect(unittest.IsolatedAsyncioTestCase):
+    async def test_fast_connect(self):
+        client = BLEClient(
+            1197489078,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=FakeBleakClient,
+        )
+        FakeBleakClient.instances = 0
+
+        with mock.patch.object(asyncio, "sleep") as sleep:
+            self.assertTrue(await client.connect(object()))
+            # Nothing but yielding to the event loop
+            for call in sleep.call_args_list:
+                self.assertEqual(call.args, (0,))
+
+        self.assertEqual(
+            list(client.connect_timings),
+            ["connect", "pair", "discovery", "notify", "channel_setup", "handshake"],
+        )
+        # Nothing is read
+        self.assertEqual(client.client.reads, [])
+        self.assertIsNone(client.device_info)
+
+    async def test_fast_connect_device_info(self):
+        client = BLEClient(
+            1197489078,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=FakeBleakClient,
+        )
+        FakeBleakClient.instances = 0
+
+        self.assertTrue(await client.connect(object(), read_device_info=True))
+
+        # Only the device information is read
+        self.assertEqual(
+            client.client.reads,
+            [protocol.DEVICE_NAME_CHAR_UUID, protocol.DEVICE_TYPE_CHAR_UUID],
+        )
+
+        self.assertEqual(
+            await client.probe_gatts(object()), ("Husqvarna", "Automower", "305")
+        )
+        self.assertEqual(FakeBleakClient.instances, 1)
+
+    async def test_negotiated_mtu(self):
+        client = BLEClient(
+            1197489078,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=FakeBleakClient,
+        )
+        self.assertEqual(client.MTU_SIZE, protocol.DEFAULT_MTU_SIZE)
+
+        self.assertTrue(await client.connect(object()))
+
+        self.assertEqual(client.MTU_SIZE, 23)
+        self.assertEqual(max(len(write) for write in client.client.writes), 20)
+
+    async def test_probe_gatts_without_connection(self):
+        client = BLEClient(
+            1197489078, "00:00:00:00:00:00", transport_factory=FakeBleakClient
+        )
+        FakeBleakClient.instances = 0
+
+        self.assertEqual(
+            await client.probe_gatts(object()), ("Husqvarna", "Automower", "305")
+        )
+        self.assertEqual(FakeBleakClient.instances, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
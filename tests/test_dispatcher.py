@@ -0,0 +1,262 @@
+import unittest
+import asyncio
+from automower_ble.dispatcher import UNLINKED, ResponseDispatcher, frame_key
+from automower_ble.emulator import EmulatedMower
+from automower_ble.framing import FrameAssembler
+from automower_ble.protocol import BLEClient
+
+CHANNEL_ID = 1197489078
+RESPONSES = {
+    # GetModel
+    (4698, 9): bytearray.fromhex("02fd1300b63b604701e601af5a1209000002001701c803"),
+    # IsCharging
+    (4106, 21): bytearray.fromhex("02fd1200b63b604701db01af0a101500000100011603"),
+}
+
+
+class FakeClient:
+    """Answers requests in reverse order once `expected` requests are in flight"""
+
+    def __init__(self, client: BLEClient, expected: int, delay: float = 0):
+        self.client = client
+        self.expected = expected
+        self.delay = delay
+        self.framer = FrameAssembler()
+        self.requests = []
+
+    def is_connected(self):
+        return True
+
+    async def write_gatt_char(self, char, data, response=False):
+        for frame in self.framer.feed(data):
+            self.requests.append(frame)
+            if len(self.requests) == self.expected:
+                asyncio.get_running_loop().create_task(self.reply())
+
+    async def reply(self):
+        await asyncio.sleep(self.delay)
+        for request in reversed(self.requests):
+            _, major, minor = frame_key(request)
+            self.client.notification_handler(None, RESPONSES[(major, minor)])
+        self.requests.clear()
+
+
+class OrderedClient:
+    """
+    Answers through an `EmulatedMower` in the order of the requests. With
+    `hold` every response is held back until the first request is sent
+    again, so its first attempt always times out.
+    """
+
+    def __init__(self, client: BLEClient, mower: EmulatedMower, hold: bool = False):
+        self.client = client
+        self.mower = mower
+        self.holding = hold
+        self.framer = FrameAssembler()
+        self.first = None
+        self.held = []
+
+    def is_connected(self):
+        return True
+
+    async def write_gatt_char(self, char, data, response=False):
+        loop = asyncio.get_running_loop()
+        for frame in self.framer.feed(data):
+            retry = frame == self.first
+            if self.first is None:
+                self.first = bytes(frame)
+            self.held.append(self.mower.handle_frame(frame))
+            if self.holding and not retry:
+                continue
+
+            # The late responses come at once, the one to the retry a
+            # little later
+            self.holding = False
+            *late, response = self.held
+            for frame in late:
+                loop.call_soon(self.client.notification_handler, None, frame)
+            loop.call_later(0.01, self.client.notification_handler, None, response)
+            self.held = []
+
+
+def message_client(window: int = 1) -> BLEClient:
+    """A client of an emulated mower with messages timed 1000, 999, ..."""
+    client = BLEClient(CHANNEL_ID, "00:00:00:00:00:00", window=window)
+    emulator = EmulatedMower(
+        messages=[{"time": 1000 - i, "code": i, "severity": 1} for i in range(4)]
+    )
+    emulator.channel_id = CHANNEL_ID
+    client.client = OrderedClient(client, emulator, hold=True)
+    client.write_char = None
+    return client
+
+
+class TestResponseDispatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_frame_key(self):
+        self.assertEqual(frame_key(RESPONSES[(4698, 9)]), (CHANNEL_ID, 4698, 9))
+        self.assertEqual(
+            frame_key(bytearray.fromhex("02fd0a00b33b6047005d08012803")), UNLINKED
+        )
+
+    async def test_late_response(self):
+        dispatcher = ResponseDispatcher()
+        key = frame_key(RESPONSES[(4698, 9)])
+
+        future = dispatcher.expect(key)
+        dispatcher.abandon(key, future)
+        self.assertTrue(future.cancelled())
+
+        self.assertTrue(dispatcher.dispatch(RESPONSES[(4698, 9)]))
+        self.assertFalse(dispatcher.dispatch(RESPONSES[(4698, 9)]))
+        self.assertEqual(dispatcher.late_responses, 1)
+        self.assertEqual(dispatcher.unsolicited, 1)
+
+    async def test_pipelined_requests(self):
+        client = BLEClient(CHANNEL_ID, "00:00:00:00:00:00", window=2)
+        client.client = FakeClient(client, expected=2)
+        client.write_char = None
+
+        model, charging = await asyncio.gather(
+            client._request_response(client.get_command("GetModel").generate_request()),
+            client._request_response(
+                client.get_command("IsCharging").generate_request()
+            ),
+        )
+
+        self.assertEqual(model, RESPONSES[(4698, 9)])
+        self.assertEqual(charging, RESPONSES[(4106, 21)])
+        self.assertEqual(client.dispatcher.in_flight, 0)
+
+    async def test_late_response_before_newer_request(self):
+        dispatcher = ResponseDispatcher()
+        key = frame_key(RESPONSES[(4698, 9)])
+
+        dispatcher.abandon(key, dispatcher.expect(key, b"first"))
+        newer = dispatcher.expect(key, b"second")
+
+        # The response to the abandoned request comes first
+        self.assertTrue(dispatcher.dispatch(RESPONSES[(4698, 9)]))
+        self.assertFalse(newer.done())
+        self.assertTrue(dispatcher.dispatch(RESPONSES[(4698, 9)]))
+        self.assertTrue(newer.done())
+        self.assertEqual(dispatcher.late_responses, 1)
+
+    async def test_late_response_to_retry(self):
+        dispatcher = ResponseDispatcher()
+        key = frame_key(RESPONSES[(4698, 9)])
+
+        dispatcher.abandon(key, dispatcher.expect(key, b"first"))
+        retry = dispatcher.expect(key, b"first")
+
+        # Either response answers the retry, the other one is discarded
+        self.assertTrue(dispatcher.dispatch(RESPONSES[(4698, 9)]))
+        self.assertTrue(retry.done())
+        self.assertTrue(dispatcher.dispatch(RESPONSES[(4698, 9)]))
+        self.assertEqual(dispatcher.late_responses, 1)
+        self.assertFalse(dispatcher.dispatch(RESPONSES[(4698, 9)]))
+
+    async def test_wait_late(self):
+        dispatcher = ResponseDispatcher()
+        key = frame_key(RESPONSES[(4698, 9)])
+        dispatcher.abandon(key, dispatcher.expect(key, b"first"))
+
+        # A retry does not wait, another request waits for the late response
+        await asyncio.wait_for(dispatcher.wait_late(key, b"first"), 1)
+        waiting = asyncio.create_task(dispatcher.wait_late(key, b"second"))
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+
+        dispatcher.dispatch(RESPONSES[(4698, 9)])
+        await asyncio.wait_for(waiting, 1)
+
+    async def test_late_response_expires(self):
+        dispatcher = ResponseDispatcher()
+        key = frame_key(RESPONSES[(4698, 9)])
+
+        dispatcher.abandon(key, dispatcher.expect(key, b"first"), 0.01)
+        await asyncio.wait_for(dispatcher.wait_late(key, b"second"), 1)
+        newer = dispatcher.expect(key, b"second")
+
+        self.assertTrue(dispatcher.dispatch(RESPONSES[(4698, 9)]))
+        self.assertTrue(newer.done())
+        self.assertEqual(dispatcher.expired, 1)
+        self.assertEqual(dispatcher.late_responses, 0)
+
+    async def test_timed_out_response_is_discarded(self):
+        client = message_client()
+        command = client.get_command("GetMessage")
+        response = await client._request_response(
+            command.generate_request(messageId=0), timeout=0.05
+        )
+
+        self.assertEqual(command.parse_response(response)["time"], 1000)
+        # The second response is discarded when it turns up
+        await asyncio.sleep(0.05)
+        self.assertEqual(client.dispatcher.late_responses, 1)
+        self.assertTrue(client.queue.empty())
+
+    async def test_late_response_to_same_command(self):
+        client = message_client()
+        command = client.get_command("GetMessage")
+
+        # The late response to the first request must not be taken for the
+        # answer to the next ones
+        times = []
+        for i in range(4):
+            response = await client._request_response(
+                command.generate_request(messageId=i), timeout=0.05
+            )
+            times.append(command.parse_response(response)["time"])
+
+        self.assertEqual(times, [1000, 999, 998, 997])
+        self.assertEqual(client.dispatcher.late_responses, 1)
+
+    async def test_late_response_to_pipelined_command(self):
+        client = message_client(window=4)
+        command = client.get_command("GetMessage")
+
+        responses = await asyncio.gather(
+            *(
+                client._request_response(
+                    command.generate_request(messageId=i),
+                    timeout=0.05 if i == 0 else 2.0,
+                )
+                for i in range(4)
+            )
+        )
+
+        self.assertEqual(
+            [command.parse_response(response)["time"] for response in responses],
+            [1000, 999, 998, 997],
+        )
+        self.assertEqual(client.dispatcher.late_responses, 1)
+
+    async def test_cancelled_caller(self):
+        client = BLEClient(CHANNEL_ID, "00:00:00:00:00:00")
+        # Never answers
+        client.client = FakeClient(client, expected=0)
+        client.write_char = None
+
+        request = client.get_command("GetModel").generate_request()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(client._request_response(request, timeout=1), 0.05)
+
+        # Sent once, not retried
+        self.assertEqual(len(client.client.requests), 1)
+        self.assertEqual(client.dispatcher.in_flight, 0)
+
+    async def test_cancelled_response_is_retried(self):
+        client = BLEClient(CHANNEL_ID, "00:00:00:00:00:00")
+        client.client = FakeClient(client, expected=2)
+        client.write_char = None
+
+        request = client.get_command("GetModel").generate_request()
+        task = asyncio.create_task(client._request_response(request, timeout=1))
+        await asyncio.sleep(0.01)
+        client.dispatcher.cancel_all()
+
+        self.assertEqual(await task, RESPONSES[(4698, 9)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import unittest
+import asyncio
+from automower_ble.emulator import EmulatedMower
+from automower_ble.mower import Mower
+from automower_ble.protocol import MowerActivity, MowerState
+from automower_ble.registry import get_registry
+from automower_ble.session import MowerSession
+from automower_ble.transport import Transport
+
+CHANNEL_ID = 0x13A51453
+
+
+class TestEmulator(unittest.IsolatedAsyncioTestCase):
+    async def connect(self, emulator: EmulatedMower, **kwargs) -> Mower:
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=emulator.transport,
+            **kwargs,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+        return mower
+
+    async def test_connect(self):
+        emulator = EmulatedMower(mtu_size=64)
+        mower = await self.connect(emulator)
+
+        self.assertIsInstance(mower.client, Transport)
+        self.assertEqual(emulator.channel_id, CHANNEL_ID)
+        self.assertEqual(mower.MTU_SIZE, 64)
+        self.assertEqual(
+            await mower.probe_gatts(object()), ("Husqvarna", "Automower", "305")
+        )
+
+    async def test_snapshot(self):
+        emulator = EmulatedMower(
+            battery_level=42,
+            state=MowerState.IN_OPERATION,
+            activity=MowerActivity.MOWING,
+            name="Lawnmower Man",
+        )
+        mower = await self.connect(emulator)
+
+        snapshot = await mower.snapshot()
+        self.assertEqual(snapshot.errors, {})
+        self.assertEqual(snapshot.model, "Automower 305")
+        self.assertEqual(snapshot.battery_level, 42)
+        self.assertEqual(snapshot.activity, MowerActivity.MOWING)
+        self.assertEqual(snapshot.name, "Lawnmower Man")
+
+    async def test_every_command(self):
+        emulator = EmulatedMower(
+            messages=[{"time": 1700000000, "code": 13, "severity": 2}],
+            tasks=[
+                {
+                    "start": 3600,
+                    "duration": 7200,
+                    "useOnMonday": 1,
+                    "useOnTuesday": 0,
+                    "useOnWednesday": 1,
+                    "useOnThursday": 0,
+                    "useOnFriday": 1,
+                    "useOnSaturday": 0,
+                    "useOnSunday": 0,
+                    "unknown": 0,
+                }
+            ],
+        )
+        mower = await self.connect(emulator)
+
+        params = {
+            "messageId": 0,
+            "taskId": 0,
+            "code": 1234,
+            "mode": 0,
+            "duration": 60,
+        }
+        for name, definition in get_registry().items():
+            kwargs = {field: params[field] for field in definition.request_type or {}}
+            results = await mower.query_many([(name, kwargs)])
+            self.assertTrue(results[0].ok, name)
+
+        self.assertEqual(set(emulator.requests), set(get_registry()))
+        message = await mower.command("GetMessage", messageId=0)
+        self.assertEqual(message["code"], 13)
+
+    async def test_chunked_with_latency(self):
+        emulator = EmulatedMower(latency=0.02, chunk_size=5, chunk_interval=0.001)
+        mower = await self.connect(emulator, window=4)
+
+        results = await mower.query_many(
+            ["GetAllStatistics", "GetBatteryLevel", "GetSerialNumber"]
+        )
+        self.assertTrue(all(result.ok for result in results))
+        self.assertGreater(mower.rtt.srtt, 0.015)
+
+    async def test_state_changes(self):
+        emulator = EmulatedMower()
+        mower = await self.connect(emulator)
+
+        await mower.command("StartTrigger")
+        self.assertEqual(await mower.mower_state(), MowerState.IN_OPERATION)
+        self.assertEqual(await mower.mower_activity(), MowerActivity.GOING_OUT)
+
+    async def test_session_reconnects(self):
+        emulator = EmulatedMower()
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=emulator.transport,
+        )
+
+        async def find_device(address):
+            return object()
+
+        session = MowerSession(mower, find_device, backoff_initial=0.01)
+        await session.start()
+        self.addAsyncCleanup(session.stop)
+
+        await mower.client.drop_link()
+        self.assertEqual(await session.command("GetBatteryLevel"), 100)
+        self.assertEqual(session.reconnects, 1)
+        self.assertEqual(emulator.connections, 2)
+
+    async def test_watch(self):
+        emulator = EmulatedMower(
+            battery_level=80,
+            state=MowerState.IN_OPERATION,
+            activity=MowerActivity.MOWING,
+        )
+        mower = await self.connect(emulator, cache_policy={})
+        changes = mower.watch(("activity", "battery_level"), fast=0.01, slow=60)
+
+        first = [await anext(changes), await anext(changes)]
+        self.assertEqual(
+            [(change.field, change.value) for change in first],
+            [("activity", MowerActivity.MOWING), ("battery_level", 80)],
+        )
+        self.assertIsNone(first[0].previous)
+
+        # Only what changed is reported
+        emulator.battery_level = 79
+        change = await asyncio.wait_for(anext(changes), 1)
+        self.assertEqual(
+            (change.field, change.value, change.previous), ("battery_level", 79, 80)
+        )
+
+        emulator.activity = MowerActivity.PARKED
+        change = await asyncio.wait_for(anext(changes), 1)
+        self.assertEqual(change.value, MowerActivity.PARKED)
+
+        # Parked, the next poll is a minute away
+        polls = emulator.requests["GetBatteryLevel"]
+        emulator.battery_level = 78
+        next_change = asyncio.ensure_future(anext(changes))
+        await asyncio.sleep(0.1)
+        self.assertFalse(next_change.done())
+        self.assertEqual(emulator.requests["GetBatteryLevel"], polls)
+
+        # An event ends the wait
+        emulator.emit_event("GetBatteryLevel", 78)
+        change = await asyncio.wait_for(next_change, 1)
+        self.assertEqual(change.value, 78)
+        await changes.aclose()
+
+    async def test_watch_off(self):
+        emulator = EmulatedMower(state=MowerState.OFF)
+        mower = await self.connect(emulator, cache_policy={})
+        changes = mower.watch(fast=0.01, normal=0.01, slow=0.01)
+
+        fields = set()
+        for _ in range(6):
+            fields.add((await anext(changes)).field)
+        self.assertIn("state", fields)
+
+        # Nothing changes, but the state keeps being polled
+        nothing = asyncio.ensure_future(anext(changes))
+        await asyncio.sleep(0.1)
+        self.assertFalse(nothing.done())
+        nothing.cancel()
+        # Only the state is polled while the mower is off
+        self.assertEqual(emulator.requests["GetBatteryLevel"], 1)
+        self.assertGreater(emulator.requests["GetState"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import asyncio
+from automower_ble.codec import PACKET_EVENT
+from automower_ble.emulator import EmulatedMower
+from automower_ble.events import EventStream
+from automower_ble.mower import Mower
+from automower_ble.registry import get_registry
+
+CHANNEL_ID = 0x13A51453
+
+
+class TestEventStream(unittest.IsolatedAsyncioTestCase):
+    def event(self, name: str, value) -> bytes:
+        return get_registry()[name].codec.encode_response(
+            CHANNEL_ID, value, packet_type=PACKET_EVENT
+        )
+
+    async def test_callbacks(self):
+        stream = EventStream()
+        received = []
+        batteries = []
+        unsubscribe = stream.subscribe(received.append)
+        stream.subscribe(batteries.append, "GetBatteryLevel")
+
+        stream.publish(self.event("GetBatteryLevel", 50))
+        stream.publish(self.event("GetMode", 1))
+        unsubscribe()
+        stream.publish(self.event("GetBatteryLevel", 49))
+
+        self.assertEqual(
+            [event.name for event in received], ["GetBatteryLevel", "GetMode"]
+        )
+        self.assertEqual([event.values for event in batteries], [50, 49])
+
+    async def test_failing_callback(self):
+        stream = EventStream()
+        received = []
+
+        def fail(event):
+            raise RuntimeError("Oops")
+
+        stream.subscribe(fail)
+        stream.subscribe(received.append)
+        with self.assertLogs("automower_ble.events"):
+            stream.publish(self.event("GetMode", 1))
+        self.assertEqual(len(received), 1)
+
+    async def test_iterate(self):
+        stream = EventStream(queue_size=2)
+        events = stream.iterate()
+        first = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0)
+
+        stream.publish(self.event("GetBatteryLevel", 50))
+        self.assertEqual((await first).values, 50)
+
+        for level in (49, 48, 47):
+            stream.publish(self.event("GetBatteryLevel", level))
+        # The queue holds two events, 49 was dropped
+        self.assertEqual((await anext(events)).values, 48)
+        self.assertEqual((await anext(events)).values, 47)
+        self.assertEqual(stream.dropped, 1)
+
+        stream.close()
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+
+    async def test_unknown_event(self):
+        stream = EventStream()
+        frame = bytearray(self.event("GetMode", 1))
+        frame[12:14] = (9999).to_bytes(2, "little")
+
+        event = stream.publish(frame)
+        self.assertIsNone(event.command)
+        self.assertEqual((event.major, event.minor), (9999, 1))
+
+
+class TestMowerEvents(unittest.IsolatedAsyncioTestCase):
+    async def test_event_during_request(self):
+        emulator = EmulatedMower(latency=0.02, battery_level=80)
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=emulator.transport,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+
+        received = []
+        mower.events.subscribe(received.append)
+
+        request = asyncio.ensure_future(mower.command("GetBatteryLevel"))
+        await asyncio.sleep(0)
+        # Arrives before the response, with the same IDs
+        emulator.emit_event("GetBatteryLevel", 12)
+
+        self.assertEqual(await request, 80)
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0].name, "GetBatteryLevel")
+        self.assertEqual(received[0].values, 12)
+        self.assertTrue(mower.queue.empty())
+
+
+if __name__ == "__main__":
+    unittest.main()
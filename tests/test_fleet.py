@@ -0,0 +1,187 @@
+import unittest
+import asyncio
+from automower_ble.emulator import EmulatedMower
+from automower_ble.fleet import Fleet, FleetMember
+from automower_ble.mower import Mower
+
+
+class SimulatedMower:
+    """A mower that takes a little time to connect and to answer"""
+
+    active = 0
+
+    def __init__(self, member, latency=0.001, fail=False):
+        self.address = member.address
+        self.device_info = None
+        self.latency = latency
+        self.fail = fail
+        self.connected = False
+
+    async def connect(self, device, read_device_info=True):
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            return False
+        self.connected = True
+        SimulatedMower.active += 1
+        return True
+
+    def is_connected(self):
+        return self.connected
+
+    async def disconnect(self):
+        self.connected = False
+        SimulatedMower.active -= 1
+
+    async def battery_level(self):
+        await asyncio.sleep(self.latency)
+        return 50
+
+
+async def find_device(address):
+    return address
+
+
+async def poll(mower):
+    return await mower.battery_level()
+
+
+class TestFleet(unittest.IsolatedAsyncioTestCase):
+    async def test_many_mowers(self):
+        members = [FleetMember("mower-%d" % i, poll_interval=0.05) for i in range(300)]
+        fleet = Fleet(
+            members,
+            max_connections=5,
+            poll=poll,
+            mower_factory=SimulatedMower,
+            find_device=find_device,
+        )
+
+        seen = {}
+        async with fleet:
+            async for result in fleet.results():
+                self.assertTrue(result.ok)
+                self.assertEqual(result.value, 50)
+                seen[result.address] = seen.get(result.address, 0) + 1
+                if len(seen) == len(members):
+                    break
+
+        self.assertEqual(fleet.peak_connections, 5)
+        self.assertEqual(SimulatedMower.active, 0)
+        # Every mower is served before any mower is polled a third time
+        self.assertLessEqual(max(seen.values()), 2)
+
+    async def test_priority_and_interval(self):
+        members = [
+            FleetMember("slow", poll_interval=10.0),
+            FleetMember("low", poll_interval=0.1),
+            FleetMember("high", poll_interval=0.1, priority=1),
+        ]
+        fleet = Fleet(
+            members,
+            max_connections=1,
+            poll=poll,
+            mower_factory=SimulatedMower,
+            find_device=find_device,
+        )
+
+        order = []
+        async with fleet:
+            async for result in fleet.results():
+                order.append(result.address)
+                if len(order) == 7:
+                    break
+
+        self.assertEqual(order.count("slow"), 1)
+        self.assertEqual(order[:2], ["high", "slow"])
+
+    async def test_errors_are_reported(self):
+        fleet = Fleet(
+            [FleetMember("broken", poll_interval=0.01)],
+            poll=poll,
+            mower_factory=lambda member: SimulatedMower(member, fail=True),
+            find_device=find_device,
+        )
+
+        async with fleet:
+            async for result in fleet.results():
+                self.assertFalse(result.ok)
+                self.assertIsInstance(result.error, ConnectionError)
+                break
+
+        self.assertEqual(fleet.members["broken"].failures, 1)
+
+    async def test_hung_mower_frees_its_slot(self):
+        emulator = EmulatedMower()
+
+        def mower_factory(member):
+            if member.address != "hung":
+                return SimulatedMower(member)
+            return Mower(
+                member.channel_id,
+                member.address,
+                fast_connect=True,
+                transport_factory=emulator.transport,
+            )
+
+        async def poll_hung(mower):
+            if mower.address == "hung":
+                # Connected, but no request is ever answered
+                emulator.latency = 60.0
+                return await mower.command("GetBatteryLevel")
+            return await poll(mower)
+
+        fleet = Fleet(
+            [
+                FleetMember("hung", poll_interval=60.0, priority=1),
+                FleetMember("ok", poll_interval=60.0),
+            ],
+            max_connections=1,
+            poll=poll_hung,
+            mower_factory=mower_factory,
+            find_device=find_device,
+            poll_timeout=0.2,
+        )
+
+        results = []
+        async with fleet:
+            async for result in fleet.results():
+                results.append(result)
+                if len(results) == 2:
+                    break
+
+        hung, ok = results
+        self.assertEqual((hung.address, ok.address), ("hung", "ok"))
+        self.assertIsInstance(hung.error, asyncio.TimeoutError)
+        self.assertLess(hung.duration, 0.5)
+        self.assertTrue(ok.ok)
+        self.assertEqual(emulator.requests["GetBatteryLevel"], 1)
+        self.assertFalse(fleet.members["hung"].mower.is_connected())
+
+    async def test_hung_connect_is_closed(self):
+        # Not even the channel setup is answered
+        emulator = EmulatedMower(latency=60.0)
+        fleet = Fleet(
+            [FleetMember("hung", poll_interval=60.0)],
+            poll=poll,
+            mower_factory=lambda member: Mower(
+                member.channel_id,
+                member.address,
+                fast_connect=True,
+                transport_factory=emulator.transport,
+            ),
+            find_device=find_device,
+            poll_timeout=0.2,
+        )
+
+        async with fleet:
+            async for result in fleet.results():
+                break
+
+        self.assertIsInstance(result.error, asyncio.TimeoutError)
+        self.assertEqual(emulator.connections, 1)
+        self.assertFalse(emulator._transports[0].is_connected)
+        self.assertEqual(fleet.active_connections, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
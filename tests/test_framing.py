@@ -0,0 +1,69 @@
+import unittest
+from automower_ble.framing import FrameAssembler
+from automower_ble.protocol import BLEClient
+
+RESPONSE = bytearray.fromhex("02fd1300b63b604701e601af5a1209000002001701c803")
+HANDSHAKE = bytearray.fromhex("02fd0a00b33b6047005d08012803")
+
+
+class TestFrameAssembler(unittest.TestCase):
+    def test_single_frame(self):
+        framer = FrameAssembler()
+
+        self.assertEqual(framer.feed(RESPONSE), [RESPONSE])
+        self.assertEqual(framer.buffered, 0)
+
+    def test_split_frame(self):
+        framer = FrameAssembler()
+
+        for chunk_size in (1, 2, 3, 7, 17):
+            frames = []
+            for i in range(0, len(RESPONSE), chunk_size):
+                frames += framer.feed(RESPONSE[i : i + chunk_size])
+            self.assertEqual(frames, [RESPONSE])
+
+    def test_multiple_frames(self):
+        framer = FrameAssembler()
+
+        self.assertEqual(
+            framer.feed(RESPONSE + HANDSHAKE + RESPONSE[:5]), [RESPONSE, HANDSHAKE]
+        )
+        self.assertEqual(framer.buffered, 5)
+        self.assertEqual(framer.feed(RESPONSE[5:]), [RESPONSE])
+        self.assertEqual(framer.frames, 3)
+
+    def test_resync(self):
+        framer = FrameAssembler()
+
+        self.assertEqual(framer.feed(b"\x00\x02\x03\x02\xfd" + RESPONSE), [RESPONSE])
+        self.assertEqual(framer.discarded_bytes, 5)
+
+    def test_bad_crc(self):
+        framer = FrameAssembler()
+        corrupt = bytearray(RESPONSE)
+        corrupt[-2] ^= 0xFF
+
+        self.assertEqual(framer.feed(corrupt + HANDSHAKE), [HANDSHAKE])
+        self.assertEqual(framer.crc_errors, 1)
+
+        corrupt = bytearray(RESPONSE)
+        corrupt[9] ^= 0xFF
+        self.assertEqual(framer.feed(corrupt + HANDSHAKE), [HANDSHAKE])
+        self.assertGreater(framer.header_errors, 0)
+
+
+class TestNotificationQueue(unittest.TestCase):
+    def test_bounded_queue(self):
+        client = BLEClient(1197489078, "00:00:00:00:00:00", queue_size=2)
+
+        client.notification_handler(None, RESPONSE[:10])
+        self.assertTrue(client.queue.empty())
+
+        client.notification_handler(None, RESPONSE[10:] + HANDSHAKE + RESPONSE)
+        self.assertEqual(client.dropped_frames, 1)
+        self.assertEqual(client.queue.get_nowait(), HANDSHAKE)
+        self.assertEqual(client.queue.get_nowait(), RESPONSE)
+
+
+if __name__ == "__main__":
+    unittest.main()
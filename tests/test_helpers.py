@@ -0,0 +1,63 @@
+import unittest
+import random
+from unittest import mock
+from automower_ble import helpers
+from automower_ble.helpers import Crc8, crc, crc_batch, validate_crc_batch
+
+
+class TestCrc(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(1234)
+        self.frames = [
+            bytearray.fromhex("02fd100066f2ad6701d700af5a1209000000b703"),
+            bytearray.fromhex("02fd1300b63b604701e601af5a1209000002001701c803"),
+            bytearray.fromhex("02fd160000000000002e14b33b6047000000004d61696e001b03"),
+            bytearray.fromhex("02fd0a00b33b6047005d08012803"),
+        ]
+        for _ in range(50):
+            frame = bytearray(rng.randbytes(rng.randint(12, 64)))
+            frame[9] = crc(frame, 1, 8)
+            frame[-2] = crc(frame, 1, len(frame) - 3)
+            self.frames.append(frame)
+
+    def test_known_frames(self):
+        for frame in self.frames[:4]:
+            self.assertEqual(crc(frame, 1, 8), frame[9])
+            self.assertEqual(crc(frame, 1, len(frame) - 3), frame[-2])
+
+    def test_incremental(self):
+        for frame in self.frames:
+            expected = crc(frame, 1, len(frame) - 3)
+            state = Crc8()
+            for i in range(1, len(frame) - 2, 5):
+                state.update(frame[i : min(i + 5, len(frame) - 2)])
+            self.assertEqual(state.value, expected)
+            self.assertEqual(Crc8(frame[1:-2]).value, expected)
+
+            copy = state.copy()
+            copy.update(b"\x01")
+            self.assertEqual(state.value, expected)
+
+    def test_batch(self):
+        expected = [crc(frame, 1, len(frame) - 1) for frame in self.frames]
+        self.assertEqual(crc_batch(self.frames, 1), expected)
+        with mock.patch.object(helpers, "np", None):
+            self.assertEqual(crc_batch(self.frames, 1), expected)
+
+    def test_validate_batch(self):
+        frames = list(self.frames)
+        frames[5] = bytearray(frames[5])
+        frames[5][-2] ^= 0xFF
+        frames[6] = bytearray(frames[6])
+        frames[6][9] ^= 0x01
+        frames.append(bytearray(b"\x02\xfd\x00"))
+
+        expected = [True] * len(frames)
+        expected[5] = expected[6] = expected[-1] = False
+        self.assertEqual(validate_crc_batch(frames), expected)
+        with mock.patch.object(helpers, "np", None):
+            self.assertEqual(validate_crc_batch(frames), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import subprocess
+import sys
+
+# Importing any of these must not load the modules below
+CORE = (
+    "automower_ble.codec",
+    "automower_ble.protocol",
+    "automower_ble.mower",
+    "automower_ble.session",
+    "automower_ble.capture",
+    "automower_ble.emulator",
+)
+
+LAZY = (
+    "bleak",
+    "numpy",
+    "automower_ble.error_codes",
+    "automower_ble.models",
+)
+
+
+class TestImports(unittest.TestCase):
+    def test_lazy_imports(self):
+        code = (
+            "import sys\n"
+            + "".join("import %s\n" % module for module in CORE)
+            + "from automower_ble import registry\n"
+            + "print(' '.join(m for m in %r if m in sys.modules))\n" % (LAZY,)
+            + "print(registry._registry is None)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+
+        loaded, registry_unloaded = result.stdout.splitlines()
+        self.assertEqual(loaded, "")
+        # protocol.json is not read either
+        self.assertEqual(registry_unloaded, "True")
+
+
+if __name__ == "__main__":
+    unittest.main()
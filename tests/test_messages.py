@@ -0,0 +1,114 @@
+import unittest
+import os
+import tempfile
+from automower_ble.emulator import EmulatedMower
+from automower_ble.error_codes import ErrorCodes
+from automower_ble.messages import MessageStore, MowerMessage
+from automower_ble.mower import Mower
+
+CHANNEL_ID = 0x13A51453
+
+
+def log(count: int, start: int = 1700000000) -> list[dict]:
+    """`count` messages, newest first"""
+    return [
+        {"time": start + 60 * (count - i), "code": i % 20, "severity": 1}
+        for i in range(count)
+    ]
+
+
+class TestMessages(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.emulator = EmulatedMower(latency=0.001, messages=log(50))
+        self.mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            window=4,
+            fast_connect=True,
+            transport_factory=self.emulator.transport,
+        )
+        self.assertTrue(await self.mower.connect(object()))
+        self.addAsyncCleanup(self.mower.disconnect)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = MessageStore(os.path.join(directory.name, "messages.json"))
+
+    async def test_messages(self):
+        messages = [message async for message in self.mower.messages(prefetch=8)]
+
+        self.assertEqual(len(messages), 50)
+        self.assertEqual(messages[0], MowerMessage(**self.emulator.messages[0]))
+        self.assertEqual(messages[-1], MowerMessage(**self.emulator.messages[-1]))
+        self.assertEqual(messages[2].error, ErrorCodes.NO_LOOP_SIGNAL)
+
+    async def test_stop_early(self):
+        async for message in self.mower.messages(prefetch=4):
+            break
+
+        # Only the prefetch window was requested
+        self.assertLessEqual(self.emulator.requests["GetMessage"], 4)
+
+    async def test_sync(self):
+        synced = [message async for message in self.mower.sync_messages(self.store)]
+        self.assertEqual(len(synced), 50)
+        self.assertEqual(self.store.get(self.mower.address), synced[0].key)
+
+        # Nothing new, only the newest message is read
+        self.emulator.requests.clear()
+        synced = [message async for message in self.mower.sync_messages(self.store)]
+        self.assertEqual(synced, [])
+        self.assertLessEqual(self.emulator.requests["GetMessage"], 4)
+
+        self.emulator.messages[:0] = [
+            {"time": 1800000060, "code": 9, "severity": 2},
+            {"time": 1800000000, "code": 3, "severity": 2},
+        ]
+        synced = [message async for message in self.mower.sync_messages(self.store)]
+        self.assertEqual([message.code for message in synced], [9, 3])
+
+        # The mark survives a restart
+        store = MessageStore(self.store.path)
+        self.assertEqual(store.get(self.mower.address), (1800000060, 9))
+
+    async def test_prefetch(self):
+        in_flight = []
+        respond = self.emulator.respond
+
+        def respond_counting(name, params):
+            in_flight.append(self.mower.dispatcher.in_flight)
+            return respond(name, params)
+
+        self.emulator.respond = respond_counting
+        messages = [message async for message in self.mower.messages(prefetch=4)]
+
+        self.assertEqual(len(messages), 50)
+        self.assertEqual(max(in_flight), 4)
+
+    async def test_late_response(self):
+        respond = self.emulator.respond
+
+        def respond_late(name, params):
+            # The first GetMessage response arrives after the timeout, but
+            # well before it is given up on
+            late = name == "GetMessage" and "GetMessage" not in self.emulator.requests
+            self.emulator.latency = 1.5 * self.mower.rtt.timeout if late else 0.001
+            return respond(name, params)
+
+        self.emulator.respond = respond_late
+        messages = [message async for message in self.mower.messages(prefetch=4)]
+
+        self.assertEqual(
+            messages, [MowerMessage(**message) for message in self.emulator.messages]
+        )
+        self.assertGreater(self.emulator.requests["GetMessage"], 50)
+
+    async def test_interrupted_sync(self):
+        async for message in self.mower.sync_messages(self.store):
+            break
+
+        self.assertIsNone(self.store.get(self.mower.address))
+
+
+if __name__ == "__main__":
+    unittest.main()
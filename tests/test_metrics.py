@@ -0,0 +1,127 @@
+import unittest
+from automower_ble.emulator import EmulatedMower
+from automower_ble.metrics import MetricsRegistry
+from automower_ble.mower import Mower
+
+CHANNEL_ID = 0x13A51453
+ADDRESS = "00:00:00:00:00:00"
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_counters_and_histograms(self):
+        metrics = MetricsRegistry(buckets=(0.1, 1.0))
+        labels = (("device", ADDRESS), ("command", "GetMode"))
+        metrics.inc("automower_requests", labels)
+        metrics.inc("automower_requests", labels, 2)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            metrics.observe("automower_request_latency_seconds", labels, value)
+
+        self.assertEqual(
+            metrics.counter("automower_requests", device=ADDRESS, command="GetMode"),
+            3,
+        )
+        histogram = metrics.histogram(
+            "automower_request_latency_seconds", device=ADDRESS, command="GetMode"
+        )
+        self.assertEqual(
+            list(histogram.cumulative()), [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+        )
+        self.assertAlmostEqual(histogram.sum, 3.65)
+
+    def test_openmetrics(self):
+        metrics = MetricsRegistry(buckets=(0.5,))
+        labels = (("device", 'a"b'), ("command", "GetMode"))
+        metrics.inc("automower_timeouts", labels)
+        metrics.observe("automower_request_latency_seconds", labels, 0.25)
+
+        self.assertEqual(
+            metrics.to_openmetrics(),
+            "# TYPE automower_request_latency_seconds histogram\n"
+            "# HELP automower_request_latency_seconds Time from sending a request to its response\n"
+            'automower_request_latency_seconds_bucket{device="a\\"b",command="GetMode",le="0.5"} 1\n'
+            'automower_request_latency_seconds_bucket{device="a\\"b",command="GetMode",le="+Inf"} 1\n'
+            'automower_request_latency_seconds_sum{device="a\\"b",command="GetMode"} 0.25\n'
+            'automower_request_latency_seconds_count{device="a\\"b",command="GetMode"} 1\n'
+            "# TYPE automower_timeouts counter\n"
+            "# HELP automower_timeouts Attempts that got no response in time\n"
+            'automower_timeouts_total{device="a\\"b",command="GetMode"} 1\n'
+            "# EOF\n",
+        )
+
+    def test_subscribe(self):
+        metrics = MetricsRegistry()
+        updates = []
+        unsubscribe = metrics.subscribe(
+            lambda family, labels, value: updates.append((family, value))
+        )
+        metrics.inc("automower_rx_bytes", (), 20)
+        unsubscribe()
+        metrics.inc("automower_rx_bytes", (), 20)
+
+        self.assertEqual(updates, [("automower_rx_bytes", 20)])
+        self.assertEqual(metrics.counter("automower_rx_bytes"), 40)
+
+
+class TestClientMetrics(unittest.IsolatedAsyncioTestCase):
+    async def connect(self, emulator: EmulatedMower) -> Mower:
+        self.metrics = MetricsRegistry()
+        mower = Mower(
+            CHANNEL_ID,
+            ADDRESS,
+            fast_connect=True,
+            transport_factory=emulator.transport,
+            metrics=self.metrics,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+        return mower
+
+    async def test_requests(self):
+        mower = await self.connect(EmulatedMower(chunk_size=8))
+        await mower.command("GetBatteryLevel")
+        await mower.command("GetAllStatistics")
+
+        metrics = self.metrics
+        labels = {"device": ADDRESS, "command": "GetBatteryLevel"}
+        self.assertEqual(metrics.counter("automower_requests", **labels), 1)
+        self.assertEqual(
+            metrics.histogram("automower_request_latency_seconds", **labels).count, 1
+        )
+        self.assertEqual(metrics.counter("automower_retries", **labels), 0)
+
+        self.assertEqual(
+            metrics.counter("automower_tx_bytes", device=ADDRESS), mower.bytes_written
+        )
+        self.assertEqual(
+            metrics.counter("automower_tx_chunks", device=ADDRESS), mower.writes
+        )
+        self.assertGreater(metrics.counter("automower_rx_chunks", device=ADDRESS), 4)
+        for phase in mower.connect_timings:
+            self.assertEqual(
+                metrics.histogram(
+                    "automower_connect_phase_seconds", device=ADDRESS, phase=phase
+                ).count,
+                1,
+            )
+        self.assertIn("automower_rx_bytes_total", metrics.to_openmetrics())
+
+    async def test_timeouts(self):
+        emulator = EmulatedMower()
+        mower = await self.connect(emulator)
+        emulator.latency = 1.0
+        request = mower.get_command("GetMode").generate_request()
+        self.assertIsNone(await mower._request_response(request, timeout=0.005))
+
+        labels = {"device": ADDRESS, "command": "GetMode"}
+        self.assertEqual(self.metrics.counter("automower_timeouts", **labels), 5)
+        self.assertEqual(self.metrics.counter("automower_retries", **labels), 4)
+        self.assertEqual(
+            self.metrics.counter("automower_request_failures", **labels), 1
+        )
+        self.assertIsNone(
+            self.metrics.histogram("automower_request_latency_seconds", **labels)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
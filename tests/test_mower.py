@@ -0,0 +1,130 @@
+import unittest
+import asyncio
+from automower_ble.dispatcher import frame_key
+from automower_ble.framing import FrameAssembler
+from automower_ble.mower import Mower
+from automower_ble.protocol import MowerActivity, MowerState
+from automower_ble.registry import get_registry
+
+CHANNEL_ID = 0x13A51453
+
+VALUES = {
+    "GetModel": {"deviceType": 23, "deviceVariant": 1},
+    "IsCharging": 1,
+    "GetBatteryLevel": 87,
+    "GetRemainingChargingTime": 600,
+    "GetMode": 0,
+    "GetState": 6,
+    "GetActivity": 3,
+    "GetError": 0,
+    "GetNextStartTime": 0,
+    "GetAllStatistics": {
+        "totalRunningTime": 1,
+        "totalCuttingTime": 2,
+        "totalChargingTime": 3,
+        "totalSearchingTime": 4,
+        "numberOfCollisions": 5,
+        "numberOfChargingCycles": 6,
+        "cuttingBladeUsageTime": 7,
+    },
+    "GetSerialNumber": 123456,
+    "GetUserMowerNameAsAsciiString": "Mowy",
+    "Pause": None,
+}
+
+
+class FakeClient:
+    """Answers every request with the value from VALUES"""
+
+    def __init__(self, mower: Mower):
+        self.mower = mower
+        self.framer = FrameAssembler()
+        self.requests = []
+
+    def is_connected(self):
+        return True
+
+    async def write_gatt_char(self, char, data, response=False):
+        for frame in self.framer.feed(data):
+            self.requests.append(frame)
+            definition = get_registry().lookup(*frame_key(frame)[1:])
+            if definition.name in VALUES:
+                response = definition.codec.encode_response(
+                    CHANNEL_ID, VALUES[definition.name]
+                )
+                asyncio.get_running_loop().call_soon(
+                    self.mower.notification_handler, None, response
+                )
+
+
+class TestMower(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.mower = Mower(CHANNEL_ID, "00:00:00:00:00:00", window=4)
+        self.mower.client = FakeClient(self.mower)
+        self.mower.write_char = None
+
+    async def test_snapshot(self):
+        snapshot = await self.mower.snapshot()
+
+        self.assertEqual(snapshot.errors, {})
+        self.assertEqual(snapshot.manufacturer, "Husqvarna")
+        self.assertEqual(snapshot.model, "Automower 305")
+        self.assertIs(snapshot.is_charging, True)
+        self.assertEqual(snapshot.battery_level, 87)
+        self.assertEqual(snapshot.state, MowerState.IN_OPERATION)
+        self.assertEqual(snapshot.activity, MowerActivity.MOWING)
+        self.assertIsNone(snapshot.next_start_time)
+        self.assertEqual(snapshot.statistics.numberOfCollisions, 5)
+        self.assertEqual(snapshot.name, "Mowy")
+
+        # GetModel feeds two fields but is only sent once
+        requested = [frame_key(r)[1:] for r in self.mower.client.requests]
+        self.assertEqual(requested.count((4698, 9)), 1)
+        self.assertEqual(len(requested), len(set(requested)))
+
+    async def test_snapshot_fields(self):
+        snapshot = await self.mower.snapshot(fields=["battery_level", "state"])
+
+        self.assertEqual(snapshot.battery_level, 87)
+        self.assertEqual(snapshot.state, MowerState.IN_OPERATION)
+        self.assertIsNone(snapshot.model)
+        self.assertEqual(len(self.mower.client.requests), 2)
+
+        with self.assertRaises(ValueError):
+            await self.mower.snapshot(fields=["colour"])
+
+    async def test_cache(self):
+        self.assertEqual(await self.mower.get_manufacturer(), "Husqvarna")
+        self.assertEqual(await self.mower.get_model(), "Automower 305")
+        self.assertEqual(await self.mower.mower_state(), MowerState.IN_OPERATION)
+        self.assertEqual(len(self.mower.client.requests), 2)
+
+        await self.mower.mower_pause()
+        self.assertEqual(await self.mower.mower_state(), MowerState.IN_OPERATION)
+        await self.mower.get_model()
+        self.assertEqual(len(self.mower.client.requests), 4)
+        self.assertEqual(self.mower.cache.stats()["GetModel"], (2, 1))
+
+    async def test_write_coalescing(self):
+        await self.mower.query_many(["GetBatteryLevel", "GetMode", "GetState"])
+
+        # The three frames are sent together, not in chunks of their own
+        self.assertEqual(self.mower.frames_written, 3)
+        self.assertEqual(
+            self.mower.writes, -(-self.mower.bytes_written // (self.mower.MTU_SIZE - 3))
+        )
+        self.assertEqual(len(self.mower.client.requests), 3)
+
+    async def test_query_many_errors(self):
+        results = await self.mower.query_many(
+            ["GetBatteryLevel", ("GetTask", {}), ("GetMode", {})]
+        )
+
+        self.assertTrue(results[0].ok)
+        self.assertEqual(results[0].value, 87)
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual(results[2].value, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
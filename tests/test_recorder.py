@@ -0,0 +1,79 @@
+import unittest
+import os
+import tempfile
+from automower_ble.capture import RECEIVED, SENT, read_capture
+from automower_ble.emulator import EmulatedMower
+from automower_ble.mower import Mower
+from automower_ble.recorder import FlightRecorder
+
+CHANNEL_ID = 0x13A51453
+
+
+class TestFlightRecorder(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    async def connect(self, emulator: EmulatedMower, recorder: FlightRecorder):
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=emulator.transport,
+            recorder=recorder,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+        return mower
+
+    def test_bounded(self):
+        recorder = FlightRecorder(size=3)
+        for i in range(5):
+            recorder.record(i % 2, bytes([i]))
+        self.assertEqual(len(recorder), 3)
+        self.assertEqual(
+            [data for _, _, data in recorder.records], [b"\x02", b"\x03", b"\x04"]
+        )
+
+    async def test_dump(self):
+        mower = await self.connect(EmulatedMower(chunk_size=7), FlightRecorder())
+        await mower.command("GetBatteryLevel")
+        await mower.command("GetAllStatistics")
+
+        path = os.path.join(self.directory, "dump.btsnoop")
+        self.assertEqual(mower.recorder.dump(path), len(mower.recorder))
+
+        frames = [frame for frame in read_capture(path) if frame.name is not None]
+        self.assertEqual(
+            [(frame.direction, frame.name) for frame in frames],
+            [
+                (SENT, "GetBatteryLevel"),
+                (RECEIVED, "GetBatteryLevel"),
+                (SENT, "GetAllStatistics"),
+                (RECEIVED, "GetAllStatistics"),
+            ],
+        )
+        self.assertEqual(frames[1].values, {"response": 100})
+        self.assertLessEqual(frames[0].timestamp, frames[3].timestamp)
+
+    async def test_dump_on_error(self):
+        emulator = EmulatedMower()
+        recorder = FlightRecorder(
+            error_path=os.path.join(self.directory, "error-%Y.btsnoop")
+        )
+        mower = await self.connect(emulator, recorder)
+        emulator.latency = 1.0
+
+        request = mower.get_command("GetMode").generate_request()
+        self.assertIsNone(await mower._request_response(request, timeout=0.005))
+
+        self.assertEqual(recorder.dumps, 1)
+        (name,) = os.listdir(self.directory)
+        frames = list(read_capture(os.path.join(self.directory, name)))
+        # The five attempts
+        self.assertEqual([frame.name for frame in frames].count("GetMode"), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
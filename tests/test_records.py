@@ -0,0 +1,84 @@
+import unittest
+from automower_ble.emulator import EmulatedMower
+from automower_ble.error_codes import ErrorCodes
+from automower_ble.models import MowerModels
+from automower_ble.mower import Mower, MowerSnapshot
+from automower_ble.protocol import MowerState, OverrideAction, TaskInformation
+from automower_ble.records import as_dict, get_records
+from automower_ble.registry import get_registry
+
+CHANNEL_ID = 0x13A51453
+
+
+class TestRecords(unittest.TestCase):
+    def decode(self, name: str, value):
+        definition = get_registry()[name]
+        frame = definition.codec.encode_response(CHANNEL_ID, value)
+        return get_records().decode(definition, frame)
+
+    def test_record(self):
+        value = self.decode(
+            "GetOverride", {"action": 2, "startTime": 1700000000, "duration": 3600}
+        )
+        self.assertIsInstance(value, get_records().record_type("GetOverride"))
+        self.assertIs(value.action, OverrideAction.FORCEDMOW)
+        self.assertEqual(value.duration, 3600)
+        self.assertFalse(hasattr(value, "__dict__"))
+        self.assertEqual(
+            as_dict(value),
+            {"action": 2, "startTime": 1700000000, "duration": 3600},
+        )
+
+    def test_bools(self):
+        task = {name: 1 for name in get_registry()["GetTask"].response_type}
+        value = self.decode("GetTask", task)
+        self.assertIs(value.useOnMonday, True)
+        self.assertEqual(value.start, 1)
+
+    def test_single_values(self):
+        self.assertIs(self.decode("GetState", 6), MowerState.IN_OPERATION)
+        self.assertIs(self.decode("GetError", 8), ErrorCodes.WRONG_PIN_CODE)
+        self.assertEqual(self.decode("GetBatteryLevel", 42), 42)
+        self.assertEqual(self.decode("GetUserMowerNameAsAsciiString", "Mowy"), "Mowy")
+        self.assertIsNone(get_records().record_type("GetState"))
+
+    def test_unknown_enum_value(self):
+        value = self.decode("GetState", 200)
+        self.assertEqual(value, 200)
+        self.assertNotIsInstance(value, MowerState)
+
+    def test_slots(self):
+        self.assertFalse(hasattr(MowerSnapshot(), "__dict__"))
+        self.assertFalse(
+            hasattr(TaskInformation(0, 0, 1, 1, 1, 1, 1, 1, 1), "__dict__")
+        )
+        self.assertFalse(hasattr(MowerModels[(0, 0)], "__dict__"))
+
+
+class TestRead(unittest.IsolatedAsyncioTestCase):
+    async def test_read(self):
+        emulator = EmulatedMower(
+            messages=[{"time": 1700000000, "code": 13, "severity": 2}]
+        )
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=emulator.transport,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+
+        message = await mower.read(get_registry()["GetMessage"], messageId=0)
+        self.assertIs(message.code, ErrorCodes.NO_DRIVE)
+        self.assertEqual(message.time, 1700000000)
+
+        # The cached record is returned as a dict by command()
+        self.assertEqual(
+            await mower.command("GetMessage", messageId=0),
+            {"time": 1700000000, "code": 13, "severity": 2},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import json
+from importlib.resources import files
+from automower_ble.protocol import BLEClient, Command
+from automower_ble.registry import get_registry
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            self.protocol = json.load(f)  # Load the parameters to have them available
+
+    def test_shared(self):
+        self.assertIs(get_registry(), get_registry())
+        self.assertIs(
+            BLEClient(1, "00:00:00:00:00:00").registry,
+            BLEClient(2, "00:00:00:00:00:01").registry,
+        )
+
+    def test_client_protocol(self):
+        # Still the parsed protocol.json, as before the registry
+        protocol = BLEClient(1, "00:00:00:00:00:00").protocol
+
+        self.assertEqual(protocol, self.protocol)
+        self.assertIsInstance(protocol["GetModel"], dict)
+
+    def test_indexes(self):
+        registry = get_registry()
+
+        self.assertEqual(len(registry), len(self.protocol))
+        for name, parameter in self.protocol.items():
+            definition = registry[name]
+            self.assertEqual(definition.name, name)
+            self.assertIs(
+                registry.lookup(parameter["major"], parameter["minor"]), definition
+            )
+
+        self.assertIsNone(registry.lookup(1, 1))
+
+    def test_lookup_frame(self):
+        registry = get_registry()
+
+        self.assertIs(
+            registry.lookup_frame(
+                bytearray.fromhex("02fd1300b63b604701e601af5a1209000002001701c803")
+            ),
+            registry["GetModel"],
+        )
+        self.assertIsNone(
+            registry.lookup_frame(bytearray.fromhex("02fd0a00b33b6047005d08012803"))
+        )
+
+    def test_immutable(self):
+        definition = get_registry()["GetTask"]
+
+        with self.assertRaises(AttributeError):
+            definition.major = 1
+        with self.assertRaises(TypeError):
+            definition.response_type["start"] = "uint8"
+
+    def test_command_does_not_modify_parameter(self):
+        parameter = dict(self.protocol["Pause"])
+        command = Command(0x13A51453, parameter)
+
+        self.assertNotIn("responseType", parameter)
+        self.assertEqual(command.response_data_type, {"response": "no_response"})
+
+    def test_client_reuses_commands(self):
+        client = BLEClient(0x13A51453, "00:00:00:00:00:00")
+
+        self.assertIs(client.get_command("GetModel"), client.get_command("GetModel"))
+        self.assertEqual(
+            client.get_command("GetModel").generate_request(),
+            Command(0x13A51453, self.protocol["GetModel"]).generate_request(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
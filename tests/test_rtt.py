@@ -0,0 +1,128 @@
+import unittest
+import asyncio
+import time
+from automower_ble.framing import FrameAssembler
+from automower_ble.protocol import BLEClient
+from automower_ble.rtt import RttEstimator
+
+CHANNEL_ID = 0x13A51453
+
+
+class TestRttEstimator(unittest.TestCase):
+    def test_initial_timeout(self):
+        rtt = RttEstimator(initial_timeout=3.0)
+        self.assertIsNone(rtt.srtt)
+        self.assertEqual(rtt.timeout, 3.0)
+
+    def test_first_sample(self):
+        rtt = RttEstimator(min_timeout=0.0)
+        rtt.sample(0.1)
+        self.assertAlmostEqual(rtt.srtt, 0.1)
+        self.assertAlmostEqual(rtt.rttvar, 0.05)
+        self.assertAlmostEqual(rtt.timeout, 0.3)
+
+    def test_converges(self):
+        rtt = RttEstimator(min_timeout=0.0)
+        for _ in range(100):
+            rtt.sample(0.05)
+        self.assertAlmostEqual(rtt.srtt, 0.05)
+        self.assertLess(rtt.rttvar, 0.001)
+        self.assertLess(rtt.timeout, 0.06)
+
+    def test_bounds(self):
+        rtt = RttEstimator(min_timeout=0.2, max_timeout=2.0)
+        rtt.sample(0.01)
+        self.assertEqual(rtt.timeout, 0.2)
+        rtt.sample(30.0)
+        self.assertEqual(rtt.timeout, 2.0)
+
+    def test_backoff(self):
+        rtt = RttEstimator(min_timeout=0.2, max_timeout=1.0)
+        rtt.sample(0.01)
+        rtt.on_timeout()
+        self.assertEqual(rtt.timeout, 0.4)
+        rtt.on_timeout()
+        self.assertEqual(rtt.timeout, 0.8)
+        rtt.on_timeout()
+        self.assertEqual(rtt.timeout, 1.0)
+        self.assertEqual(rtt.timeouts, 3)
+
+        # A new measurement ends the backoff
+        rtt.sample(0.01)
+        self.assertEqual(rtt.timeout, 0.2)
+
+
+class LossyClient:
+    """
+    Answers KeepAlive after `delay`, split in chunks `gap` apart. The
+    requests listed in `drop` are not answered.
+    """
+
+    def __init__(self, client: BLEClient, delay=0.01, gap=0.0, drop=()):
+        self.client = client
+        self.framer = FrameAssembler()
+        self.delay = delay
+        self.gap = gap
+        self.drop = set(drop)
+        self.requests = 0
+
+    def is_connected(self):
+        return True
+
+    async def write_gatt_char(self, char, data, response=False):
+        for frame in self.framer.feed(data):
+            self.requests += 1
+            if self.requests not in self.drop:
+                asyncio.get_running_loop().create_task(self._answer())
+
+    async def _answer(self):
+        response = self.client.registry["KeepAlive"].codec.encode_response(CHANNEL_ID)
+        await asyncio.sleep(self.delay)
+        for i in range(0, len(response), 10):
+            self.client.notification_handler(None, response[i : i + 10])
+            await asyncio.sleep(self.gap)
+
+
+class TestAdaptiveTimeout(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = BLEClient(CHANNEL_ID, "00:00:00:00:00:00")
+        self.client.write_char = None
+        self.request = self.client.get_command("KeepAlive").generate_request()
+
+    async def test_measures_rtt(self):
+        self.client.client = LossyClient(self.client, delay=0.02)
+        for _ in range(5):
+            self.assertIsNotNone(await self.client._request_response(self.request))
+
+        self.assertEqual(self.client.rtt.samples, 5)
+        self.assertGreater(self.client.rtt.srtt, 0.015)
+        self.assertLess(self.client.rtt.timeout, 1.0)
+
+    async def test_lost_response_retried_quickly(self):
+        self.client.client = LossyClient(self.client, drop=(4,))
+        for _ in range(3):
+            await self.client._request_response(self.request)
+
+        start = time.monotonic()
+        self.assertIsNotNone(await self.client._request_response(self.request))
+
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(self.client.rtt.timeouts, 1)
+        # The retried request is not measured
+        self.assertEqual(self.client.rtt.samples, 3)
+
+    async def test_slow_chunks_extend_wait(self):
+        # The first chunk arrives in time, the rest trickle in after the
+        # request timeout has passed
+        self.client.client = LossyClient(self.client, gap=0.15)
+        self.client.rtt.sample(0.01)
+        self.assertEqual(self.client.rtt.timeout, 0.2)
+
+        self.assertIsNotNone(await self.client._request_response(self.request))
+        self.assertEqual(self.client.client.requests, 1)
+        self.assertEqual(self.client.rtt.timeouts, 0)
+        self.assertGreater(self.client.chunk_rtt.samples, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+from automower_ble.emulator import EmulatedMower
+from automower_ble.mower import Mower
+from automower_ble.schedule import WEEKDAYS, Schedule, Task
+
+CHANNEL_ID = 0x13A51453
+
+
+def get_task(start: int, duration: int, days: str) -> dict:
+    """GetTask response, `days` has a character per weekday from Monday"""
+    value = {"start": start, "duration": duration, "unknown": 0}
+    for name, day in zip(WEEKDAYS, days):
+        value[name] = int(day == "x")
+    return value
+
+
+class TestTask(unittest.TestCase):
+    def test_from_response(self):
+        task = Task.from_response(get_task(3600, 7200, "x.x...x"))
+
+        self.assertEqual(task.weekdays, 0b1000101)
+        self.assertTrue(task.runs_on(0))
+        self.assertFalse(task.runs_on(1))
+        self.assertTrue(task.runs_on(6))
+        self.assertEqual(task, Task(3600, 7200, 0b1000101))
+
+    def test_hash(self):
+        a = Schedule([Task(0, 3600, 0b1111111), Task(7200, 3600, 0b0000001)])
+        b = Schedule([Task(0, 3600, 0b1111111), Task(7200, 3600, 0b0000001)])
+        c = Schedule([Task(0, 3600, 0b1111111), Task(7200, 3600, 0b0000011)])
+
+        self.assertEqual(a.hash, b.hash)
+        self.assertEqual(a, b)
+        self.assertNotEqual(a.hash, c.hash)
+        self.assertNotEqual(a, c)
+        self.assertNotEqual(Schedule([]).hash, a.hash)
+
+    def test_diff(self):
+        a = Schedule([Task(0, 3600, 0b1111111), Task(7200, 3600, 0b0000001)])
+        b = Schedule([Task(0, 1800, 0b1111111), Task(7200, 3600, 0b0000001)])
+        c = Schedule([Task(0, 3600, 0b1111111)])
+
+        self.assertEqual(a.diff(a), [])
+        self.assertEqual(b.diff(a), [(0, Task(0, 3600, 0b1111111), b[0])])
+        self.assertEqual(c.diff(a), [(1, a[1], None)])
+        self.assertEqual(a.diff(c), [(1, None, a[1])])
+
+
+class TestGetSchedule(unittest.IsolatedAsyncioTestCase):
+    async def test_get_schedule(self):
+        emulator = EmulatedMower(
+            tasks=[
+                get_task(8 * 3600, 4 * 3600, "xxxxx.."),
+                get_task(10 * 3600, 2 * 3600, ".....xx"),
+                get_task(0, 3600, "......."),
+            ]
+        )
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            cache_policy={},
+            window=4,
+            fast_connect=True,
+            transport_factory=emulator.transport,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+
+        schedule = await mower.get_schedule()
+        self.assertEqual(len(schedule), 3)
+        self.assertEqual(schedule[0], Task(8 * 3600, 4 * 3600, 0b0011111))
+        self.assertEqual(schedule[1].weekdays, 0b1100000)
+        self.assertEqual(emulator.requests["GetTask"], 3)
+
+        self.assertEqual((await mower.get_schedule()).hash, schedule.hash)
+
+        emulator.tasks[2] = get_task(0, 1800, ".......")
+        self.assertNotEqual((await mower.get_schedule()).hash, schedule.hash)
+
+    async def test_not_cached(self):
+        emulator = EmulatedMower(tasks=[get_task(8 * 3600, 4 * 3600, "xxxxx..")])
+        # With the default cache policy
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=emulator.transport,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+
+        schedule = await mower.get_schedule()
+        emulator.tasks[0] = get_task(8 * 3600, 2 * 3600, "xxxxx..")
+        changed = await mower.get_schedule()
+
+        self.assertNotEqual(changed.hash, schedule.hash)
+        self.assertEqual(changed.diff(schedule), [(0, schedule[0], changed[0])])
+        self.assertEqual(changed[0].duration, 2 * 3600)
+        self.assertEqual(emulator.requests["GetNumberOfTasks"], 2)
+
+    async def test_late_response(self):
+        emulator = EmulatedMower(
+            tasks=[get_task(3600 * i, 600 * (i + 1), "x......") for i in range(4)]
+        )
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            window=4,
+            fast_connect=True,
+            transport_factory=emulator.transport,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+
+        respond = emulator.respond
+
+        def respond_late(name, params):
+            # The first GetTask response arrives after the timeout, but
+            # well before it is given up on
+            late = name == "GetTask" and "GetTask" not in emulator.requests
+            emulator.latency = 1.5 * mower.rtt.timeout if late else 0
+            return respond(name, params)
+
+        emulator.respond = respond_late
+        schedule = await mower.get_schedule()
+
+        self.assertEqual([task.duration for task in schedule], [600, 1200, 1800, 2400])
+        self.assertGreater(emulator.requests["GetTask"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
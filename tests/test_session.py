@@ -0,0 +1,183 @@
+import unittest
+import asyncio
+import time
+from unittest import mock
+from automower_ble.emulator import EmulatedMower
+from automower_ble.mower import Mower
+from automower_ble.session import MowerSession
+
+
+class FakeMower:
+    """Stands in for Mower, the link can be dropped from the test"""
+
+    def __init__(self):
+        self.address = "00:00:00:00:00:00"
+        self.device_info = None
+        self.disconnect_callbacks = []
+        self.connected = False
+        self.connects = []
+        self.commands = []
+        self.fail_connects = 0
+        self.request_gate = None
+        self.last_activity = time.monotonic()
+
+    async def connect(self, device, read_device_info=True, check_login=False):
+        self.connects.append((read_device_info, check_login))
+        if self.fail_connects:
+            self.fail_connects -= 1
+            return False
+        self.connected = True
+        self.device_info = ("Husqvarna", "Automower", "305")
+        return True
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    def drop(self):
+        self.connected = False
+        for callback in self.disconnect_callbacks:
+            callback(self)
+
+    async def command(self, command_name, **kwargs):
+        self.commands.append(command_name)
+        self.last_activity = time.monotonic()
+        if not self.connected:
+            raise OSError("Not connected")
+        return 42
+
+
+async def find_device(address):
+    return object()
+
+
+class TestMowerSession(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.mower = FakeMower()
+        self.session = MowerSession(
+            self.mower,
+            find_device=find_device,
+            keepalive_interval=0.05,
+            backoff_initial=0.01,
+            backoff_max=0.02,
+        )
+
+    async def asyncTearDown(self):
+        await self.session.stop()
+
+    async def test_keepalive(self):
+        await self.session.start()
+        await asyncio.sleep(0.12)
+
+        self.assertGreaterEqual(self.session.keepalives, 1)
+        self.assertIn("KeepAlive", self.mower.commands)
+
+    async def test_keepalive_waits_for_idle(self):
+        await self.session.start()
+        for _ in range(6):
+            await self.session.command("GetBatteryLevel")
+            await asyncio.sleep(0.02)
+
+        self.assertNotIn("KeepAlive", self.mower.commands)
+
+    async def test_reconnect(self):
+        self.mower.fail_connects = 1
+        await self.session.start()
+        self.assertEqual(self.mower.connects, [(True, False), (True, False)])
+
+        self.mower.fail_connects = 2
+        self.mower.drop()
+        self.assertFalse(self.session.connected)
+
+        # Waits for the reconnect instead of failing
+        self.assertEqual(await self.session.command("GetBatteryLevel"), 42)
+        self.assertEqual(self.session.reconnects, 1)
+        # The device info is kept and the PIN is only sent if needed
+        self.assertEqual(self.mower.connects[-1], (False, True))
+
+    async def test_link_drops_during_command(self):
+        await self.session.start()
+        self.mower.connected = False
+
+        self.assertEqual(await self.session.command("GetBatteryLevel"), 42)
+        self.assertEqual(self.mower.commands, ["GetBatteryLevel", "GetBatteryLevel"])
+
+    async def test_backoff(self):
+        session = MowerSession(FakeMower(), backoff_initial=1.0, backoff_max=8.0)
+
+        with mock.patch("random.random", return_value=1.0):
+            self.assertEqual(
+                [session.backoff(i) for i in range(5)], [1.0, 2.0, 4.0, 8.0, 8.0]
+            )
+        with mock.patch("random.random", return_value=0.0):
+            self.assertEqual(session.backoff(2), 2.0)
+
+
+async def slow_find_device(address):
+    await asyncio.sleep(0.05)
+    return object()
+
+
+def emulated_mower(emulator: EmulatedMower, **kwargs) -> Mower:
+    return Mower(
+        0x13A51453,
+        "00:00:00:00:00:00",
+        fast_connect=True,
+        transport_factory=emulator.transport,
+        **kwargs,
+    )
+
+
+class TestEmulatedSession(unittest.IsolatedAsyncioTestCase):
+    async def test_stop_during_keepalive(self):
+        emulator = EmulatedMower()
+        mower = emulated_mower(emulator)
+        session = MowerSession(mower, find_device=find_device, keepalive_interval=0)
+        await session.start()
+
+        # The KeepAlive is never answered in time
+        emulator.latency = 10.0
+        while mower.dispatcher.in_flight == 0:
+            await asyncio.sleep(0.001)
+
+        start = time.monotonic()
+        await session.stop()
+
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(emulator.requests["KeepAlive"], 1)
+        self.assertEqual(mower.dispatcher.in_flight, 0)
+        self.assertFalse(mower.is_connected())
+
+    async def test_request_during_reconnect(self):
+        emulator = EmulatedMower(battery_level=42)
+        mower = emulated_mower(emulator)
+        session = MowerSession(mower, find_device=slow_find_device)
+        await session.start()
+        self.addAsyncCleanup(session.stop)
+
+        await mower.client.drop_link()
+        # Made through the mower, not the session, it still waits
+        snapshot = await mower.snapshot(["battery_level"])
+
+        self.assertEqual(snapshot.battery_level, 42)
+        self.assertEqual(session.reconnects, 1)
+
+    async def test_keepalive_waits_for_mower_traffic(self):
+        emulator = EmulatedMower()
+        # Every command goes to the mower
+        mower = emulated_mower(emulator, cache_policy={})
+        session = MowerSession(mower, find_device=find_device, keepalive_interval=0.05)
+        await session.start()
+        self.addAsyncCleanup(session.stop)
+
+        for _ in range(6):
+            await mower.command("GetBatteryLevel")
+            await asyncio.sleep(0.02)
+
+        self.assertNotIn("KeepAlive", emulator.requests)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import unittest
+import mmap
+import os
+import tempfile
+from automower_ble.emulator import EmulatedMower
+from automower_ble.mower import Mower
+from automower_ble.telemetry import TelemetryReader, TelemetryRecorder
+
+CHANNEL_ID = 0x13A51453
+
+
+def sample(i: int) -> dict:
+    return {
+        "GetBatteryLevel": 100 - i % 100,
+        "IsCharging": i % 2 == 0,
+        "GetState": 6,
+        "GetActivity": 3,
+        "GetAllStatistics": {
+            "totalRunningTime": 1000000 + 60 * i,
+            "totalCuttingTime": 900000 + 50 * i,
+            "totalChargingTime": 500000,
+            "totalSearchingTime": 20000 + i,
+            "numberOfCollisions": 4000 + i // 10,
+            "numberOfChargingCycles": 600,
+            "cuttingBladeUsageTime": 3000 + 60 * i,
+        },
+    }
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+
+    def record(self, samples, **kwargs):
+        with TelemetryRecorder(self.path, **kwargs) as recorder:
+            for i, values in samples:
+                recorder.append(values, timestamp=1700000000 + 60 * i)
+
+    def read(self) -> TelemetryReader:
+        reader = TelemetryReader(self.path)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_round_trip(self):
+        self.record(
+            ((i, sample(i)) for i in range(200)), batch_size=16, segment_rows=64
+        )
+
+        reader = self.read()
+        self.assertEqual(reader.rows, 200)
+        self.assertEqual(len(reader.segments), 4)
+        self.assertEqual(
+            list(reader.values("timestamp")),
+            [1700000000 + 60 * i for i in range(200)],
+        )
+        self.assertEqual(
+            list(reader.values("GetBatteryLevel")), [100 - i for i in range(100)] * 2
+        )
+        self.assertEqual(
+            list(reader.values("totalRunningTime")),
+            [1000000 + 60 * i for i in range(200)],
+        )
+        self.assertEqual(list(reader.values("numberOfChargingCycles")), [600] * 200)
+
+    def test_compact(self):
+        self.record(((i, sample(i)) for i in range(1000)))
+
+        segment = self.read().segments[0]
+        # Counters are stored as 16 bit deltas
+        column = segment.column("totalRunningTime")
+        self.assertEqual(column.format, "H")
+        self.assertEqual(column[0], 0)
+        self.assertEqual(column[1], 60)
+
+        # A column is a view of the mapped file
+        self.assertIsInstance(column.obj, mmap.mmap)
+        column.release()
+
+    def test_counter_reset(self):
+        reset = sample(0)
+        reset["GetAllStatistics"] = dict(reset["GetAllStatistics"], totalRunningTime=5)
+        self.record([(0, sample(0)), (1, sample(1)), (2, reset), (3, sample(3))])
+
+        reader = self.read()
+        self.assertEqual(len(reader.segments), 3)
+        self.assertEqual(
+            list(reader.values("totalRunningTime")), [1000000, 1000060, 5, 1000180]
+        )
+
+    def test_missing_values(self):
+        values = sample(1)
+        del values["GetBatteryLevel"]
+        del values["GetAllStatistics"]
+        self.record([(0, sample(0)), (1, values), (2, sample(2))])
+
+        reader = self.read()
+        self.assertEqual(list(reader.values("GetBatteryLevel")), [100, 0xFF, 98])
+        # Counters repeat the previous value
+        self.assertEqual(
+            list(reader.values("totalRunningTime")), [1000000, 1000000, 1000120]
+        )
+
+    def test_resume(self):
+        self.record((i, sample(i)) for i in range(10))
+        self.record((i, sample(i)) for i in range(10, 20))
+
+        reader = self.read()
+        self.assertEqual(len(reader.segments), 1)
+        self.assertEqual(
+            list(reader.values("totalCuttingTime")),
+            [900000 + 50 * i for i in range(20)],
+        )
+
+    def test_batches(self):
+        recorder = TelemetryRecorder(self.path, batch_size=8)
+        self.addCleanup(recorder.close)
+        for i in range(7):
+            recorder.append(sample(i))
+        self.assertEqual(os.listdir(self.path), [])
+
+        recorder.append(sample(7))
+        self.assertEqual(self.read().rows, 8)
+
+
+class TestPoll(unittest.IsolatedAsyncioTestCase):
+    async def test_poll(self):
+        emulator = EmulatedMower(battery_level=55)
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=emulator.transport,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+
+        with tempfile.TemporaryDirectory() as path:
+            with TelemetryRecorder(path) as recorder:
+                await recorder.poll(mower, timestamp=1700000000)
+
+            reader = TelemetryReader(path)
+            self.assertEqual(list(reader.values("GetBatteryLevel")), [55])
+            self.assertEqual(
+                list(reader.values("numberOfCollisions")),
+                [emulator.statistics["numberOfCollisions"]],
+            )
+            reader.close()
+
+    async def test_poll_is_not_cached(self):
+        emulator = EmulatedMower()
+        mower = Mower(
+            CHANNEL_ID,
+            "00:00:00:00:00:00",
+            fast_connect=True,
+            transport_factory=emulator.transport,
+        )
+        self.assertTrue(await mower.connect(object()))
+        self.addAsyncCleanup(mower.disconnect)
+        collisions = emulator.statistics["numberOfCollisions"]
+
+        with tempfile.TemporaryDirectory() as path:
+            with TelemetryRecorder(path) as recorder:
+                await recorder.poll(mower, timestamp=1700000000)
+                emulator.statistics["numberOfCollisions"] += 5
+                emulator.battery_level -= 1
+                await recorder.poll(mower, timestamp=1700000060)
+
+            reader = TelemetryReader(path)
+            self.assertEqual(
+                list(reader.values("numberOfCollisions")),
+                [collisions, collisions + 5],
+            )
+            self.assertEqual(
+                list(reader.values("GetBatteryLevel")),
+                [emulator.battery_level + 1, emulator.battery_level],
+            )
+            reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()